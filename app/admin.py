@@ -16,6 +16,9 @@ from .models import (
     BoothMaintainer,
     Booth,
     BoothAndPoemCollection,
+    AudioObject,
+    ImportRun,
+    ImportJob,
 )
 
 admin.site.register(Poem)
@@ -34,3 +37,6 @@ admin.site.register(DirectoryType)
 admin.site.register(BoothMaintainer)
 admin.site.register(Booth)
 admin.site.register(BoothAndPoemCollection)
+admin.site.register(AudioObject)
+admin.site.register(ImportRun)
+admin.site.register(ImportJob)
@@ -0,0 +1,313 @@
+import datetime
+import hashlib
+import json
+import logging
+import os
+import shutil
+import stat
+import tempfile
+import time
+
+from .lazy import LazyModule
+from .metrics import count_event
+
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+pa = LazyModule("pyarrow")
+pyarrow_parquet = LazyModule("pyarrow.parquet")
+
+IMPORT_CACHE_DIR = os.getenv(
+    "IMPORT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "telepoem-import-cache")
+)
+# 0 turns the cache off.
+IMPORT_CACHE_MAX_BYTES = int(os.getenv("IMPORT_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+# How long a failed import keeps reading the rest of the file into the
+# cache before re-raising; 0 caches nothing for a failed import.
+IMPORT_CACHE_COMPLETE_SECONDS = float(os.getenv("IMPORT_CACHE_COMPLETE_SECONDS", 10))
+# Bump when the readers change what they return, so older entries are
+# not reused.
+CACHE_VERSION = 2
+
+ENTRY_FILE = "entry.json"
+# Parquet schema metadata listing the columns stored as tagged text.
+TAGGED_COLUMNS = b"telepoem.tagged_columns"
+
+logger = logging.getLogger(__name__)
+
+_cell_types = None
+
+
+def get_cell_types():
+    # {type: (tag, encode)} and {tag: decode} for the cells of object
+    # columns. Parquet wants one type per column, while a cleaned column
+    # such as a booth's zipCode mixes numbers and empty strings; such a
+    # column is stored as "<tag>:<text>" and rebuilt cell by cell, so the
+    # transforms see exactly the values the reader returned.
+    global _cell_types
+    if _cell_types is None:
+        types = [
+            ("s", str, str, str),
+            ("i", int, str, int),
+            ("f", float, repr, float),
+            ("b", bool, str, lambda text: text == "True"),
+            ("I", np.int64, str, lambda text: np.int64(int(text))),
+            ("F", np.float64, repr, lambda text: np.float64(float(text))),
+            ("B", np.bool_, str, lambda text: np.bool_(text == "True")),
+            ("t", pd.Timestamp, pd.Timestamp.isoformat, pd.Timestamp),
+            (
+                "d",
+                datetime.datetime,
+                datetime.datetime.isoformat,
+                datetime.datetime.fromisoformat,
+            ),
+            ("D", datetime.date, datetime.date.isoformat, datetime.date.fromisoformat),
+            ("T", datetime.time, datetime.time.isoformat, datetime.time.fromisoformat),
+        ]
+        _cell_types = (
+            {cell_type: (tag, encode) for tag, cell_type, encode, _ in types},
+            {tag: decode for tag, _, _, decode in types},
+        )
+    return _cell_types
+
+
+def encode_cell(value):
+    if value is None:
+        return None
+    encoders, _ = get_cell_types()
+    if type(value) not in encoders:
+        raise TypeError(f"cannot cache a {type(value).__name__} cell")
+    tag, encode = encoders[type(value)]
+    return f"{tag}:{encode(value)}"
+
+
+def decode_cell(text):
+    if text is None:
+        return None
+    _, decoders = get_cell_types()
+    tag, _, value = text.partition(":")
+    return decoders[tag](value)
+
+
+def to_arrow(table_df):
+    table_df = table_df.copy(deep=False)
+    tagged = []
+    for column in table_df.columns:
+        values = table_df[column]
+        if values.dtype == object and not all(
+            value is None or type(value) is str for value in values
+        ):
+            table_df[column] = [encode_cell(value) for value in values]
+            tagged.append(column)
+    table = pa.Table.from_pandas(table_df)
+    return table.replace_schema_metadata(
+        {**table.schema.metadata, TAGGED_COLUMNS: json.dumps(tagged)}
+    )
+
+
+def from_arrow(table):
+    table_df = table.to_pandas()
+    for column in json.loads(table.schema.metadata[TAGGED_COLUMNS]):
+        table_df[column] = pd.Series(
+            [decode_cell(text) for text in table_df[column]],
+            index=table_df.index,
+            dtype=object,
+        )
+    return table_df
+
+
+def make_private_directory(directory):
+    # Creates the directory for this user only, and refuses one that
+    # another user owns or can write to.
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if (
+        not stat.S_ISDIR(info.st_mode)
+        or info.st_uid != os.getuid()
+        or info.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+    ):
+        raise PermissionError(
+            f"{directory} is not a directory of this user that only it can write to"
+        )
+
+
+class ParsedTableCache:
+    """The parsed tables of recent bulk uploads, on local disk."""
+
+    def __init__(self, directory=IMPORT_CACHE_DIR, max_bytes=IMPORT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def prepare(self):
+        # Whoever can write an entry decides what the next import stores.
+        try:
+            make_private_directory(self.directory)
+        except OSError as e:
+            logger.warning("Not using the parsed table cache: %s", e)
+            return False
+        return True
+
+    def get_key(self, source, input_format, stream, chunk_size):
+        # A whole file is one chunk whatever the chunk size.
+        parts = [CACHE_VERSION, source, input_format, chunk_size if stream else None]
+        return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+    def get_path(self, key):
+        return os.path.join(self.directory, key)
+
+    def read_entry(self, key):
+        with open(os.path.join(self.get_path(key), ENTRY_FILE)) as f:
+            return json.load(f)
+
+    def get(self, key):
+        # The content hash of the cached file, or None on a miss.
+        if not self.prepare():
+            return None
+        try:
+            entry = self.read_entry(key)
+            # Marks the entry as recently used.
+            os.utime(os.path.join(self.get_path(key), ENTRY_FILE))
+        except (OSError, ValueError):
+            count_event("ParsedTableCache.miss")
+            return None
+        count_event("ParsedTableCache.hit")
+        return entry["content_hash"]
+
+    def load(self, key):
+        path = self.get_path(key)
+        for chunk in self.read_entry(key)["chunks"]:
+            yield {
+                table_name: (
+                    None
+                    if file_name is None
+                    else from_arrow(
+                        pyarrow_parquet.read_table(os.path.join(path, file_name))
+                    )
+                )
+                for table_name, file_name in chunk
+            }
+
+    def writer(self, key, chunks, content_hash):
+        return CacheWriter(self, key, chunks, content_hash)
+
+    def get_usage(self, path):
+        # Size and last use of an entry.
+        if not os.path.isdir(path):
+            info = os.stat(path)
+            return info.st_size, info.st_mtime
+        size = sum(entry.stat().st_size for entry in os.scandir(path))
+        return size, os.stat(os.path.join(path, ENTRY_FILE)).st_mtime
+
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            # Entries still being written.
+            if entry.name.endswith(".tmp"):
+                continue
+            try:
+                size, last_used = self.get_usage(entry.path)
+            except FileNotFoundError:
+                continue
+            entries.append((last_used, size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= size
+            count_event("ParsedTableCache.evicted")
+
+
+class CacheWriter:
+    """Passes chunks through while writing them into a new cache entry."""
+
+    def __init__(self, cache, key, chunks, content_hash):
+        self.cache = cache
+        self.key = key
+        self.chunks = iter(chunks)
+        self.entry = {"content_hash": content_hash, "chunks": []}
+        self.directory = None
+        try:
+            if cache.prepare():
+                self.directory = tempfile.mkdtemp(dir=cache.directory, suffix=".tmp")
+        except OSError as e:
+            self.discard(e)
+
+    def __iter__(self):
+        while True:
+            try:
+                table_dfs = next(self.chunks)
+            except StopIteration:
+                self.commit()
+                return
+            except Exception as e:
+                self.discard()
+                raise e
+            self.write(table_dfs)
+            yield table_dfs
+
+    def write(self, table_dfs):
+        if self.directory is None:
+            return
+        try:
+            chunk = []
+            for table_name, table_df in table_dfs.items():
+                file_name = None
+                if table_df is not None:
+                    file_name = f"{len(self.entry['chunks'])}-{len(chunk)}.parquet"
+                    pyarrow_parquet.write_table(
+                        to_arrow(table_df), os.path.join(self.directory, file_name)
+                    )
+                chunk.append([table_name, file_name])
+            self.entry["chunks"].append(chunk)
+        except Exception as e:
+            self.discard(e)
+
+    def complete(self, seconds=IMPORT_CACHE_COMPLETE_SECONDS):
+        if self.directory is None:
+            return
+        deadline = time.monotonic() + seconds
+        try:
+            for _ in self:
+                if time.monotonic() > deadline:
+                    logger.info(
+                        "Not caching the parsed tables: the rest of the file "
+                        "takes more than %ss to read",
+                        seconds,
+                    )
+                    self.discard()
+                    return
+        except Exception:
+            # The file could not be read to the end; the entry is gone.
+            pass
+
+    def commit(self):
+        if self.directory is None:
+            return
+        try:
+            with open(os.path.join(self.directory, ENTRY_FILE), "w") as f:
+                json.dump(self.entry, f)
+            os.replace(self.directory, self.cache.get_path(self.key))
+        except OSError as e:
+            self.discard(e)
+            return
+        self.directory = None
+        count_event("ParsedTableCache.stored")
+        self.cache.evict()
+
+    def discard(self, error=None):
+        if error is not None:
+            logger.warning("Not caching the parsed tables: %s", error)
+        if self.directory is None:
+            return
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.directory = None
@@ -0,0 +1,158 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import DatabaseError, connection
+from django.utils import timezone
+
+from .cache import make_private_directory
+from .metrics import count_rows
+from .models import ImportJob
+from .utils import (
+    IMPORT_CHUNK_SIZE,
+    DimensionCache,
+    EntityCache,
+    flush_tables,
+    get_audio_index,
+    get_input_format,
+    iter_table_chunks,
+    process_tables,
+)
+
+IMPORT_JOB_WORKERS = int(os.getenv("IMPORT_JOB_WORKERS", 2))
+IMPORT_JOB_DIR = os.getenv(
+    "IMPORT_JOB_DIR", os.path.join(tempfile.gettempdir(), "telepoem-import-jobs")
+)
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=IMPORT_JOB_WORKERS, thread_name_prefix="import-job"
+                )
+    return _executor
+
+
+def create_import_job(
+    file, stream=False, chunk_size=IMPORT_CHUNK_SIZE, input_format="xlsx"
+):
+    # The request's upload is gone once the response is sent, so the job
+    # works from its own copy on disk, which only this user can read.
+    make_private_directory(IMPORT_JOB_DIR)
+    job = ImportJob(fileName=file.name, stream=stream, chunkSize=chunk_size)
+    # The extension carries the input format over to the job.
+    job.filePath = os.path.join(IMPORT_JOB_DIR, f"{job.id}.{input_format}")
+    if hasattr(file, "temporary_file_path"):
+        # Already spooled to disk by the upload handler: take the file over.
+        shutil.move(file.temporary_file_path(), job.filePath)
+        os.chmod(job.filePath, 0o600)
+    else:
+        fd = os.open(job.filePath, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with open(fd, "wb") as destination:
+            for chunk in file.chunks():
+                destination.write(chunk)
+    job.save()
+    return job
+
+
+def fail_stale_jobs():
+    # Jobs run on the threads of the process that accepted them, so the
+    # ones still queued or running at startup died with the last process.
+    jobs = ImportJob.objects.filter(status__in=[ImportJob.QUEUED, ImportJob.RUNNING])
+    try:
+        file_paths = list(jobs.values_list("filePath", flat=True))
+        jobs.update(
+            status=ImportJob.FAILED,
+            error="Interrupted by a restart",
+            finishedAt=timezone.now(),
+            updatedAt=timezone.now(),
+        )
+    except DatabaseError as e:
+        logger.warning("Could not fail the interrupted import jobs: %s", e)
+        return 0
+    for file_path in file_paths:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+    if file_paths:
+        logger.warning("Import jobs interrupted by a restart: %d", len(file_paths))
+    return len(file_paths)
+
+
+def submit_import_job(job):
+    return get_executor().submit(run_import_job, job.id)
+
+
+def update_job(job, **fields):
+    for field, value in fields.items():
+        setattr(job, field, value)
+    job.save(update_fields=list(fields) + ["updatedAt"])
+
+
+def run_import_job(job_id):
+    job = ImportJob.objects.get(id=job_id)
+    try:
+        update_job(
+            job, status=ImportJob.RUNNING, stage="audio", startedAt=timezone.now()
+        )
+        dimensions = DimensionCache()
+        entities = EntityCache()
+        audio_index = get_audio_index()
+        counts = {}
+        update_job(job, stage="parsing")
+        for table_dfs in iter_table_chunks(
+            job.filePath,
+            stream=job.stream,
+            chunk_size=job.chunkSize,
+            input_format=get_input_format(job.filePath),
+        ):
+            process_tables(
+                table_dfs,
+                dimensions=dimensions,
+                audio_index=audio_index,
+                counts=counts,
+                on_table=lambda table_name: update_job(job, stage=table_name),
+                entities=entities,
+            )
+            rows = count_rows(table_dfs)
+            update_job(
+                job,
+                stage="parsing",
+                rowsProcessed=job.rowsProcessed + rows,
+                counts=counts,
+            )
+        update_job(job, stage="updating")
+        flush_tables(entities, counts=counts)
+        update_job(
+            job,
+            counts=counts,
+            status=ImportJob.SUCCEEDED,
+            stage="done",
+            finishedAt=timezone.now(),
+        )
+    except Exception as e:
+        logger.error("Error: %s", e)
+        update_job(
+            job,
+            status=ImportJob.FAILED,
+            error=f"{e}\n{traceback.format_exc()}",
+            finishedAt=timezone.now(),
+        )
+    finally:
+        if os.path.exists(job.filePath):
+            os.remove(job.filePath)
+        # Worker threads hold their own connection; don't leave it open
+        # between jobs.
+        connection.close()
+    return job
@@ -0,0 +1,34 @@
+import importlib
+import threading
+
+
+class LazyModule:
+    """Stands in for a module until one of its attributes is used.
+
+    pandas, numpy, openpyxl and boto3 take most of a cold start to import,
+    while checks, migrations and the URLconf never touch them. Code uses
+    the stand-in exactly like the module (``pd.DataFrame``); the first
+    attribute lookup imports it, and later lookups go straight to it.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule {self._name!r} ({state})>"
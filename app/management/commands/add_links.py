@@ -1,39 +1,110 @@
 # File: myapp/management/commands/add_links.py
+import logging
+
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from app.metrics import ImportMetrics
 from app.models import Poem
-from app.utils import S3
+from app.utils import AudioManifest, BULK_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
 
 
 class Command(BaseCommand):
     help = "Run the process"
 
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE)
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Check every poem, not only those whose audio file changed.",
+        )
+
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS("Starting the process..."))
         # Call your add_links method or include the logic here
-        result = add_links()
+        result = add_links(batch_size=options["batch_size"], full=options["full"])
         self.stdout.write(
             self.style.SUCCESS(f"Process completed with result: {result}")
         )
 
 
-def add_links():
+def add_links(batch_size=BULK_BATCH_SIZE, full=False):
+    metrics = ImportMetrics("add_links")
     try:
-        print("Getting mp3 files from s3")
-        bucket_name = "telepoem"
-        links = S3(bucket_name).get_audio_links()
-        poem_objs = Poem.objects.all()
-        print("Poems found: ", poem_objs.count())
-        for poem in poem_objs:
-            if poem.telepoemNumber:
-                file_key = f"poem/audio/{poem.telepoemNumber}.mp3"
-                for link in links:
-                    if link == file_key:
-                        poem.audioLink = (
-                            f"https://{bucket_name}.s3.amazonaws.com/{link}"
-                        )
-                        poem.save()
-                        print("Poem updated")
-                        break
+        logger.info("Refreshing the audio manifest from s3")
+        with metrics.stage("manifest"):
+            manifest = AudioManifest(batch_size=batch_size)
+            changes = manifest.refresh()
+            audio_index = manifest.get_index()
+            # Everything refreshed by now, by this run or an import, is
+            # synced below.
+            synced_at = timezone.now()
+            unlinked = list(manifest.get_unlinked().values_list("id", "key"))
+        poem_objs = (
+            Poem.objects.exclude(telepoemNumber__isnull=True)
+            .exclude(telepoemNumber="")
+            .only("id", "telepoemNumber", "audioLink")
+        )
+        if full:
+            poem_batches = [poem_objs.iterator(chunk_size=batch_size)]
+        else:
+            # Only poems whose audio object appeared, disappeared or changed
+            # since their links were last synced.
+            telepoem_numbers = sorted(
+                manifest.get_telepoem_numbers(key for _, key in unlinked)
+            )
+            poem_batches = (
+                poem_objs.filter(
+                    telepoemNumber__in=telepoem_numbers[i : i + batch_size]
+                )
+                for i in range(0, len(telepoem_numbers), batch_size)
+            )
+
+        result = {
+            "audio": {key: len(keys) for key, keys in changes.items()},
+            "poems": 0,
+            "matched": 0,
+            "changed": 0,
+            "unchanged": 0,
+            "cleared": 0,
+        }
+        # The objects only count as linked once the links are written.
+        with metrics.stage("links") as stats, transaction.atomic():
+            poems_to_update = []
+            for poem_batch in poem_batches:
+                for poem in poem_batch:
+                    result["poems"] += 1
+                    link = audio_index.get_link(poem.telepoemNumber)
+                    if link is None:
+                        # The audio object this link pointed at is gone.
+                        if poem.audioLink and poem.audioLink == (
+                            audio_index.get_expected_link(poem.telepoemNumber)
+                        ):
+                            poem.audioLink = None
+                            poems_to_update.append(poem)
+                            result["cleared"] += 1
+                    elif poem.audioLink == link:
+                        result["matched"] += 1
+                        result["unchanged"] += 1
+                    else:
+                        poem.audioLink = link
+                        poems_to_update.append(poem)
+                        result["matched"] += 1
+                        result["changed"] += 1
+                    if len(poems_to_update) >= batch_size:
+                        Poem.objects.bulk_update(poems_to_update, ["audioLink"])
+                        poems_to_update = []
+                    if result["poems"] % batch_size == 0:
+                        metrics.progress(batch_size)
+            if poems_to_update:
+                Poem.objects.bulk_update(poems_to_update, ["audioLink"])
+            manifest.mark_linked([audio_id for audio_id, _ in unlinked], synced_at)
+            metrics.progress(result["poems"] % batch_size)
+            stats["rows"] = result["poems"]
     except Exception as e:
         raise e
-    return "Process completed successfully"
+    result["metrics"] = metrics.finish()
+    return result
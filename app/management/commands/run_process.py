@@ -1,63 +1,197 @@
 # File: myapp/management/commands/run_process.py
-import pandas as pd
+import logging
+
+from app.cache import ParsedTableCache
+from app.metrics import ImportMetrics, count_rows
+from app.models import ImportRun
+from app.pipeline import ImportPipeline
 from app.utils import (
-    TableProcessor,
-    TableName,
-    PoetTableProcessor,
-    PoemTableProcessor,
-    PoemCollectionTableProcessor,
-    BoothTableProcessor,
-    Handler,
+    IMPORT_CHUNK_SIZE,
+    IMPORT_PARALLEL_TABLES,
+    DimensionCache,
+    EntityCache,
+    ImportLedger,
+    get_audio_index,
     get_excel_file,
+    flush_tables,
+    get_input_format,
+    hash_file,
+    iter_table_chunks,
+    process_tables,
 )
 from django.core.management.base import BaseCommand
 
+logger = logging.getLogger(__name__)
+
 
 class Command(BaseCommand):
     help = "Run the process"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--file-name",
+            default="file.xlsx",
+            help="Bulk upload to import: .xlsx, .csv, .zip of CSVs, .parquet or .jsonl.",
+        )
+        parser.add_argument(
+            "--stream",
+            action="store_true",
+            help="Read the workbook in row chunks instead of loading it whole.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Import even if the workbook is unchanged since the last run.",
+        )
+        parser.add_argument(
+            "--pipeline",
+            action="store_true",
+            help="Overlap parsing, transforming and writing on separate threads.",
+        )
+        parser.add_argument(
+            "--parallel-tables",
+            action="store_true",
+            default=IMPORT_PARALLEL_TABLES,
+            help="Write independent tables at the same time.",
+        )
+        parser.add_argument(
+            "--no-cache",
+            action="store_false",
+            dest="use_cache",
+            help="Parse the file even if its parsed tables are cached.",
+        )
+
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS("Starting the process..."))
         # Call your run_process method or include the logic here
-        result = run_process()
+        result = run_process(
+            file_name=options["file_name"],
+            stream=options["stream"],
+            chunk_size=options["chunk_size"],
+            force=options["force"],
+            pipeline=options["pipeline"],
+            parallel_tables=options["parallel_tables"],
+            use_cache=options["use_cache"],
+        )
         self.stdout.write(
             self.style.SUCCESS(f"Process completed with result: {result}")
         )
 
 
-def run_process():
+def run_process(
+    file_name="file.xlsx",
+    stream=False,
+    chunk_size=IMPORT_CHUNK_SIZE,
+    force=False,
+    pipeline=False,
+    parallel_tables=IMPORT_PARALLEL_TABLES,
+    use_cache=True,
+):
+    input_format = get_input_format(file_name)
+    metrics = ImportMetrics("run_process")
+    ledger = ImportLedger(file_name)
+    with metrics.stage("check"):
+        # A HEAD request is all a scheduled run costs when nothing was uploaded.
+        etag = ledger.get_etag()
+        run = ledger.start(etag)
+        unchanged = not force and ledger.is_unchanged(etag=etag)
+    if unchanged:
+        ledger.finish(run, ImportRun.SKIPPED)
+        return {
+            "status": "Workbook unchanged, import skipped",
+            "run": str(run.id),
+            "metrics": metrics.finish(),
+        }
+    pipeline_metrics = None
+    cache = ParsedTableCache()
+    use_cache = use_cache and cache.enabled
+    cache_writer = None
     try:
-        file_name = "file.xlsx"
-        file = get_excel_file(file_name)
-        df = pd.read_excel(file)
-        table_dfs = TableProcessor(df).get_table_dataframes()
-        poet_ids = []
-        poem_ids = []
-        booth_ids = []
-        for table_name, table_df in table_dfs.items():
-            if table_name == TableName.POET_INFORMATION.value:
-                poet_df = PoetTableProcessor.populate_poet_table_according_to_db(
-                    table_df
+        # The pipeline always reads the workbook in row chunks.
+        stream = stream or pipeline
+        file = None
+        cached = False
+        if use_cache and etag:
+            # The ETag is known before the download, so a hit skips it too.
+            cache_key = cache.get_key(etag, input_format, stream, chunk_size)
+            content_hash = cache.get(cache_key)
+            cached = content_hash is not None
+        if not cached:
+            with metrics.stage("download"):
+                file = get_excel_file(file_name, stream=stream, etag=etag)
+                content_hash = hash_file(file)
+            if use_cache and not etag:
+                cache_key = cache.get_key(
+                    content_hash, input_format, stream, chunk_size
                 )
-                poet_ids = Handler(poet_df).poets_handler()
-            elif table_name == TableName.POEM_INFORMATION.value:
-                poem_df = PoemTableProcessor.populate_poem_table_according_to_db(
-                    table_df
+                cached = cache.get(cache_key) is not None
+        if not force and ledger.is_unchanged(content_hash=content_hash):
+            ledger.finish(run, ImportRun.SKIPPED, content_hash=content_hash)
+            return {
+                "status": "Workbook unchanged, import skipped",
+                "run": str(run.id),
+                "metrics": metrics.finish(),
+            }
+        dimensions = DimensionCache()
+        entities = EntityCache()
+        # Every chunk of the run shares one refresh of the audio manifest.
+        with metrics.stage("audio"):
+            audio_index = get_audio_index()
+        if cached:
+            logger.info("Reusing the parsed tables of %s from the cache", file_name)
+            chunks = cache.load(cache_key)
+        else:
+            chunks = iter_table_chunks(
+                file, stream=stream, chunk_size=chunk_size, input_format=input_format
+            )
+            if use_cache:
+                chunks = cache_writer = cache.writer(cache_key, chunks, content_hash)
+        if pipeline:
+            import_pipeline = ImportPipeline(
+                file,
+                chunk_size=chunk_size,
+                dimensions=dimensions,
+                audio_index=audio_index,
+                metrics=metrics,
+                parallel=parallel_tables,
+                input_format=input_format,
+                entities=entities,
+                chunks=chunks,
+            )
+            counts = import_pipeline.run()
+            pipeline_metrics = import_pipeline.metrics
+        else:
+            counts = {}
+            for table_dfs in metrics.iterate("parse", chunks, count=count_rows):
+                process_tables(
+                    table_dfs,
+                    dimensions=dimensions,
+                    audio_index=audio_index,
+                    counts=counts,
+                    metrics=metrics,
+                    parallel=parallel_tables,
+                    entities=entities,
                 )
-                poem_df["poetId"] = poet_ids
-                poem_ids = Handler(poem_df).poems_handler()
-            elif table_name == TableName.BOOTH_INFORMATION.value:
-                booth_df = BoothTableProcessor.populate_booth_table_according_to_db(
-                    table_df
-                )
-                booth_ids = Handler(booth_df).booths_handler()
-            elif table_name == TableName.POEM_COLLECTION_INFORMATION.value:
-                poemcollection_df = PoemCollectionTableProcessor.populate_poemcollection_table_according_to_db(
-                    table_df
-                )
-                poemcollection_df["poemId"] = poem_ids
-                poemcollection_df["boothId"] = booth_ids
-                Handler(poemcollection_df).poem_collections_handler()
+                metrics.progress(count_rows(table_dfs))
+            flush_tables(entities, counts=counts, metrics=metrics)
     except Exception as e:
+        ledger.finish(run, ImportRun.FAILED, error=str(e))
+        if cache_writer is not None:
+            # Parse the rest of the file, within a time limit, so the retry
+            # does not have to.
+            cache_writer.complete()
         raise e
-    return "Process completed successfully"
+    with metrics.stage("check"):
+        ledger.finish(
+            run, ImportRun.SUCCEEDED, counts=counts, content_hash=content_hash
+        )
+    result = {
+        "status": "Process completed successfully",
+        "counts": counts,
+        "run": str(run.id),
+        "metrics": metrics.finish(),
+    }
+    if pipeline_metrics is not None:
+        result["pipeline"] = pipeline_metrics
+    return result
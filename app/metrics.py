@@ -0,0 +1,245 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from django.db import connection
+
+# Also print the metrics as CloudWatch embedded metric format records.
+IMPORT_METRICS_EMF = os.getenv("IMPORT_METRICS_EMF", "").lower() in [
+    "true",
+    "1",
+    "yes",
+]
+IMPORT_METRICS_NAMESPACE = os.getenv("IMPORT_METRICS_NAMESPACE", "Telepoem/Import")
+# At most one progress line per this many seconds of an import.
+IMPORT_LOG_PROGRESS_SECONDS = float(os.getenv("IMPORT_LOG_PROGRESS_SECONDS", 10))
+
+logger = logging.getLogger(__name__)
+
+# The ImportMetrics of the import running in this context. Threads an
+# import starts run in a copy of its context, so what they count lands in
+# the same import and not in another one running alongside.
+_current_metrics = contextvars.ContextVar("import_metrics", default=None)
+# The stats of the stages open in this context, outermost first.
+_current_stages = contextvars.ContextVar("import_stages", default=())
+
+
+def count_s3_request(**kwargs):
+    # Registered on every S3 client; retries are sent, and counted, again.
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.count_s3_request(_current_stages.get())
+
+
+def count_event(event, count=1):
+    # Rows created, updated or skipped, links made, audio objects seen and
+    # so on, counted by event name instead of logging a line for each.
+    # Outside an import there is nothing to count them into.
+    if not count:
+        return
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.count_event(event, count)
+
+
+def run_in_context(function):
+    # For threading.Thread targets and executor.submit: the callable runs
+    # in a copy of the caller's context, under the caller's import.
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(function, *args, **kwargs)
+
+
+class ImportMetrics:
+    """Wall time, rows, database queries and S3 requests per import stage."""
+
+    def __init__(self, name="import"):
+        self.name = name
+        self.stages = {}
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.s3_requests = 0
+        self.events = {}
+        self.rows = 0
+        self.logged = self.started
+        self.token = _current_metrics.set(self)
+
+    def get_stage(self, name):
+        with self.lock:
+            return self.stages.setdefault(
+                name,
+                {
+                    "calls": 0,
+                    "seconds": 0.0,
+                    "rows": 0,
+                    "queries": 0,
+                    "db_seconds": 0.0,
+                    "s3_requests": 0,
+                },
+            )
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        stats = self.get_stage(name)
+        queries = {"count": 0, "seconds": 0.0}
+
+        def count_query(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries["count"] += 1
+                queries["seconds"] += time.perf_counter() - started
+
+        stages = _current_stages.set(_current_stages.get() + (stats,))
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(count_query):
+                yield stats
+        finally:
+            elapsed = time.perf_counter() - started
+            _current_stages.reset(stages)
+            with self.lock:
+                stats["calls"] += 1
+                stats["seconds"] += elapsed
+                stats["rows"] += rows or 0
+                stats["queries"] += queries["count"]
+                stats["db_seconds"] += queries["seconds"]
+
+    def iterate(self, name, iterable, count=None):
+        # Times each step of a generator, e.g. reading a workbook chunk by
+        # chunk, as one stage; ``count`` gives the rows in an item.
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name) as stats:
+                item = next(iterator, None)
+                if item is not None and count is not None:
+                    stats["rows"] += count(item)
+            if item is None:
+                return
+            yield item
+
+    def count_s3_request(self, stages=()):
+        with self.lock:
+            self.s3_requests += 1
+            for stats in stages:
+                stats["s3_requests"] += 1
+
+    def count_event(self, event, count=1):
+        with self.lock:
+            self.events[event] = self.events.get(event, 0) + count
+
+    def get_events(self):
+        with self.lock:
+            return dict(sorted(self.events.items()))
+
+    def progress(self, rows):
+        # Called once per chunk; logs a line only every
+        # IMPORT_LOG_PROGRESS_SECONDS however small the chunks are.
+        with self.lock:
+            self.rows += rows
+            now = time.perf_counter()
+            if now - self.logged < IMPORT_LOG_PROGRESS_SECONDS:
+                return
+            self.logged = now
+        elapsed = now - self.started
+        logger.info(
+            "%s: %d rows in %.1fs (%.0f rows/s)",
+            self.name,
+            self.rows,
+            elapsed,
+            self.rows / elapsed,
+        )
+
+    def as_dict(self):
+        with self.lock:
+            stages = {
+                name: {
+                    **stats,
+                    "seconds": round(stats["seconds"], 3),
+                    "db_seconds": round(stats["db_seconds"], 3),
+                }
+                for name, stats in self.stages.items()
+            }
+        return {
+            "wall": round(time.perf_counter() - self.started, 3),
+            "queries": sum(stats["queries"] for stats in stages.values()),
+            "s3_requests": self.s3_requests,
+            "events": self.get_events(),
+            "stages": stages,
+        }
+
+    def emit_emf(self, namespace=IMPORT_METRICS_NAMESPACE):
+        # One record per stage, dimensioned by import and stage name; Lambda
+        # turns these stdout lines into CloudWatch metrics.
+        metrics = self.as_dict()
+        timestamp = int(time.time() * 1000)
+        units = {
+            "seconds": "Seconds",
+            "rows": "Count",
+            "queries": "Count",
+            "db_seconds": "Seconds",
+            "s3_requests": "Count",
+        }
+        for stage, stats in metrics["stages"].items():
+            record = {
+                "_aws": {
+                    "Timestamp": timestamp,
+                    "CloudWatchMetrics": [
+                        {
+                            "Namespace": namespace,
+                            "Dimensions": [["Import", "Stage"]],
+                            "Metrics": [
+                                {"Name": name, "Unit": unit}
+                                for name, unit in units.items()
+                            ],
+                        }
+                    ],
+                },
+                "Import": self.name,
+                "Stage": stage,
+                **{name: stats[name] for name in units},
+            }
+            # Straight to stdout, not through logging: CloudWatch only picks
+            # up records that are a bare JSON line.
+            print(json.dumps(record), flush=True)
+        return metrics
+
+    def log_summary(self, metrics):
+        logger.info(
+            "%s finished in %.1fs: %d rows, %d queries, %d S3 requests",
+            self.name,
+            metrics["wall"],
+            self.rows,
+            metrics["queries"],
+            metrics["s3_requests"],
+        )
+        if metrics["events"]:
+            logger.info(
+                "%s events: %s",
+                self.name,
+                ", ".join(f"{e}={n}" for e, n in metrics["events"].items()),
+            )
+
+    def finish(self):
+        metrics = self.emit_emf() if IMPORT_METRICS_EMF else self.as_dict()
+        self.log_summary(metrics)
+        if _current_metrics.get() is self:
+            _current_metrics.reset(self.token)
+        return metrics
+
+
+def measure(metrics, name, rows=None):
+    if metrics is None:
+        return nullcontext()
+    return metrics.stage(name, rows=rows)
+
+
+def count_rows(table_dfs):
+    return max(
+        (len(table_df) for table_df in table_dfs.values() if table_df is not None),
+        default=0,
+    )
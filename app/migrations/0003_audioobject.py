@@ -0,0 +1,32 @@
+# Generated by Django 5.0.3 on 2026-10-18 09:12
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_remove_booth_boothmaintainerid_booth_maintaineremail_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AudioObject',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('bucket', models.CharField(max_length=255)),
+                ('key', models.CharField(max_length=1024)),
+                ('etag', models.CharField(blank=True, max_length=255, null=True)),
+                ('size', models.BigIntegerField(default=0)),
+                ('lastModified', models.DateTimeField(blank=True, null=True)),
+                ('deletedAt', models.DateTimeField(blank=True, null=True)),
+                ('createdAt', models.DateTimeField(auto_now_add=True)),
+                ('updatedAt', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'audio_object',
+                'constraints': [models.UniqueConstraint(fields=('bucket', 'key'), name='audio_object_bucket_key_uniq')],
+            },
+        ),
+    ]
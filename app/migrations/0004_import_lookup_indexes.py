@@ -0,0 +1,89 @@
+# Generated by Django 5.0.3 on 2026-10-18 10:41
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def delete_duplicate_links(apps, schema_editor):
+    # The importer only ever creates a link when no row for the pair exists
+    # (soft-deleted ones included), so duplicates can only come from
+    # concurrent runs. Keep one row per pair, preferring a live one.
+    links = [
+        ("PoetAndPoem", ["poemId", "poetId"]),
+        ("PoemCollectionAndPoem", ["poemCollectionId", "poemId"]),
+        ("BoothAndPoemCollection", ["poemCollectionId", "boothId"]),
+    ]
+    for model_name, fields in links:
+        model = apps.get_model("app", model_name)
+        ordering = ["pk"]
+        if any(field.name == "deletedAt" for field in model._meta.fields):
+            ordering.insert(0, F("deletedAt").asc(nulls_first=True))
+        seen = set()
+        duplicate_ids = []
+        rows = model.objects.order_by(*ordering).values_list("id", *fields)
+        for row in rows.iterator():
+            if row[1:] in seen:
+                duplicate_ids.append(row[0])
+            else:
+                seen.add(row[1:])
+        for i in range(0, len(duplicate_ids), 500):
+            model.objects.filter(id__in=duplicate_ids[i : i + 500]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_audioobject'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='poet',
+            index=models.Index(fields=['creditedFirstName', 'creditedLastName'], name='poet_credited_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='era',
+            index=models.Index(fields=['name'], name='era_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='language',
+            index=models.Index(fields=['name'], name='language_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='poem',
+            index=models.Index(fields=['telepoemNumber'], name='poem_telepoem_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='poemcollection',
+            index=models.Index(fields=['poemCollectionName'], name='poem_collection_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='phonetype',
+            index=models.Index(fields=['name'], name='phone_type_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='directorytype',
+            index=models.Index(fields=['name'], name='directory_type_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='boothmaintainer',
+            index=models.Index(fields=['name'], name='booth_maintainer_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booth',
+            index=models.Index(fields=['boothName', 'maintainerName'], name='booth_name_maintainer_idx'),
+        ),
+        migrations.RunPython(delete_duplicate_links, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='poetandpoem',
+            constraint=models.UniqueConstraint(fields=('poemId', 'poetId'), name='poet_and_poem_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='poemcollectionandpoem',
+            constraint=models.UniqueConstraint(fields=('poemCollectionId', 'poemId'), name='poem_collection_and_poem_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='boothandpoemcollection',
+            constraint=models.UniqueConstraint(fields=('poemCollectionId', 'boothId'), name='booth_and_poem_collection_uniq'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.3 on 2026-10-18 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_import_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booth',
+            name='sourceHash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='poem',
+            name='sourceHash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='poemcollection',
+            name='sourceHash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='poet',
+            name='sourceHash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
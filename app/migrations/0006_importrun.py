@@ -0,0 +1,36 @@
+# Generated by Django 5.0.3 on 2026-10-18 14:25
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_source_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportRun',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('bucket', models.CharField(blank=True, max_length=255, null=True)),
+                ('key', models.CharField(max_length=1024)),
+                ('etag', models.CharField(blank=True, max_length=255, null=True)),
+                ('contentHash', models.CharField(blank=True, max_length=64, null=True)),
+                ('status', models.CharField(default='running', max_length=32)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('counts', models.JSONField(blank=True, null=True)),
+                ('startedAt', models.DateTimeField(blank=True, null=True)),
+                ('finishedAt', models.DateTimeField(blank=True, null=True)),
+                ('duration', models.FloatField(blank=True, null=True)),
+                ('createdAt', models.DateTimeField(auto_now_add=True)),
+                ('updatedAt', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'import_run',
+                'indexes': [models.Index(fields=['key', 'status', 'finishedAt'], name='import_run_key_status_idx')],
+            },
+        ),
+    ]
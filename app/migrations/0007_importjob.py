@@ -0,0 +1,36 @@
+# Generated by Django 5.0.3 on 2026-10-18 15:05
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_importrun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('fileName', models.CharField(blank=True, max_length=255, null=True)),
+                ('filePath', models.CharField(max_length=1024)),
+                ('stream', models.BooleanField(default=False)),
+                ('chunkSize', models.IntegerField(blank=True, null=True)),
+                ('status', models.CharField(default='queued', max_length=32)),
+                ('stage', models.CharField(blank=True, max_length=64, null=True)),
+                ('rowsProcessed', models.IntegerField(default=0)),
+                ('counts', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('startedAt', models.DateTimeField(blank=True, null=True)),
+                ('finishedAt', models.DateTimeField(blank=True, null=True)),
+                ('createdAt', models.DateTimeField(auto_now_add=True)),
+                ('updatedAt', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'import_job',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audioobject',
+            name='linkedAt',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
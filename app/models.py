@@ -21,11 +21,18 @@ class Poet(models.Model):
     creditedLastName = models.CharField(max_length=255, default="anonymous")
     poetImage = models.CharField(max_length=255, null=True, blank=True)
     poetBiography = models.TextField(null=True, blank=True)
+    sourceHash = models.CharField(max_length=64, blank=True, null=True)
     createdAt = models.DateTimeField(auto_now_add=True)
     updatedAt = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = "poet"
+        indexes = [
+            models.Index(
+                fields=["creditedFirstName", "creditedLastName"],
+                name="poet_credited_name_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.legalFirstName + " " + self.legalLastName
@@ -40,6 +47,7 @@ class Era(models.Model):
 
     class Meta:
         db_table = "era"
+        indexes = [models.Index(fields=["name"], name="era_name_idx")]
 
 
 class PoemType(models.Model):
@@ -79,6 +87,7 @@ class Language(models.Model):
 
     class Meta:
         db_table = "language"
+        indexes = [models.Index(fields=["name"], name="language_name_idx")]
 
 
 class Poem(models.Model):
@@ -105,6 +114,7 @@ class Poem(models.Model):
     telepoemNumber = models.CharField(max_length=255, blank=True, null=True)
     copyRights = models.CharField(max_length=255, blank=True, null=True)
     poemText = models.TextField(blank=True, null=True)
+    sourceHash = models.CharField(max_length=64, blank=True, null=True)
     createdAt = models.DateTimeField(auto_now_add=True)
     updatedAt = models.DateTimeField(auto_now=True)
 
@@ -115,6 +125,9 @@ class Poem(models.Model):
 
     class Meta:
         db_table = "poem"
+        indexes = [
+            models.Index(fields=["telepoemNumber"], name="poem_telepoem_number_idx"),
+        ]
 
 
 class PoetAndPoem(models.Model):
@@ -124,6 +137,11 @@ class PoetAndPoem(models.Model):
 
     class Meta:
         db_table = "poet_and_poem"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["poemId", "poetId"], name="poet_and_poem_uniq"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.poetId} - {self.poemId}"
@@ -133,12 +151,18 @@ class PoemCollection(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     poemCollectionName = models.CharField(max_length=255, blank=True, null=True)
     poemCollectionDescription = models.TextField(blank=True, null=True)
+    sourceHash = models.CharField(max_length=64, blank=True, null=True)
     createdAt = models.DateTimeField(auto_now_add=True)
     updatedAt = models.DateTimeField(auto_now=True)
     deletedAt = models.DateTimeField(blank=True, null=True)
 
     class Meta:
         db_table = "poem_collection"
+        indexes = [
+            models.Index(
+                fields=["poemCollectionName"], name="poem_collection_name_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.poemCollectionName
@@ -152,6 +176,12 @@ class PoemCollectionAndPoem(models.Model):
 
     class Meta:
         db_table = "poem_collection_and_poem"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["poemCollectionId", "poemId"],
+                name="poem_collection_and_poem_uniq",
+            ),
+        ]
 
     def __str__(self):
         return str(self.id)
@@ -164,6 +194,7 @@ class PhoneType(models.Model):
 
     class Meta:
         db_table = "phone_type"
+        indexes = [models.Index(fields=["name"], name="phone_type_name_idx")]
 
 
 class TelepoemBoothType(models.Model):
@@ -184,6 +215,7 @@ class DirectoryType(models.Model):
 
     class Meta:
         db_table = "directory_type"
+        indexes = [models.Index(fields=["name"], name="directory_type_name_idx")]
 
 
 class BoothMaintainer(models.Model):
@@ -200,6 +232,7 @@ class BoothMaintainer(models.Model):
 
     class Meta:
         db_table = "booth_maintainer"
+        indexes = [models.Index(fields=["name"], name="booth_maintainer_name_idx")]
 
     def __str__(self):
         return self.name
@@ -232,11 +265,18 @@ class Booth(models.Model):
     maintainerNumber = models.CharField(max_length=255, blank=True, null=True)
     # deviceInfo = models.TextField(blank=True, null=True)
     boothImage = models.CharField(max_length=255, blank=True, null=True)
+    sourceHash = models.CharField(max_length=64, blank=True, null=True)
     createdAt = models.DateTimeField(auto_now_add=True)
     updatedAt = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = "booth"
+        indexes = [
+            models.Index(
+                fields=["boothName", "maintainerName"],
+                name="booth_name_maintainer_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.boothName
@@ -252,6 +292,98 @@ class BoothAndPoemCollection(models.Model):
 
     class Meta:
         db_table = "booth_and_poem_collection"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["poemCollectionId", "boothId"],
+                name="booth_and_poem_collection_uniq",
+            ),
+        ]
 
     def __str__(self):
         return str(self.id)
+
+
+class AudioObject(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    bucket = models.CharField(max_length=255)
+    key = models.CharField(max_length=1024)
+    etag = models.CharField(max_length=255, blank=True, null=True)
+    size = models.BigIntegerField(default=0)
+    lastModified = models.DateTimeField(blank=True, null=True)
+    deletedAt = models.DateTimeField(blank=True, null=True)
+    # The updatedAt add_links last brought poem links in line with.
+    linkedAt = models.DateTimeField(blank=True, null=True)
+    createdAt = models.DateTimeField(auto_now_add=True)
+    updatedAt = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "audio_object"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["bucket", "key"], name="audio_object_bucket_key_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.bucket}/{self.key}"
+
+
+class ImportRun(models.Model):
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    SKIPPED = "skipped"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    bucket = models.CharField(max_length=255, blank=True, null=True)
+    key = models.CharField(max_length=1024)
+    etag = models.CharField(max_length=255, blank=True, null=True)
+    contentHash = models.CharField(max_length=64, blank=True, null=True)
+    status = models.CharField(max_length=32, default=RUNNING)
+    error = models.TextField(blank=True, null=True)
+    counts = models.JSONField(blank=True, null=True)
+    startedAt = models.DateTimeField(blank=True, null=True)
+    finishedAt = models.DateTimeField(blank=True, null=True)
+    duration = models.FloatField(blank=True, null=True)
+    createdAt = models.DateTimeField(auto_now_add=True)
+    updatedAt = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "import_run"
+        indexes = [
+            models.Index(
+                fields=["key", "status", "finishedAt"],
+                name="import_run_key_status_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.key} {self.status} {self.startedAt}"
+
+
+class ImportJob(models.Model):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    fileName = models.CharField(max_length=255, blank=True, null=True)
+    filePath = models.CharField(max_length=1024)
+    stream = models.BooleanField(default=False)
+    chunkSize = models.IntegerField(blank=True, null=True)
+    status = models.CharField(max_length=32, default=QUEUED)
+    stage = models.CharField(max_length=64, blank=True, null=True)
+    rowsProcessed = models.IntegerField(default=0)
+    counts = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True, null=True)
+    startedAt = models.DateTimeField(blank=True, null=True)
+    finishedAt = models.DateTimeField(blank=True, null=True)
+    createdAt = models.DateTimeField(auto_now_add=True)
+    updatedAt = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "import_job"
+
+    def __str__(self):
+        return f"{self.fileName} {self.status}"
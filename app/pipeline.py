@@ -0,0 +1,267 @@
+import logging
+import queue
+import threading
+import time
+
+from django.db import connection
+
+from .metrics import count_rows, measure, run_in_context
+from .utils import (
+    IMPORT_CHUNK_SIZE,
+    IMPORT_PARALLEL_TABLES,
+    DimensionCache,
+    EntityCache,
+    flush_tables,
+    iter_table_chunks,
+    transform_tables,
+    write_tables,
+)
+
+PIPELINE_QUEUE_SIZE = 4
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of a stage's output.
+_DONE = object()
+
+
+class PipelineAborted(Exception):
+    pass
+
+
+class Stage:
+    """One pipeline stage: a thread between two queues."""
+
+    def __init__(self, name, pipeline, source, output=None):
+        self.name = name
+        self.pipeline = pipeline
+        self.source = source
+        self.output = output
+        self.chunks = 0
+        self.rows = 0
+        self.busy = 0.0
+        self.waiting = 0.0
+        self.queue_depths = []
+        self.thread = threading.Thread(
+            target=run_in_context(self.run), name=f"import-{name}", daemon=True
+        )
+
+    def process(self, item):
+        raise NotImplementedError
+
+    def finish(self):
+        # Called once the source is exhausted.
+        pass
+
+    def items(self):
+        while True:
+            started = time.perf_counter()
+            item = self.pipeline.get(self.source)
+            self.waiting += time.perf_counter() - started
+            if item is _DONE:
+                return
+            yield item
+
+    def put(self, item):
+        started = time.perf_counter()
+        self.queue_depths.append(self.output.qsize())
+        self.pipeline.put(self.output, item)
+        self.waiting += time.perf_counter() - started
+
+    def run(self):
+        try:
+            for item in self.items():
+                started = time.perf_counter()
+                result = self.process(item)
+                self.busy += time.perf_counter() - started
+                self.chunks += 1
+                self.rows += count_rows(item)
+                if self.output is not None:
+                    self.put(result)
+            started = time.perf_counter()
+            self.finish()
+            self.busy += time.perf_counter() - started
+            if self.output is not None:
+                self.pipeline.put(self.output, _DONE)
+        except PipelineAborted:
+            pass
+        except Exception as e:
+            logger.error("Error: %s", e)
+            self.pipeline.abort(e)
+        finally:
+            connection.close()
+
+    def get_metrics(self):
+        elapsed = self.busy + self.waiting
+        metrics = {
+            "chunks": self.chunks,
+            "rows": self.rows,
+            "busy": round(self.busy, 3),
+            "waiting": round(self.waiting, 3),
+            "rows_per_second": round(self.rows / self.busy, 1) if self.busy else None,
+            "utilization": round(self.busy / elapsed, 3) if elapsed else None,
+        }
+        if self.output is not None and self.queue_depths:
+            metrics["output_queue_depth"] = {
+                "max": max(self.queue_depths),
+                "mean": round(sum(self.queue_depths) / len(self.queue_depths), 2),
+            }
+        return metrics
+
+
+class ParseStage(Stage):
+    def __init__(
+        self, pipeline, file, chunk_size, input_format, output, metrics, chunks
+    ):
+        super().__init__("parse", pipeline, None, output)
+        self.file = file
+        self.chunk_size = chunk_size
+        self.input_format = input_format
+        self.metrics = metrics
+        # Already read tables, e.g. from the cache, instead of the file.
+        self.table_chunks = chunks
+
+    def items(self):
+        # The parser is the source: it pulls chunks straight off the reader.
+        chunks = self.table_chunks
+        if chunks is None:
+            chunks = iter_table_chunks(
+                self.file,
+                stream=True,
+                chunk_size=self.chunk_size,
+                input_format=self.input_format,
+            )
+        if self.metrics is not None:
+            chunks = self.metrics.iterate("parse", chunks, count=count_rows)
+        while True:
+            started = time.perf_counter()
+            table_dfs = next(chunks, _DONE)
+            self.busy += time.perf_counter() - started
+            if table_dfs is _DONE or self.pipeline.error is not None:
+                return
+            yield table_dfs
+
+    def process(self, table_dfs):
+        return table_dfs
+
+
+class TransformStage(Stage):
+    def __init__(self, pipeline, source, output, metrics):
+        super().__init__("transform", pipeline, source, output)
+        self.metrics = metrics
+
+    def process(self, table_dfs):
+        with measure(self.metrics, "transform", rows=count_rows(table_dfs)):
+            return transform_tables(table_dfs)
+
+
+class WriteStage(Stage):
+    def __init__(
+        self,
+        pipeline,
+        source,
+        dimensions,
+        audio_index,
+        counts,
+        metrics,
+        parallel,
+        entities,
+    ):
+        super().__init__("write", pipeline, source)
+        self.dimensions = dimensions
+        self.audio_index = audio_index
+        self.counts = counts
+        self.metrics = metrics
+        self.parallel = parallel
+        self.entities = entities
+
+    def process(self, table_dfs):
+        # Chunks arrive in sheet order and each one is written in table
+        # dependency order, so every chunk sees the ids it needs.
+        counts = write_tables(
+            table_dfs,
+            dimensions=self.dimensions,
+            audio_index=self.audio_index,
+            counts=self.counts,
+            metrics=self.metrics,
+            parallel=self.parallel,
+            entities=self.entities,
+        )
+        if self.metrics is not None:
+            self.metrics.progress(count_rows(table_dfs))
+        return counts
+
+    def finish(self):
+        flush_tables(self.entities, counts=self.counts, metrics=self.metrics)
+
+
+class ImportPipeline:
+    """Parses, transforms and writes a workbook on three threads."""
+
+    def __init__(
+        self,
+        file,
+        chunk_size=IMPORT_CHUNK_SIZE,
+        dimensions=None,
+        audio_index=None,
+        queue_size=PIPELINE_QUEUE_SIZE,
+        metrics=None,
+        parallel=IMPORT_PARALLEL_TABLES,
+        input_format="xlsx",
+        chunks=None,
+        entities=None,
+    ):
+        self.error = None
+        self.counts = {}
+        parsed = queue.Queue(maxsize=queue_size)
+        transformed = queue.Queue(maxsize=queue_size)
+        self.stages = [
+            ParseStage(self, file, chunk_size, input_format, parsed, metrics, chunks),
+            TransformStage(self, parsed, transformed, metrics),
+            WriteStage(
+                self,
+                transformed,
+                dimensions or DimensionCache(),
+                audio_index,
+                self.counts,
+                metrics,
+                parallel,
+                entities or EntityCache(),
+            ),
+        ]
+
+    def abort(self, error):
+        if self.error is None:
+            self.error = error
+
+    def get(self, source):
+        while True:
+            if self.error is not None:
+                raise PipelineAborted()
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+    def put(self, output, item):
+        while True:
+            if self.error is not None:
+                raise PipelineAborted()
+            try:
+                return output.put(item, timeout=0.1)
+            except queue.Full:
+                continue
+
+    def run(self):
+        started = time.perf_counter()
+        for stage in self.stages:
+            stage.thread.start()
+        for stage in self.stages:
+            stage.thread.join()
+        if self.error is not None:
+            raise self.error
+        self.metrics = {
+            "wall": round(time.perf_counter() - started, 3),
+            "stages": {stage.name: stage.get_metrics() for stage in self.stages},
+        }
+        return self.counts
@@ -1,3 +1,1372 @@
-from django.test import TestCase
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import lambda_function
+import numpy as np
+import pandas as pd
+from benchmarks.table_split import build_sheet
+from benchmarks.workbook import EXTENSIONS, build_input_file
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.wsgi import WSGIRequest
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+
+from .cache import ParsedTableCache
+from .jobs import create_import_job, fail_stale_jobs
+from .management.commands.add_links import add_links
+from .management.commands.run_process import run_process
+from .metrics import ImportMetrics, count_event, run_in_context
+from .models import (
+    Booth,
+    BoothAndPoemCollection,
+    BoothMaintainer,
+    DirectoryType,
+    Era,
+    ImportJob,
+    ImportRun,
+    Language,
+    PhoneType,
+    Poem,
+    PoemCollection,
+    PoemCollectionAndPoem,
+    PoemTopic,
+    PoemType,
+    Poet,
+    PoetAndPoem,
+)
+from .pipeline import ImportPipeline
+from .utils import (
+    AUDIO_BUCKET_NAME,
+    IMPORT_CHUNK_SIZE,
+    S3,
+    S3_MAX_POOL_CONNECTIONS,
+    AudioKeyIndex,
+    DimensionCache,
+    EntityCache,
+    Handler,
+    TableName,
+    TableProcessor,
+    TableWriter,
+    flush_tables,
+    get_audio_index,
+    iter_table_chunks,
+    process_tables,
+    transform_tables,
+    write_tables,
+)
+
+try:
+    from moto import mock_aws
+except ImportError:
+    mock_aws = None
+
+AWS_TEST_ENV = {
+    "AWS_ACCESS_KEY_ID": "testing",
+    "AWS_SECRET_ACCESS_KEY": "testing",
+    "AWS_DEFAULT_REGION": "us-east-1",
+}
+
+
+POETS = TableName.POET_INFORMATION.value
+POEMS = TableName.POEM_INFORMATION.value
+BOOTHS = TableName.BOOTH_INFORMATION.value
+POEM_COLLECTIONS = TableName.POEM_COLLECTION_INFORMATION.value
+
+# What the ids of each model stand for in ImportTestMixin.get_snapshot().
+SNAPSHOT_NAMES = {
+    Poet: ["creditedFirstName", "creditedLastName"],
+    Poem: ["telepoemNumber"],
+    Booth: ["boothName", "maintainerName"],
+    PoemCollection: ["poemCollectionName"],
+    Era: ["name"],
+    PoemType: ["name"],
+    PoemTopic: ["name"],
+    Language: ["name"],
+    PhoneType: ["name"],
+    DirectoryType: ["name"],
+    BoothMaintainer: ["name"],
+}
+SNAPSHOT_MODELS = list(SNAPSHOT_NAMES) + [
+    PoetAndPoem,
+    PoemCollectionAndPoem,
+    BoothAndPoemCollection,
+]
+SNAPSHOT_IGNORED_FIELDS = {
+    "id",
+    "poemTypeId",
+    "poemTopicId",
+    "languageId",
+    "createdAt",
+    "updatedAt",
+    # Hashes the ids of the rows too.
+    "sourceHash",
+}
+UUID_PATTERN = re.compile(
+    "[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"
+)
+
+
+def command_stub(error=None, **options):
+    # Stands in for a Lambda command: returns its options, or raises.
+    if error is not None:
+        raise RuntimeError(error)
+    return {"options": options, "metrics": {"wall": 1.5}}
+
+
+# The fields the row-by-row poets_handler copied onto an existing poet.
+LEGACY_POET_FIELDS = [
+    "address",
+    "poetBiography",
+    "creditedFirstName",
+    "creditedLastName",
+    "email",
+    "state",
+    "status",
+    "city",
+    "isLaureate",
+    "phoneNum",
+    "photoCredit",
+    "website",
+    "zipCode",
+]
+
+
+def get_cells(table_df):
+    # [(column, dtype, [(type, value)])], with NaN comparing equal.
+    def comparable(value):
+        return "NaN" if value != value else value
+
+    return [
+        (
+            comparable(column),
+            str(table_df.iloc[:, i].dtype),
+            [(type(value), comparable(value)) for value in table_df.iloc[:, i]],
+        )
+        for i, column in enumerate(table_df.columns)
+    ]
+
+
+def split_tables_row_by_row(df):
+    # TableProcessor before the vectorized split: tables found column by
+    # column, rows with iterrows(), each table built from a list of rows.
+    tables_info = []
+    for i, column in enumerate(df.columns):
+        if "Unnamed:" not in column and df[column].notnull().any():
+            if tables_info:
+                tables_info[-1]["ending_index"] = i
+            tables_info.append({"table_name": column, "starting_index": i})
+    tables_info[-1]["ending_index"] = len(df.columns)
+    columns = None
+    data = []
+    for _, row in df.iterrows():
+        if not row.isnull().values.all():
+            if columns is None:
+                columns = row.values
+            else:
+                data.append(row.values)
+    table_dfs = {}
+    for table_info in tables_info:
+        start, end = table_info["starting_index"], table_info["ending_index"]
+        table_df = pd.DataFrame(
+            [row[start:end] for row in data], columns=columns[start:end]
+        )
+        table_df = table_df.drop(columns="tableSeperator", errors="ignore")
+        table_df = table_df.fillna("").replace({np.nan: None, pd.NaT: None})
+        table_dfs[table_info["table_name"]] = None if table_df.empty else table_df
+    return table_dfs
+
+
+def get_or_create_named(model, name):
+    return model.objects.filter(name=name).first() or model.objects.create(name=name)
+
+
+def legacy_poets_handler(poets_df):
+    # Handler.poets_handler before the bulk rewrite: a lookup and a save or
+    # create per row.
+    poet_ids = []
+    for poet in poets_df.to_dict("records"):
+        poet_obj = Poet.objects.filter(
+            creditedFirstName=poet["creditedFirstName"],
+            creditedLastName=poet["creditedLastName"],
+        ).first()
+        if poet_obj is None:
+            poet_obj = Poet.objects.create(**poet)
+        else:
+            for field in LEGACY_POET_FIELDS:
+                if poet[field]:
+                    setattr(poet_obj, field, poet[field])
+            poet_obj.save()
+        poet_ids.append(poet_obj.id)
+    return poet_ids
+
+
+def legacy_booths_handler(booths_df):
+    # Handler.booths_handler before the bulk rewrite: lookups, then a save
+    # or create, for every booth of every row.
+    booth_ids_list = []
+    for booth in booths_df.to_dict("records"):
+        booth_names = booth["boothName"].split("; ")
+        booth_numbers = str(booth["number"]).split("; ")
+        phone_types = booth["phoneType"].split("; ")
+        booth_ids = []
+        for i in range(max(len(booth_names), len(booth_numbers), len(phone_types))):
+            phone_type = get_or_create_named(
+                PhoneType, phone_types[min(i, len(phone_types) - 1)]
+            )
+            directory_type = get_or_create_named(DirectoryType, booth["directoryType"])
+            maintainer_name = None
+            if booth["maintainerName"]:
+                maintainer_name = get_or_create_named(
+                    BoothMaintainer, booth["maintainerName"]
+                ).name
+            booth_name = booth_names[min(i, len(booth_names) - 1)]
+            fields = {
+                "number": booth_numbers[min(i, len(booth_numbers) - 1)],
+                "phoneTypeId": phone_type.id,
+                "directoryTypeId": directory_type.id,
+                "physicalAddress": booth["physicalAddress"],
+                "city": booth["city"],
+                "state": booth["state"],
+                "zipCode": None if booth["zipCode"] == "" else booth["zipCode"],
+                "installationDate": booth["installationDate"],
+                "installationType": booth["installationType"],
+                "active": booth["active"],
+                "isADAAccessible": booth["isADAAccessible"],
+            }
+            booth_obj = Booth.objects.filter(
+                boothName=booth_name, maintainerName=maintainer_name
+            ).first()
+            if booth_obj is None:
+                booth_obj = Booth.objects.create(
+                    boothName=booth_name, maintainerName=maintainer_name, **fields
+                )
+            else:
+                for field, value in fields.items():
+                    setattr(booth_obj, field, value)
+                booth_obj.save()
+            booth_ids.append(booth_obj.id)
+        booth_ids_list.append(booth_ids)
+    return booth_ids_list
+
+
+def legacy_poem_collections_handler(collections_df):
+    # Handler.poem_collections_handler before the bulk rewrite: a lookup
+    # per collection, poem and booth pair.
+    for row in collections_df.to_dict("records"):
+        for name in row["poemCollectionName"].split("; "):
+            collection = PoemCollection.objects.filter(poemCollectionName=name).first()
+            if collection is None:
+                collection = PoemCollection.objects.create(
+                    poemCollectionName=name,
+                    poemCollectionDescription=row["poemCollectionDescription"],
+                )
+            else:
+                collection.poemCollectionDescription = row["poemCollectionDescription"]
+                collection.save()
+            if not PoemCollectionAndPoem.objects.filter(
+                poemCollectionId=collection.id, poemId=row["poemId"]
+            ).exists():
+                PoemCollectionAndPoem.objects.create(
+                    poemCollectionId=collection.id, poemId=row["poemId"]
+                )
+            for booth_id in row["boothId"]:
+                if not BoothAndPoemCollection.objects.filter(
+                    boothId=booth_id, poemCollectionId=collection.id
+                ).exists():
+                    BoothAndPoemCollection.objects.create(
+                        boothId=booth_id, poemCollectionId=collection.id
+                    )
+
+
+@skipUnless(mock_aws, "moto is not installed")
+class S3TestCase(TestCase):
+    """Runs against moto's in-memory S3 with the audio bucket created."""
+
+    def setUp(self):
+        environ = mock.patch.dict(os.environ, AWS_TEST_ENV)
+        environ.start()
+        self.addCleanup(environ.stop)
+        aws = mock_aws()
+        aws.start()
+        self.addCleanup(aws.stop)
+        # Clients built outside the mock would talk to the real S3.
+        S3.reset_s3_clients()
+        self.addCleanup(S3.reset_s3_clients)
+        self.s3_client = S3(AUDIO_BUCKET_NAME).get_s3_client()
+        self.s3_client.create_bucket(Bucket=AUDIO_BUCKET_NAME)
+
+    def put_audio(self, telepoem_number, body=b"audio"):
+        self.s3_client.put_object(
+            Bucket=AUDIO_BUCKET_NAME,
+            Key=f"poem/audio/{telepoem_number}.mp3",
+            Body=body,
+        )
+
+    def delete_audio(self, telepoem_number):
+        self.s3_client.delete_object(
+            Bucket=AUDIO_BUCKET_NAME, Key=f"poem/audio/{telepoem_number}.mp3"
+        )
+
+
+class ImportTestMixin:
+    """Imports a generated workbook the way run_process does, minus S3."""
+
+    rows = 120
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.path = build_input_file(
+            os.path.join(cls.directory.name, "workbook.xlsx"), cls.rows
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def run_import(
+        self,
+        stream=False,
+        chunk_size=IMPORT_CHUNK_SIZE,
+        parallel=False,
+        path=None,
+        input_format="xlsx",
+    ):
+        # Returns the counts and the SQL of every write.
+        dimensions = DimensionCache()
+        entities = EntityCache()
+        audio_index = AudioKeyIndex(AUDIO_BUCKET_NAME, [])
+        counts = {}
+        with CaptureQueriesContext(connection) as queries:
+            for table_dfs in iter_table_chunks(
+                path or self.path,
+                stream=stream,
+                chunk_size=chunk_size,
+                input_format=input_format,
+            ):
+                process_tables(
+                    table_dfs,
+                    dimensions=dimensions,
+                    audio_index=audio_index,
+                    counts=counts,
+                    parallel=parallel,
+                    entities=entities,
+                )
+            flush_tables(entities, counts=counts)
+        writes = [
+            query["sql"]
+            for query in queries
+            if query["sql"].split()[0] in ["INSERT", "UPDATE", "DELETE"]
+        ]
+        return counts, writes
+
+    def get_snapshot(self):
+        # Every imported row without its own id and timestamps, with the
+        # ids it refers to replaced by what they name.
+        names = {}
+        for model, fields in SNAPSHOT_NAMES.items():
+            for pk, *values in model.objects.values_list("pk", *fields):
+                names[str(pk)] = "/".join(map(str, values))
+
+        def name_ids(value):
+            return UUID_PATTERN.sub(lambda match: names[match.group()], str(value))
+
+        return {
+            model.__name__: sorted(
+                sorted(
+                    (field, name_ids(value))
+                    for field, value in row.items()
+                    if field not in SNAPSHOT_IGNORED_FIELDS
+                )
+                for row in model.objects.values()
+            )
+            for model in SNAPSHOT_MODELS
+        }
+
+
+class ImportTestCase(ImportTestMixin, TestCase):
+    pass
+
+
+class ThreadedImportTestCase(ImportTestMixin, TransactionTestCase):
+    """For imports writing from other threads, on their own connections,
+    which do not see the rows of a test's transaction."""
+
+    def setUp(self):
+        super().setUp()
+        if connection.vendor != "sqlite":
+            return
+        # SQLite's shared in-memory test database fails a write while
+        # another connection writes instead of waiting for it, so tables
+        # written in parallel take turns in the database.
+        lock = threading.Lock()
+        handle_table = TableWriter.handle_table
+
+        def handle_table_in_turn(*args):
+            with lock:
+                return handle_table(*args)
+
+        patcher = mock.patch.object(TableWriter, "handle_table", handle_table_in_turn)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class ParsedTableCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = build_input_file(os.path.join(directory.name, "workbook.xlsx"), 60)
+        self.cache = ParsedTableCache(os.path.join(directory.name, "cache"))
+        self.key = self.cache.get_key("etag", "xlsx", True, 25)
+
+    def read(self):
+        return list(iter_table_chunks(self.path, stream=True, chunk_size=25))
+
+    def store(self, chunks):
+        return list(self.cache.writer(self.key, chunks, "content-hash"))
+
+    def assertSameChunks(self, loaded, chunks):
+        self.assertEqual(len(loaded), len(chunks))
+        for loaded_dfs, table_dfs in zip(loaded, chunks):
+            self.assertEqual(list(loaded_dfs), list(table_dfs))
+            for table_name, table_df in table_dfs.items():
+                loaded_df = loaded_dfs[table_name]
+                if table_df is None:
+                    self.assertIsNone(loaded_df)
+                    continue
+                self.assertTrue(loaded_df.index.equals(table_df.index))
+                self.assertEqual(list(loaded_df.columns), list(table_df.columns))
+                for column in table_df.columns:
+                    # Same values of the same types, e.g. a zipCode of 85004
+                    # next to an empty one stays an int and a str.
+                    self.assertEqual(
+                        [(type(value), value) for value in loaded_df[column]],
+                        [(type(value), value) for value in table_df[column]],
+                    )
+
+    def test_cached_chunks_are_the_chunks_read(self):
+        chunks = self.read()
+        self.store(chunks)
+        self.assertEqual(self.cache.get(self.key), "content-hash")
+        self.assertSameChunks(list(self.cache.load(self.key)), chunks)
+
+    def test_half_read_file_is_not_cached(self):
+        chunks = self.cache.writer(self.key, self.read(), "content-hash")
+        next(iter(chunks))
+        self.assertIsNone(self.cache.get(self.key))
+        chunks.complete()
+        self.assertEqual(self.cache.get(self.key), "content-hash")
+
+    def test_complete_gives_up_after_the_time_limit(self):
+        chunks = self.cache.writer(self.key, self.read(), "content-hash")
+        next(iter(chunks))
+        chunks.complete(seconds=0)
+        self.assertIsNone(self.cache.get(self.key))
+        self.assertEqual(os.listdir(self.cache.directory), [])
+
+    def test_directory_others_can_write_is_not_used(self):
+        os.makedirs(self.cache.directory, mode=0o777)
+        os.chmod(self.cache.directory, 0o777)
+        self.store(self.read())
+        self.assertEqual(os.listdir(self.cache.directory), [])
+        self.assertIsNone(self.cache.get(self.key))
+
+    def test_directory_of_another_user_is_not_used(self):
+        self.store(self.read())
+        with mock.patch("os.getuid", return_value=os.getuid() + 1):
+            self.assertIsNone(self.cache.get(self.key))
+
+    def test_directory_is_created_private(self):
+        self.store(self.read())
+        self.assertEqual(os.stat(self.cache.directory).st_mode & 0o777, 0o700)
+
+
+class TableSplitParityTests(SimpleTestCase):
+    """TableProcessor against the row-by-row split it replaced."""
+
+    def assertSameTables(self, df):
+        expected = split_tables_row_by_row(df)
+        table_dfs = TableProcessor(df).get_table_dataframes()
+        self.assertEqual(list(table_dfs), list(expected))
+        for table_name, table_df in expected.items():
+            with self.subTest(table=table_name):
+                if table_df is None:
+                    self.assertIsNone(table_dfs[table_name])
+                    continue
+                self.assertTrue(table_dfs[table_name].index.equals(table_df.index))
+                self.assertEqual(get_cells(table_dfs[table_name]), get_cells(table_df))
+
+    def test_excel_sheet(self):
+        self.assertSameTables(build_sheet(150))
+
+    def test_csv_sheet(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = build_input_file(
+                os.path.join(directory, "workbook.csv"), 150, input_format="csv"
+            )
+            self.assertSameTables(pd.read_csv(path, encoding="utf-8-sig"))
+
+    def test_sheet_with_blank_rows_and_an_empty_table(self):
+        df = build_sheet(60)
+        df.iloc[[10, 11, 40], :] = np.nan
+        df.iloc[:, -2:] = np.nan
+        self.assertSameTables(df)
+
+
+class ReaderParityTests(ImportTestCase):
+    """The Parquet and JSON lines readers against the workbook's."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.paths = {
+            input_format: build_input_file(
+                os.path.join(cls.directory.name, f"workbook{EXTENSIONS[input_format]}"),
+                cls.rows,
+                input_format=input_format,
+            )
+            for input_format in ["parquet", "jsonl"]
+        }
+
+    def get_tables(self, path, input_format, stream):
+        chunks = list(
+            iter_table_chunks(
+                path, stream=stream, chunk_size=50, input_format=input_format
+            )
+        )
+        return {
+            table_name: pd.concat(
+                [table_dfs[table_name] for table_dfs in chunks], ignore_index=True
+            )
+            for table_name in chunks[0]
+        }
+
+    def assertSameTables(self, table_dfs, expected):
+        self.assertEqual(list(table_dfs), list(expected))
+        for table_name, table_df in expected.items():
+            with self.subTest(table=table_name):
+                self.assertEqual(get_cells(table_dfs[table_name]), get_cells(table_df))
+
+    def test_parquet_tables(self):
+        # The streamed workbook, whose cells keep the types they were
+        # written with; pd.read_excel makes the whole sheet's zip codes floats.
+        expected = self.get_tables(self.path, "xlsx", stream=True)
+        for stream in [True, False]:
+            with self.subTest(stream=stream):
+                table_dfs = self.get_tables(self.paths["parquet"], "parquet", stream)
+                self.assertSameTables(table_dfs, expected)
+
+    def test_jsonl_tables(self):
+        # JSON has no dates, so a recording date is the text it was written as.
+        expected = self.get_tables(self.path, "xlsx", stream=True)
+        expected[POEMS]["recordingDate"] = [
+            "" if date is None else str(date)
+            for date in expected[POEMS]["recordingDate"]
+        ]
+        for stream in [True, False]:
+            with self.subTest(stream=stream):
+                table_dfs = self.get_tables(self.paths["jsonl"], "jsonl", stream)
+                self.assertSameTables(table_dfs, expected)
+
+    def test_every_format_imports_the_same_rows(self):
+        def run(**options):
+            with transaction.atomic():
+                counts, _ = self.run_import(**options)
+                snapshot = self.get_snapshot()
+                transaction.set_rollback(True)
+            return counts, snapshot
+
+        expected = run(stream=True, chunk_size=50)
+        self.assertEqual(run(), expected)
+        for input_format, path in self.paths.items():
+            for stream in [True, False]:
+                with self.subTest(input_format=input_format, stream=stream):
+                    self.assertEqual(
+                        run(
+                            stream=stream,
+                            chunk_size=50,
+                            path=path,
+                            input_format=input_format,
+                        ),
+                        expected,
+                    )
+
+
+class ReimportTests(ImportTestCase):
+    def test_unchanged_streamed_reimport_writes_nothing(self):
+        self.run_import(stream=True, chunk_size=40)
+        counts, writes = self.run_import(stream=True, chunk_size=40)
+        self.assertEqual(writes, [])
+        for table, table_counts in counts.items():
+            with self.subTest(table=table):
+                self.assertEqual(table_counts["created"], 0)
+                self.assertEqual(table_counts["updated"], 0)
+
+    def test_reimport_in_the_other_mode_writes_nothing(self):
+        self.run_import(stream=True, chunk_size=40)
+        _, writes = self.run_import()
+        self.assertEqual(writes, [])
+        self.run_import(stream=True, chunk_size=40)
+        _, writes = self.run_import(stream=True, chunk_size=40)
+        self.assertEqual(writes, [])
+
+    def test_entities_spanning_chunks_are_counted_once(self):
+        created, _ = self.run_import(stream=True, chunk_size=40)
+        skipped, _ = self.run_import(stream=True, chunk_size=40)
+        for table, model in [
+            ("poets", Poet),
+            ("booths", Booth),
+            ("poem_collections", PoemCollection),
+        ]:
+            with self.subTest(table=table):
+                total = model.objects.count()
+                self.assertEqual(
+                    created[table], {"created": total, "updated": 0, "skipped": 0}
+                )
+                self.assertEqual(
+                    skipped[table], {"created": 0, "updated": 0, "skipped": total}
+                )
+
+    def test_changed_entity_is_updated_once(self):
+        self.run_import(stream=True, chunk_size=40)
+        # As if every poet's rows had changed since the last import.
+        Poet.objects.update(email="stale@example.org", sourceHash="")
+        counts, _ = self.run_import(stream=True, chunk_size=40)
+        self.assertEqual(counts["poets"]["updated"], Poet.objects.count())
+        self.assertFalse(Poet.objects.filter(email="stale@example.org").exists())
+
+    def test_poem_column_that_is_not_stored_does_not_update(self):
+        self.run_import()
+        (table_dfs,) = iter_table_chunks(self.path)
+        tables = transform_tables(table_dfs)
+        # A column no poem field is written from.
+        tables[POEMS]["recordingNotes"] = "Re-mastered"
+        counts = write_tables(tables, audio_index=AudioKeyIndex(AUDIO_BUCKET_NAME, []))
+        self.assertEqual(
+            counts["poems"],
+            {"created": 0, "updated": 0, "skipped": Poem.objects.count()},
+        )
+
+
+class ImportPipelineTests(ThreadedImportTestCase):
+    def run_pipeline(self, **options):
+        return ImportPipeline(
+            self.path,
+            chunk_size=40,
+            audio_index=AudioKeyIndex(AUDIO_BUCKET_NAME, []),
+            **options,
+        ).run()
+
+    def test_pipeline_imports_what_the_sequential_import_does(self):
+        expected_counts, _ = self.run_import(stream=True, chunk_size=40)
+        expected = self.get_snapshot()
+        call_command("flush", interactive=False, verbosity=0)
+        counts = self.run_pipeline()
+        self.assertEqual(counts, expected_counts)
+        self.assertEqual(self.get_snapshot(), expected)
+
+    def test_write_error_stops_the_pipeline(self):
+        result = {}
+
+        def run():
+            try:
+                # Small queues fill up behind the failing write stage.
+                self.run_pipeline(queue_size=1)
+            except Exception as e:
+                result["error"] = e
+
+        with mock.patch(
+            "app.pipeline.write_tables", side_effect=RuntimeError("database is down")
+        ):
+            thread = threading.Thread(target=run)
+            thread.start()
+            thread.join(timeout=60)
+        self.assertFalse(thread.is_alive())
+        self.assertIsInstance(result["error"], RuntimeError)
+        self.assertEqual(str(result["error"]), "database is down")
+
+
+class ParallelTablesTests(ThreadedImportTestCase):
+    def test_parallel_tables_import_what_serial_tables_do(self):
+        expected_counts, _ = self.run_import(stream=True, chunk_size=40)
+        expected = self.get_snapshot()
+        call_command("flush", interactive=False, verbosity=0)
+        counts, _ = self.run_import(stream=True, chunk_size=40, parallel=True)
+        self.assertEqual(counts, expected_counts)
+        self.assertEqual(self.get_snapshot(), expected)
+
+    def test_tables_wait_for_their_dependencies(self):
+        events = []
+        handle_table = TableWriter.handle_table
+
+        def record(writer, table_name, table_df, ids):
+            events.append(("start", table_name))
+            # Long enough for tables that may run together to overlap.
+            time.sleep(0.1)
+            try:
+                return handle_table(writer, table_name, table_df, ids)
+            finally:
+                events.append(("end", table_name))
+
+        (table_dfs,) = iter_table_chunks(self.path)
+        with mock.patch.object(TableWriter, "handle_table", record):
+            write_tables(
+                transform_tables(table_dfs),
+                audio_index=AudioKeyIndex(AUDIO_BUCKET_NAME, []),
+                parallel=True,
+            )
+        for table_name, dependencies in TableWriter.DEPENDENCIES.items():
+            for dependency in dependencies:
+                with self.subTest(table=table_name, dependency=dependency):
+                    self.assertLess(
+                        events.index(("end", dependency)),
+                        events.index(("start", table_name)),
+                    )
+        # Poets and booths depend on nothing and are written together.
+        self.assertLess(events.index(("start", BOOTHS)), events.index(("end", POETS)))
+        self.assertLess(events.index(("start", POETS)), events.index(("end", BOOTHS)))
+
+
+class ImportLedgerTests(S3TestCase):
+    bucket_name = "bulk-import"
+
+    def setUp(self):
+        super().setUp()
+        environ = mock.patch.dict(os.environ, {"BUCKET_NAME": self.bucket_name})
+        environ.start()
+        self.addCleanup(environ.stop)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = build_input_file(os.path.join(directory.name, "workbook.xlsx"), 30)
+        self.s3_client.create_bucket(Bucket=self.bucket_name)
+        self.s3_client.upload_file(path, self.bucket_name, "bulkupload/workbook.xlsx")
+
+    def run_process(self, **options):
+        return run_process("workbook.xlsx", use_cache=False, **options)
+
+    def get_statuses(self):
+        return list(
+            ImportRun.objects.order_by("startedAt").values_list("status", flat=True)
+        )
+
+    def test_unchanged_etag_skips_the_run(self):
+        self.run_process()
+        poets = Poet.objects.count()
+        with mock.patch(
+            "app.management.commands.run_process.get_excel_file"
+        ) as get_excel_file:
+            result = self.run_process()
+        get_excel_file.assert_not_called()
+        self.assertEqual(result["status"], "Workbook unchanged, import skipped")
+        self.assertEqual(self.get_statuses(), [ImportRun.SUCCEEDED, ImportRun.SKIPPED])
+        self.assertEqual(Poet.objects.count(), poets)
+
+    def test_unchanged_content_skips_the_run(self):
+        self.run_process()
+        # As if the same workbook had been uploaded again under a new ETag.
+        ImportRun.objects.update(etag="re-uploaded")
+        with mock.patch(
+            "app.management.commands.run_process.process_tables"
+        ) as process_tables:
+            result = self.run_process()
+        process_tables.assert_not_called()
+        self.assertEqual(result["status"], "Workbook unchanged, import skipped")
+        self.assertEqual(self.get_statuses(), [ImportRun.SUCCEEDED, ImportRun.SKIPPED])
+
+    def test_force_imports_an_unchanged_workbook(self):
+        self.run_process()
+        result = self.run_process(force=True)
+        self.assertEqual(result["status"], "Process completed successfully")
+        self.assertEqual(result["counts"]["poets"]["created"], 0)
+        self.assertEqual(result["counts"]["poets"]["skipped"], Poet.objects.count())
+        self.assertEqual(
+            self.get_statuses(), [ImportRun.SUCCEEDED, ImportRun.SUCCEEDED]
+        )
+
+    def test_failed_run_is_recorded_and_retried(self):
+        with mock.patch(
+            "app.management.commands.run_process.process_tables",
+            side_effect=RuntimeError("database is down"),
+        ):
+            with self.assertRaises(RuntimeError):
+                self.run_process()
+        failed = ImportRun.objects.get()
+        self.assertEqual(failed.status, ImportRun.FAILED)
+        self.assertEqual(failed.error, "database is down")
+        result = self.run_process()
+        self.assertEqual(result["status"], "Process completed successfully")
+        self.assertGreater(result["counts"]["poets"]["created"], 0)
+        self.assertEqual(self.get_statuses(), [ImportRun.FAILED, ImportRun.SUCCEEDED])
+
+
+class HandlerParityTests(ImportTestCase):
+    """The bulk handlers against the row-by-row handlers they replaced.
+
+    Each runs the workbook's tables twice, the second time with some
+    values changed or emptied, and the rows either leaves are compared.
+    """
+
+    batch_size = 7
+
+    def get_tables(self, edited=False):
+        (table_dfs,) = iter_table_chunks(self.path)
+        tables = transform_tables(table_dfs)
+        if edited:
+            tables[POETS].loc[::2, "email"] = ""
+            tables[POETS].loc[1::3, "website"] = "https://poets.example.org/moved"
+            tables[BOOTHS].loc[::2, "city"] = "Flagstaff"
+            tables[BOOTHS].loc[1::4, "zipCode"] = ""
+            tables[POEM_COLLECTIONS].loc[::3, "poemCollectionDescription"] = "Revised"
+        return tables
+
+    def run_rolled_back(self, run):
+        with transaction.atomic():
+            result = run()
+            transaction.set_rollback(True)
+        return result
+
+    def get_rows(self, model, **names):
+        # Every row without its id, timestamps and source hash, with the
+        # ids in the columns given mapped through {id: name}.
+        rows = []
+        for row in model.objects.values():
+            for field in ["id", "createdAt", "updatedAt", "sourceHash"]:
+                row.pop(field, None)
+            for field, id_names in names.items():
+                row[field] = id_names[row[field]]
+            rows.append(sorted(row.items()))
+        return sorted(rows, key=repr)
+
+    def get_names(self, model):
+        return sorted(model.objects.values_list("name", flat=True))
+
+    def test_poets(self):
+        def run(poets_handler):
+            poet_ids = [
+                poets_handler(self.get_tables(edited)[POETS])
+                for edited in [False, True]
+            ]
+            names = {
+                poet.id: (poet.creditedFirstName, poet.creditedLastName)
+                for poet in Poet.objects.all()
+            }
+            return [[names[id] for id in ids] for ids in poet_ids], self.get_rows(Poet)
+
+        expected = self.run_rolled_back(lambda: run(legacy_poets_handler))
+        actual = self.run_rolled_back(
+            lambda: run(
+                lambda poets_df: Handler(poets_df, self.batch_size).poets_handler()
+            )
+        )
+        self.assertEqual(actual[0], expected[0])
+        self.assertEqual(actual[1], expected[1])
+
+    def test_booths(self):
+        def run(booths_handler):
+            booth_ids_lists = [
+                booths_handler(self.get_tables(edited)[BOOTHS])
+                for edited in [False, True]
+            ]
+            names = {
+                booth.id: (booth.boothName, booth.maintainerName)
+                for booth in Booth.objects.all()
+            }
+            booths = self.get_rows(
+                Booth,
+                phoneTypeId={
+                    str(pk): name
+                    for pk, name in PhoneType.objects.values_list("id", "name")
+                },
+                directoryTypeId={
+                    str(pk): name
+                    for pk, name in DirectoryType.objects.values_list("id", "name")
+                },
+            )
+            return (
+                [
+                    [[names[id] for id in ids] for ids in booth_ids_list]
+                    for booth_ids_list in booth_ids_lists
+                ],
+                booths,
+                [
+                    self.get_names(model)
+                    for model in [PhoneType, DirectoryType, BoothMaintainer]
+                ],
+            )
+
+        expected = self.run_rolled_back(lambda: run(legacy_booths_handler))
+        actual = self.run_rolled_back(
+            lambda: run(
+                lambda booths_df: Handler(booths_df, self.batch_size).booths_handler()
+            )
+        )
+        self.assertEqual(actual[0], expected[0])
+        self.assertEqual(actual[1], expected[1])
+        self.assertEqual(actual[2], expected[2])
+
+    def test_numeric_dimension_names_are_reused(self):
+        booths_df = self.get_tables()[BOOTHS]
+        booths_df["directoryType"] = 1900
+        Handler(booths_df.copy(), self.batch_size).booths_handler()
+        count = DirectoryType.objects.count()
+        Handler(booths_df.copy(), self.batch_size).booths_handler()
+        self.assertEqual(DirectoryType.objects.count(), count)
+        self.assertEqual(DirectoryType.objects.filter(name="1900").count(), 1)
+
+    def test_poem_collections(self):
+        tables = self.get_tables()
+        poem_ids = [
+            Poem.objects.create(telepoemNumber=number).id
+            for number in tables[POEMS]["telepoemNumber"]
+        ]
+        booth_ids_list = Handler(tables[BOOTHS]).booths_handler()
+        telepoem_numbers = dict(Poem.objects.values_list("id", "telepoemNumber"))
+        booths = {
+            booth.id: (booth.boothName, booth.maintainerName)
+            for booth in Booth.objects.all()
+        }
+
+        def run(poem_collections_handler):
+            for edited in [False, True]:
+                collections_df = self.get_tables(edited)[POEM_COLLECTIONS]
+                collections_df["poemId"] = poem_ids
+                collections_df["boothId"] = booth_ids_list
+                poem_collections_handler(collections_df)
+            names = dict(PoemCollection.objects.values_list("id", "poemCollectionName"))
+            return (
+                self.get_rows(PoemCollection),
+                self.get_rows(
+                    PoemCollectionAndPoem,
+                    poemCollectionId=names,
+                    poemId=telepoem_numbers,
+                ),
+                self.get_rows(
+                    BoothAndPoemCollection, boothId=booths, poemCollectionId=names
+                ),
+            )
+
+        expected = self.run_rolled_back(lambda: run(legacy_poem_collections_handler))
+        actual = self.run_rolled_back(
+            lambda: run(
+                lambda collections_df: Handler(
+                    collections_df, self.batch_size
+                ).poem_collections_handler()
+            )
+        )
+        self.assertEqual(actual[0], expected[0])
+        self.assertEqual(actual[1], expected[1])
+        self.assertEqual(actual[2], expected[2])
+
+
+class IndexViewTests(TestCase):
+    def post_file(self, query=""):
+        file = SimpleUploadedFile("file.csv", b"POET\n", content_type="text/csv")
+        return self.client.post(f"/app/upload_file{query}", {"file": file})
+
+    def test_invalid_chunk_size_is_rejected(self):
+        for chunk_size in ["abc", "0", "-5", "1.5"]:
+            with self.subTest(chunk_size=chunk_size):
+                response = self.post_file(f"?stream=true&chunk_size={chunk_size}")
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("chunk_size", response.json()["error"])
+
+
+class ImportJobTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.job_dir = os.path.join(directory.name, "jobs")
+        patcher = mock.patch("app.jobs.IMPORT_JOB_DIR", self.job_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_job(self, **fields):
+        return ImportJob.objects.create(fileName="workbook.xlsx", **fields)
+
+    def test_async_upload_is_accepted(self):
+        file = SimpleUploadedFile("workbook.csv", b"POET\n", content_type="text/csv")
+        with mock.patch("app.views.submit_import_job") as submit_import_job:
+            response = self.client.post(
+                "/app/upload_file?mode=async&stream=true", {"file": file}
+            )
+        self.assertEqual(response.status_code, 202)
+        job = ImportJob.objects.get(id=response.json()["jobId"])
+        submit_import_job.assert_called_once_with(job)
+        self.assertEqual(
+            response.json()["status"], f"http://testserver/app/jobs/{job.id}"
+        )
+        self.assertEqual(job.status, ImportJob.QUEUED)
+        self.assertTrue(job.stream)
+        self.assertEqual(os.stat(self.job_dir).st_mode & 0o777, 0o700)
+        self.assertEqual(os.stat(job.filePath).st_mode & 0o777, 0o600)
+        with open(job.filePath, "rb") as f:
+            self.assertEqual(f.read(), b"POET\n")
+
+    def test_job_directory_others_can_write_is_refused(self):
+        os.makedirs(self.job_dir, mode=0o777)
+        os.chmod(self.job_dir, 0o777)
+        file = SimpleUploadedFile("workbook.csv", b"POET\n", content_type="text/csv")
+        with self.assertRaises(PermissionError):
+            create_import_job(file, input_format="csv")
+        self.assertEqual(os.listdir(self.job_dir), [])
+
+    def test_finished_job(self):
+        counts = {"poets": {"created": 3, "updated": 0, "skipped": 0}}
+        job = self.create_job(
+            status=ImportJob.SUCCEEDED, stage="done", rowsProcessed=3, counts=counts
+        )
+        response = self.client.get(f"/app/jobs/{job.id}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], ImportJob.SUCCEEDED)
+        self.assertEqual(response.json()["rowsProcessed"], 3)
+        self.assertEqual(response.json()["counts"], counts)
+        self.assertIsNone(response.json()["error"])
+
+    def test_failed_job(self):
+        job = self.create_job(status=ImportJob.FAILED, error="Bad workbook")
+        response = self.client.get(f"/app/jobs/{job.id}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], ImportJob.FAILED)
+        self.assertEqual(response.json()["error"], "Bad workbook")
+
+    def test_unknown_job(self):
+        response = self.client.get(f"/app/jobs/{uuid.uuid4()}")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()["error"], "Job not found")
+
+    def test_interrupted_jobs_are_failed(self):
+        os.makedirs(self.job_dir)
+        file_path = os.path.join(self.job_dir, "workbook.xlsx")
+        open(file_path, "wb").close()
+        queued = self.create_job(filePath=file_path)
+        running = self.create_job(status=ImportJob.RUNNING)
+        succeeded = self.create_job(status=ImportJob.SUCCEEDED)
+        self.assertEqual(fail_stale_jobs(), 2)
+        for job in [queued, running]:
+            job.refresh_from_db()
+            self.assertEqual(job.status, ImportJob.FAILED)
+            self.assertIsNotNone(job.finishedAt)
+        succeeded.refresh_from_db()
+        self.assertEqual(succeeded.status, ImportJob.SUCCEEDED)
+        self.assertFalse(os.path.exists(file_path))
+
+
+class UploadTests(TestCase):
+    boundary = "uploadboundary"
+
+    def write_body(self, path, size):
+        # A multipart body with one file of ``size`` random bytes; returns
+        # the file's sha256.
+        digest = hashlib.sha256()
+        block = os.urandom(1024 * 1024)
+        with open(path, "wb") as body:
+            body.write(
+                f"--{self.boundary}\r\n"
+                'Content-Disposition: form-data; name="file"; filename="file.xlsx"\r\n'
+                "Content-Type: application/octet-stream\r\n\r\n".encode()
+            )
+            written = 0
+            while written < size:
+                chunk = block[: size - written]
+                body.write(chunk)
+                digest.update(chunk)
+                written += len(chunk)
+            body.write(f"\r\n--{self.boundary}--\r\n".encode())
+        return digest.hexdigest()
+
+    def parse_upload(self, path):
+        # The request, its file and the peak of Python memory while
+        # request.FILES is parsed.
+        body = open(path, "rb")
+        self.addCleanup(body.close)
+        request = WSGIRequest(
+            {
+                "REQUEST_METHOD": "POST",
+                "PATH_INFO": "/app/upload_file",
+                "CONTENT_TYPE": f"multipart/form-data; boundary={self.boundary}",
+                "CONTENT_LENGTH": str(os.path.getsize(path)),
+                "wsgi.input": body,
+            }
+        )
+        tracemalloc.start()
+        try:
+            files = request.FILES
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return request, files.get("file"), peak
+
+    def test_upload_is_streamed_to_disk(self):
+        size = 16 * 1024 * 1024
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "body")
+            sha256 = self.write_body(path, size)
+            with override_settings(IMPORT_MAX_UPLOAD_SIZE=size + 1024 * 1024):
+                _, file, peak = self.parse_upload(path)
+            self.addCleanup(file.close)
+            self.assertLess(peak, 2 * 1024 * 1024)
+            self.assertEqual(file.sha256, sha256)
+            self.assertEqual(os.path.getsize(file.temporary_file_path()), size)
+
+    def test_upload_over_the_limit_is_refused_unread(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "body")
+            self.write_body(path, 4 * 1024 * 1024)
+            with override_settings(IMPORT_MAX_UPLOAD_SIZE=1024 * 1024):
+                request, file, peak = self.parse_upload(path)
+        self.assertTrue(request.upload_too_large)
+        self.assertIsNone(file)
+        self.assertLess(peak, 1024 * 1024)
+
+    def test_upload_over_the_limit_is_answered_with_413(self):
+        file = SimpleUploadedFile("file.csv", b"POET\n" * 1024, content_type="text/csv")
+        with override_settings(IMPORT_MAX_UPLOAD_SIZE=1024):
+            response = self.client.post("/app/upload_file", {"file": file})
+        self.assertEqual(response.status_code, 413)
+
+    def test_response_has_the_streamed_hash(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = build_input_file(
+                os.path.join(directory, "workbook.csv"), 20, input_format="csv"
+            )
+            with open(path, "rb") as f:
+                content = f.read()
+        file = SimpleUploadedFile("workbook.csv", content, content_type="text/csv")
+        with mock.patch(
+            "app.views.get_audio_index",
+            return_value=AudioKeyIndex(AUDIO_BUCKET_NAME, []),
+        ):
+            response = self.client.post("/app/upload_file", {"file": file})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("counts", response.json())
+        self.assertEqual(response.json()["sha256"], hashlib.sha256(content).hexdigest())
+
+
+class LambdaHandlerTests(SimpleTestCase):
+    def call(self, command, options=None):
+        event = {"command": command}
+        if options is not None:
+            event["options"] = options
+        with mock.patch.dict(lambda_function.COMMANDS, {"run_process": command_stub}):
+            return lambda_function.lambda_handler(event, None)
+
+    def call_failing(self, error):
+        with self.assertLogs("app.lambda", "ERROR"):
+            return self.call("run_process", {"error": error})
+
+    def test_command_is_run_with_its_options(self):
+        response = self.call("run_process", {"stream": True})
+        self.assertEqual(response["statusCode"], 200)
+        body = json.loads(response["body"])
+        self.assertEqual(body["command"], "run_process")
+        self.assertEqual(body["result"], {"options": {"stream": True}})
+        self.assertEqual(body["metrics"], {"wall": 1.5})
+
+    def test_unknown_command_is_rejected(self):
+        response = self.call("drop_tables")
+        self.assertEqual(response, {"statusCode": 400, "body": "Invalid command"})
+
+    def test_failed_command_returns_the_error(self):
+        response = self.call_failing("database is down")
+        self.assertEqual(response["statusCode"], 500)
+        body = json.loads(response["body"])
+        self.assertEqual(body["error"], "database is down")
+        self.assertIn("RuntimeError: database is down", body["traceback"])
+
+    def test_oversized_result_is_truncated(self):
+        size = lambda_function.LAMBDA_MAX_BODY_BYTES * 2
+        response = self.call("run_process", {"padding": "x" * size})
+        self.assertEqual(response["statusCode"], 200)
+        self.assertLessEqual(
+            len(response["body"]), lambda_function.LAMBDA_MAX_BODY_BYTES
+        )
+        result = json.loads(response["body"])["result"]
+        self.assertTrue(result["truncated"])
+        self.assertGreater(result["length"], size)
+        self.assertEqual(len(result["preview"]), lambda_function.LAMBDA_PREVIEW_CHARS)
+
+    def test_oversized_error_keeps_the_end_of_the_traceback(self):
+        size = lambda_function.LAMBDA_MAX_BODY_BYTES * 2
+        response = self.call_failing("x" * size)
+        self.assertEqual(response["statusCode"], 500)
+        self.assertLessEqual(
+            len(response["body"]), lambda_function.LAMBDA_MAX_BODY_BYTES
+        )
+        body = json.loads(response["body"])
+        self.assertTrue(body["error"]["truncated"])
+        self.assertTrue(body["traceback"]["preview"].endswith("x\n"))
+
+
+class ImportMetricsTests(SimpleTestCase):
+    def test_events_are_counted_per_import(self):
+        results = {}
+        barrier = threading.Barrier(2)
+
+        def run_import(name, count):
+            metrics = ImportMetrics(name)
+            barrier.wait()
+            for _ in range(count):
+                count_event("Poet.created")
+            # A thread started by the import counts into it too.
+            worker = threading.Thread(
+                target=run_in_context(count_event), args=("Poem.created", count)
+            )
+            worker.start()
+            worker.join()
+            barrier.wait()
+            results[name] = metrics.finish()["events"]
+
+        threads = [
+            threading.Thread(target=run_import, args=("first", 3)),
+            threading.Thread(target=run_import, args=("second", 5)),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results["first"], {"Poem.created": 3, "Poet.created": 3})
+        self.assertEqual(results["second"], {"Poem.created": 5, "Poet.created": 5})
+
+    def test_events_outside_an_import_are_dropped(self):
+        count_event("Poet.created")
+        metrics = ImportMetrics()
+        count_event("Poet.updated")
+        self.assertEqual(metrics.finish()["events"], {"Poet.updated": 1})
+        count_event("Poet.skipped")
+        self.assertEqual(metrics.get_events(), {"Poet.updated": 1})
+
+
+class S3RequestMetricsTests(S3TestCase):
+    def test_s3_requests_are_counted_per_import(self):
+        results = {}
+        barrier = threading.Barrier(2)
+
+        def list_objects():
+            self.s3_client.list_objects_v2(Bucket=AUDIO_BUCKET_NAME)
+
+        def run_import(name, count):
+            metrics = ImportMetrics(name)
+            barrier.wait()
+            with metrics.stage("audio"):
+                for _ in range(count):
+                    list_objects()
+                # So do the requests of a thread started by the import.
+                worker = threading.Thread(target=run_in_context(list_objects))
+                worker.start()
+                worker.join()
+            barrier.wait()
+            results[name] = metrics.finish()
+
+        threads = [
+            threading.Thread(target=run_import, args=("first", 2)),
+            threading.Thread(target=run_import, args=("second", 4)),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for name, count in [("first", 3), ("second", 5)]:
+            with self.subTest(name=name):
+                self.assertEqual(results[name]["s3_requests"], count)
+                self.assertEqual(results[name]["stages"]["audio"]["s3_requests"], count)
+
+
+class AddLinksTests(S3TestCase):
+    def get_link(self, telepoem_number):
+        return Poem.objects.get(telepoemNumber=telepoem_number).audioLink
+
+    def test_links_poems_whose_audio_an_import_already_saw(self):
+        Poem.objects.create(telepoemNumber="5550000001")
+        self.put_audio("5550000001")
+        # Imports refresh the manifest before add_links runs.
+        get_audio_index()
+        result = add_links()
+        self.assertEqual(result["changed"], 1)
+        self.assertEqual(
+            self.get_link("5550000001"),
+            "https://telepoem.s3.amazonaws.com/poem/audio/5550000001.mp3",
+        )
+
+    def test_only_checks_poems_whose_audio_changed(self):
+        for number in ["5550000001", "5550000002", "5550000003"]:
+            Poem.objects.create(telepoemNumber=number)
+            self.put_audio(number)
+        add_links()
+        self.assertEqual(add_links()["poems"], 0)
+
+        self.delete_audio("5550000002")
+        self.put_audio("5550000003", body=b"re-recorded")
+        get_audio_index()
+        result = add_links()
+        self.assertEqual(result["poems"], 2)
+        self.assertEqual(result["cleared"], 1)
+        self.assertIsNone(self.get_link("5550000002"))
+        self.assertIsNotNone(self.get_link("5550000003"))
+
+    def test_failed_run_leaves_changes_for_the_next(self):
+        Poem.objects.create(telepoemNumber="5550000001")
+        self.put_audio("5550000001")
+        with mock.patch.object(
+            Poem.objects, "bulk_update", side_effect=RuntimeError("database down")
+        ):
+            with self.assertRaises(RuntimeError):
+                add_links()
+        self.assertIsNone(self.get_link("5550000001"))
+        self.assertEqual(add_links()["changed"], 1)
+        self.assertIsNotNone(self.get_link("5550000001"))
+
+
+class ShardedListingTests(S3TestCase):
+    def setUp(self):
+        super().setUp()
+        page_size = mock.patch.object(S3, "page_size", 20)
+        page_size.start()
+        self.addCleanup(page_size.stop)
+        # Telepoem numbers cluster in a few area codes.
+        keys = [
+            f"poem/audio/{area_code}{number:07d}.mp3"
+            for area_code in ["602", "480", "520"]
+            for number in range(0, 600, 7)
+        ]
+        keys += [f"poem/audio/555{number:07d}.mp3" for number in range(80)]
+        keys += ["poem/audio/", "poem/audio/9", "poem/audio/abc.mp3", "poem/other"]
+        for key in keys:
+            self.s3_client.put_object(Bucket=AUDIO_BUCKET_NAME, Key=key, Body=b"")
+        self.s3 = S3(AUDIO_BUCKET_NAME)
+
+    def test_sharded_listing_matches_sequential_listing(self):
+        expected = list(self.s3.iter_objects("poem/audio/"))
+        for shards in [2, 3, 10, 100]:
+            with self.subTest(shards=shards):
+                self.assertEqual(
+                    self.s3.list_objects_parallel("poem/audio/", shards), expected
+                )
+        self.assertEqual(
+            self.s3.list_objects_parallel(None, 4), list(self.s3.iter_objects())
+        )
+
+    def test_shards_follow_the_keys(self):
+        self.s3.list_objects_parallel("poem/audio/", 100)
+        stats = self.s3.listing_stats
+        self.assertEqual(stats["workers"], S3_MAX_POOL_CONNECTIONS)
+        # Evenly spaced leading digits would put every key in the 4, 5 and 6
+        # shards.
+        self.assertGreater(len([keys for keys in stats["keys_per_shard"] if keys]), 8)
+        self.assertLess(max(stats["keys_per_shard"]), 80)
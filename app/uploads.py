@@ -0,0 +1,57 @@
+import hashlib
+
+from django.conf import settings
+from django.core.files.uploadhandler import (
+    StopUpload,
+    TemporaryFileUploadHandler,
+)
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+
+
+class UploadTooLarge(StopUpload):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Streams each uploaded file to a temporary file, hashing it as it goes.
+
+    Requests bigger than IMPORT_MAX_UPLOAD_SIZE are refused before any of
+    the body is read when the client sends Content-Length, and otherwise as
+    soon as the streamed bytes pass the limit. Either way the request is
+    marked with ``upload_too_large`` for the view to answer with a 413.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_size = settings.IMPORT_MAX_UPLOAD_SIZE
+
+    def reject(self):
+        if self.request is not None:
+            self.request.upload_too_large = True
+
+    def handle_raw_input(
+        self, input_data, META, content_length, boundary, encoding=None
+    ):
+        if content_length > self.max_size:
+            self.reject()
+            return QueryDict(encoding=encoding), MultiValueDict()
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.size > self.max_size:
+            self.file.close()
+            self.reject()
+            raise UploadTooLarge(connection_reset=False)
+        self.sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.sha256 = self.sha256.hexdigest()
+        return file
@@ -1,6 +1,7 @@
-from .views import IndexView
+from .views import IndexView, JobView
 from django.urls import path
 
 urlpatterns = [
     path("upload_file", IndexView.as_view(), name="index"),
+    path("jobs/<uuid:job_id>", JobView.as_view(), name="job"),
 ]
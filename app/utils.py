@@ -1,10 +1,32 @@
+import csv
+import hashlib
 import io
+import itertools
+import json
+import logging
 import os
+import shutil
+import tempfile
+import threading
+import time
 import traceback
-import pandas as pd
-import numpy as np
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from enum import Enum
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
 from conf.settings import DEBUG
+from .lazy import LazyModule
+from .metrics import (
+    count_event,
+    count_rows,
+    count_s3_request,
+    measure,
+    run_in_context,
+)
 from .models import (
     PhoneType,
     PoemType,
@@ -20,19 +42,125 @@ from .models import (
     Language,
     DirectoryType,
     Era,
+    AudioObject,
+    ImportRun,
 )
-import boto3
+
+# Imported on first use, so loading the app (checks, migrations, the
+# URLconf, add_links) does not pay for pandas and numpy.
+pd = LazyModule("pandas")
+np = LazyModule("numpy")
+boto3 = LazyModule("boto3")
+botocore_config = LazyModule("botocore.config")
+openpyxl = LazyModule("openpyxl")
+pyarrow_parquet = LazyModule("pyarrow.parquet")
+
+logger = logging.getLogger(__name__)
+
+# S3 clients are thread-safe and expensive to build (credential resolution,
+# connection pool), so one per region/credentials is shared process-wide:
+# across warm Lambda invocations, management commands and worker threads.
+_s3_clients = {}
+_s3_clients_lock = threading.Lock()
+
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", 50))
+S3_MAX_ATTEMPTS = int(os.getenv("S3_MAX_ATTEMPTS", 5))
+S3_RETRY_MODE = os.getenv("S3_RETRY_MODE", "standard")
+# Listings are fetched on up to this many threads, each listing a key
+# range that is split further while the keys in it run to many pages.
+S3_LIST_SHARDS = int(os.getenv("S3_LIST_SHARDS", 1))
+# Points the clients at a local S3 stand-in (moto server, localstack, minio).
+S3_ENDPOINT_URL = os.getenv("AWS_S3_ENDPOINT_URL")
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", 1000))
+# Write independent tables (poets/poems and booths) on parallel threads,
+# each with its own database connection.
+IMPORT_PARALLEL_TABLES = os.getenv("IMPORT_PARALLEL_TABLES", "").lower() in [
+    "true",
+    "1",
+    "yes",
+]
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", 500))
+
+AUDIO_BUCKET_NAME = "telepoem"
+AUDIO_PREFIX = "poem/audio/"
+
+# Input format of a bulk upload, by file extension or by content type. A
+# .zip holds one CSV per table.
+INPUT_FORMATS = {
+    ".xlsx": "xlsx",
+    ".csv": "csv",
+    ".zip": "csv",
+    ".parquet": "parquet",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+}
+INPUT_CONTENT_TYPES = {
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": "xlsx",
+    "text/csv": "csv",
+    "application/zip": "csv",
+    "application/x-zip-compressed": "csv",
+    "application/vnd.apache.parquet": "parquet",
+    "application/x-parquet": "parquet",
+    "application/jsonl": "jsonl",
+    "application/x-ndjson": "jsonl",
+}
+
+# Cell strings pd.read_excel treats as missing by default.
+EXCEL_NA_VALUES = {
+    "",
+    "#N/A",
+    "#N/A N/A",
+    "#NA",
+    "-1.#IND",
+    "-1.#QNAN",
+    "-NaN",
+    "-nan",
+    "1.#IND",
+    "1.#QNAN",
+    "<NA>",
+    "N/A",
+    "NA",
+    "NULL",
+    "NaN",
+    "None",
+    "n/a",
+    "nan",
+    "null",
+}
 
 
 class S3:
+    # Keys per ListObjectsV2 request; 1000 is the most S3 returns.
+    page_size = 1000
+
     def __init__(self, bucket_name):
         self.bucket_name = bucket_name
 
     def get_s3_client(self):
+        cache_key = (
+            os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION"),
+            os.getenv("AWS_PROFILE"),
+            os.getenv("AWS_ACCESS_KEY_ID"),
+            S3_ENDPOINT_URL,
+        )
+        s3 = _s3_clients.get(cache_key)
+        if s3 is None:
+            with _s3_clients_lock:
+                s3 = _s3_clients.get(cache_key)
+                if s3 is None:
+                    s3 = _s3_clients[cache_key] = self.create_s3_client()
+        return s3
+
+    def create_s3_client(self):
+        config = botocore_config.Config(
+            max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+            retries={"max_attempts": S3_MAX_ATTEMPTS, "mode": S3_RETRY_MODE},
+        )
         boto3_session = boto3.Session()
         credentials = boto3_session.get_credentials()
         if not credentials:
-            print("No credentials found. Using environment variables.")
+            logger.warning("No credentials found. Using environment variables.")
             aws_access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
             aws_secret_access_key = os.getenv("AWS_SECRET_ACCESS_KEY")
             if not all([aws_access_key_id, aws_secret_access_key, self.bucket_name]):
@@ -43,39 +171,315 @@ class S3:
                 "s3",
                 aws_access_key_id=aws_access_key_id,
                 aws_secret_access_key=aws_secret_access_key,
+                endpoint_url=S3_ENDPOINT_URL,
+                config=config,
             )
         else:
             aws_access_key_id = credentials.access_key
             aws_secret_access_key = credentials.secret_key
-            s3 = boto3_session.client("s3")
+            s3 = boto3_session.client("s3", endpoint_url=S3_ENDPOINT_URL, config=config)
+        # Fires once per HTTP attempt, so retries are counted too.
+        s3.meta.events.register("before-send.s3", count_s3_request)
         return s3
 
-    def get_audio_links(self):
+    @staticmethod
+    def reset_s3_clients():
+        with _s3_clients_lock:
+            _s3_clients.clear()
+
+    def get_audio_links(self, prefix=None, shards=S3_LIST_SHARDS):
+        return [obj["Key"] for obj in self.list_objects(prefix, shards)]
+
+    def list_objects(self, prefix=None, shards=S3_LIST_SHARDS):
+        if shards > 1:
+            return self.list_objects_parallel(prefix, shards)
+        return self.iter_objects(prefix)
+
+    def iter_objects(self, prefix=None):
         s3_client = self.get_s3_client()
-        keys = []
-        response = s3_client.list_objects_v2(
-            Bucket=self.bucket_name,
-            MaxKeys=1000,
-        )
+        list_kwargs = {"Bucket": self.bucket_name, "MaxKeys": self.page_size}
+        if prefix:
+            list_kwargs["Prefix"] = prefix
+        response = s3_client.list_objects_v2(**list_kwargs)
         # Process the initial set of objects
-        for obj in response.get("Contents", []):
-            keys.append(obj["Key"])
+        yield from response.get("Contents", [])
 
         # Paginate through the results if there are more objects
         while response.get("NextContinuationToken"):
             response = s3_client.list_objects_v2(
-                Bucket=self.bucket_name,
                 ContinuationToken=response["NextContinuationToken"],
-                MaxKeys=1000,
+                **list_kwargs,
             )
             # Process the next set of objects
-            for obj in response.get("Contents", []):
-                keys.append(obj["Key"])
+            yield from response.get("Contents", [])
+
+    @staticmethod
+    def get_split_boundaries(prefix, first_key, last_key, end_at, count):
+        # Up to ``count`` keys to split the rest of a range, (last_key,
+        # end_at], at. Audio keys start with the telepoem number, so these
+        # are the digits that can follow last_key's, from the position the
+        # page's keys differ at, where the keys are dense, out to coarser
+        # ones: poem/audio/48000002 .. 48000009 after a page running from
+        # poem/audio/4800000000.mp3 to poem/audio/4800000133.mp3, then
+        # poem/audio/4800001 .. 4800009 and so on.
+        boundaries = []
+        differs_at = len(os.path.commonprefix([first_key, last_key]))
+        for position in range(min(differs_at, len(last_key) - 1), len(prefix) - 1, -1):
+            if len(boundaries) >= count:
+                break
+            boundaries += [
+                last_key[:position] + digit
+                for digit in "0123456789"
+                if digit > last_key[position]
+                and (end_at is None or last_key[:position] + digit < end_at)
+            ]
+        return sorted(boundaries[: max(count, 0)])
+
+    def list_objects_parallel(self, prefix=None, shards=S3_LIST_SHARDS):
+        # Lists (start_after, end_at] key ranges a page at a time on up to
+        # ``shards`` threads. Whenever a page comes back truncated while a
+        # thread is free, the rest of its range is split at boundaries
+        # taken from the page's keys, so the shards follow the keys: most
+        # telepoem numbers share a few area codes, and those are split again
+        # and again while an empty stretch costs a single request. The
+        # shards are disjoint, cover the whole prefix and concatenate in
+        # the same key order as a sequential listing.
+        prefix = prefix or ""
+        # More threads than pooled connections would only wait for one.
+        workers = max(1, min(shards, S3_MAX_POOL_CONNECTIONS))
+        shard_objects = {None: []}
+        latencies = []
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = {
+                executor.submit(run_in_context(self.list_page), prefix, None, None): (
+                    None,
+                    None,
+                )
+            }
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    shard, end_at = pending.pop(future)
+                    objects, truncated, latency = future.result()
+                    shard_objects[shard].extend(objects)
+                    latencies.append(latency)
+                    if not truncated:
+                        continue
+                    last_key = objects[-1]["Key"]
+                    boundaries = self.get_split_boundaries(
+                        prefix,
+                        objects[0]["Key"],
+                        last_key,
+                        end_at,
+                        workers - len(pending) - 1,
+                    )
+                    key_ranges = list(
+                        zip([last_key] + boundaries, boundaries + [end_at])
+                    )
+                    for i, (start_after, range_end) in enumerate(key_ranges):
+                        # The first range goes on with this shard.
+                        range_shard = shard if i == 0 else start_after
+                        shard_objects.setdefault(range_shard, [])
+                        future = executor.submit(
+                            run_in_context(self.list_page),
+                            prefix,
+                            start_after,
+                            range_end,
+                        )
+                        pending[future] = (range_shard, range_end)
+        shards_in_order = [shard_objects.pop(None)] + [
+            shard_objects[shard] for shard in sorted(shard_objects)
+        ]
+        objects = [obj for shard in shards_in_order for obj in shard]
+        latencies.sort()
+        self.listing_stats = {
+            "shards": len(shards_in_order),
+            "workers": workers,
+            "pages": len(latencies),
+            "keys": len(objects),
+            "keys_per_shard": [len(shard) for shard in shards_in_order],
+            "wall_ms": round((time.perf_counter() - started) * 1000, 2),
+            "page_latency_ms": {
+                "min": round(latencies[0] * 1000, 2),
+                "mean": round(sum(latencies) / len(latencies) * 1000, 2),
+                "p95": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 2),
+                "max": round(latencies[-1] * 1000, 2),
+            },
+        }
+        return objects
+
+    def list_page(self, prefix, start_after, end_at):
+        # One page of the keys in (start_after, end_at], whether the range
+        # goes on after it, and how long the request took.
+        list_kwargs = {
+            "Bucket": self.bucket_name,
+            "Prefix": prefix,
+            "MaxKeys": self.page_size,
+        }
+        if start_after:
+            list_kwargs["StartAfter"] = start_after
+        started = time.perf_counter()
+        response = self.get_s3_client().list_objects_v2(**list_kwargs)
+        latency = time.perf_counter() - started
+        objects = response.get("Contents", [])
+        if end_at is not None and objects and objects[-1]["Key"] > end_at:
+            return [obj for obj in objects if obj["Key"] <= end_at], False, latency
+        return objects, bool(objects) and response.get("IsTruncated", False), latency
+
+
+class AudioKeyIndex:
+    """Maps telepoem numbers to their `poem/audio/<number>.mp3` keys."""
+
+    def __init__(self, bucket_name, keys, prefix=AUDIO_PREFIX):
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+        self.keys = {}
+        for key in keys:
+            telepoem_number = self.get_telepoem_number(key, prefix)
+            if telepoem_number is not None:
+                self.keys[telepoem_number] = key
 
-        return keys
+    @staticmethod
+    def get_telepoem_number(key, prefix=AUDIO_PREFIX):
+        if key.startswith(prefix) and key.endswith(".mp3"):
+            return key[len(prefix) : -len(".mp3")]
+        return None
 
+    def __len__(self):
+        return len(self.keys)
 
-def get_excel_file(file_name=None):
+    def get_key(self, telepoem_number):
+        return self.keys.get(str(telepoem_number))
+
+    def get_link(self, telepoem_number):
+        key = self.get_key(telepoem_number)
+        if key is None:
+            return None
+        return self.build_link(key)
+
+    def build_link(self, key):
+        return f"https://{self.bucket_name}.s3.amazonaws.com/{key}"
+
+    def get_expected_link(self, telepoem_number):
+        return self.build_link(f"{self.prefix}{telepoem_number}.mp3")
+
+
+class AudioManifest:
+    """Persisted listing of the audio objects, diffed against S3 on refresh()."""
+
+    def __init__(
+        self, bucket_name=AUDIO_BUCKET_NAME, prefix=AUDIO_PREFIX, batch_size=None
+    ):
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+        self.batch_size = batch_size or BULK_BATCH_SIZE
+
+    def get_queryset(self):
+        return AudioObject.objects.filter(
+            bucket=self.bucket_name, key__startswith=self.prefix
+        )
+
+    def refresh(self):
+        stored = {audio.key: audio for audio in self.get_queryset()}
+        changes = {"added": [], "changed": [], "removed": []}
+        audio_to_create = []
+        audio_to_update = []
+        now = timezone.now()
+        listed_keys = set()
+        for obj in S3(self.bucket_name).list_objects(self.prefix):
+            key = obj["Key"]
+            listed_keys.add(key)
+            etag = obj.get("ETag", "").strip('"')
+            size = obj.get("Size", 0)
+            last_modified = obj.get("LastModified")
+            audio = stored.get(key)
+            if audio is None:
+                audio_to_create.append(
+                    AudioObject(
+                        bucket=self.bucket_name,
+                        key=key,
+                        etag=etag,
+                        size=size,
+                        lastModified=last_modified,
+                    )
+                )
+                changes["added"].append(key)
+            elif audio.deletedAt is not None:
+                changes["added"].append(key)
+            elif (audio.etag, audio.size, audio.lastModified) != (
+                etag,
+                size,
+                last_modified,
+            ):
+                changes["changed"].append(key)
+            else:
+                continue
+            if audio is not None:
+                audio.etag = etag
+                audio.size = size
+                audio.lastModified = last_modified
+                audio.deletedAt = None
+                audio.updatedAt = now
+                audio_to_update.append(audio)
+
+        for key, audio in stored.items():
+            if key not in listed_keys and audio.deletedAt is None:
+                audio.deletedAt = now
+                audio.updatedAt = now
+                audio_to_update.append(audio)
+                changes["removed"].append(key)
+
+        with transaction.atomic():
+            AudioObject.objects.bulk_create(audio_to_create, batch_size=self.batch_size)
+            AudioObject.objects.bulk_update(
+                audio_to_update,
+                ["etag", "size", "lastModified", "deletedAt", "updatedAt"],
+                batch_size=self.batch_size,
+            )
+        for change, keys in changes.items():
+            count_event(f"AudioObject.{change}", len(keys))
+        logger.info(
+            "Audio manifest added: %d, changed: %d, removed: %d",
+            len(changes["added"]),
+            len(changes["changed"]),
+            len(changes["removed"]),
+        )
+        return changes
+
+    def get_index(self):
+        keys = self.get_queryset().filter(deletedAt__isnull=True)
+        return AudioKeyIndex(
+            self.bucket_name, keys.values_list("key", flat=True), self.prefix
+        )
+
+    def get_unlinked(self):
+        return self.get_queryset().filter(
+            Q(linkedAt__isnull=True) | Q(linkedAt__lt=F("updatedAt"))
+        )
+
+    def mark_linked(self, ids, synced_at):
+        # Objects refreshed after ``synced_at`` stay unlinked for the next
+        # run.
+        for i in range(0, len(ids), self.batch_size):
+            self.get_queryset().filter(
+                id__in=ids[i : i + self.batch_size], updatedAt__lte=synced_at
+            ).update(linkedAt=F("updatedAt"))
+
+    def get_telepoem_numbers(self, keys):
+        telepoem_numbers = (
+            AudioKeyIndex.get_telepoem_number(key, self.prefix) for key in keys
+        )
+        return {number for number in telepoem_numbers if number is not None}
+
+
+def get_audio_index(bucket_name=AUDIO_BUCKET_NAME):
+    manifest = AudioManifest(bucket_name)
+    manifest.refresh()
+    return manifest.get_index()
+
+
+def get_excel_file(file_name=None, stream=False, etag=None):
     if DEBUG:
         file = f"xlx_files/{file_name}"
         return file
@@ -84,7 +488,19 @@ def get_excel_file(file_name=None):
         try:
             bucket_name = os.getenv("BUCKET_NAME")
             s3 = S3(bucket_name).get_s3_client()
-            obj = s3.get_object(Bucket=bucket_name, Key=file_name)
+            # IfMatch pins the download to the version the ledger checked.
+            obj = s3.get_object(
+                Bucket=bucket_name, Key=file_name, **({"IfMatch": etag} if etag else {})
+            )
+            if stream:
+                # Spool the object to disk in chunks rather than holding a
+                # full in-memory copy; the file is removed once closed.
+                excel_file = tempfile.TemporaryFile(
+                    suffix=os.path.splitext(file_name)[1]
+                )
+                shutil.copyfileobj(obj["Body"], excel_file, 1024 * 1024)
+                excel_file.seek(0)
+                return excel_file
             excel_data = io.BytesIO(obj["Body"].read())
             return excel_data
         except FileNotFoundError:
@@ -95,19 +511,96 @@ def get_excel_file(file_name=None):
             )
 
 
+def hash_file(file, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    if isinstance(file, str):
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+    else:
+        file.seek(0)
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+        file.seek(0)
+    return digest.hexdigest()
+
+
+class ImportLedger:
+    """Records every import of a workbook in ImportRun, to skip unchanged ones."""
+
+    def __init__(self, file_name):
+        if DEBUG:
+            self.bucket_name = None
+            self.key = f"xlx_files/{file_name}"
+        else:
+            self.bucket_name = os.getenv("BUCKET_NAME")
+            self.key = f"bulkupload/{file_name}"
+
+    def get_etag(self):
+        if DEBUG:
+            return None
+        response = (
+            S3(self.bucket_name)
+            .get_s3_client()
+            .head_object(Bucket=self.bucket_name, Key=self.key)
+        )
+        return response["ETag"].strip('"')
+
+    def get_last_success(self):
+        return (
+            ImportRun.objects.filter(
+                bucket=self.bucket_name, key=self.key, status=ImportRun.SUCCEEDED
+            )
+            .order_by("-finishedAt")
+            .first()
+        )
+
+    def is_unchanged(self, etag=None, content_hash=None):
+        last_run = self.get_last_success()
+        if last_run is None:
+            return False
+        if etag is not None and last_run.etag == etag:
+            return True
+        return content_hash is not None and last_run.contentHash == content_hash
+
+    def start(self, etag=None):
+        return ImportRun.objects.create(
+            bucket=self.bucket_name,
+            key=self.key,
+            etag=etag,
+            startedAt=timezone.now(),
+        )
+
+    def finish(self, run, status, counts=None, error=None, content_hash=None):
+        run.status = status
+        run.counts = counts
+        run.error = error
+        run.contentHash = content_hash or run.contentHash
+        run.finishedAt = timezone.now()
+        run.duration = (run.finishedAt - run.startedAt).total_seconds()
+        run.save()
+        logger.info("Import %s %s in %.2fs", run.id, status, run.duration)
+        return run
+
+
 class TableProcessor:
     def __init__(self, df):
         self.df = df
+        self.values = df.to_numpy(dtype=object)
+        # The empty cells of the whole sheet, found once for finding the
+        # tables, finding the rows and cleaning every table.
+        self.null = pd.isnull(self.values)
         self.table_info_list = self.extract_table_info()
+        self.columns, self.data, self.data_null = self.extract_data_rows()
 
     def extract_table_info(self):
         tables_info = []
+        not_null_columns = ~self.null.all(axis=0)
         for i, column in enumerate(self.df.columns):
             if "Unnamed:" in column:
                 continue
 
-            not_null_values = self.df[column].notnull().any()
-            if not_null_values:
+            if not_null_columns[i]:
                 if tables_info and "ending_index" not in tables_info[-1]:
                     tables_info[-1]["ending_index"] = i
 
@@ -124,26 +617,43 @@ class TableProcessor:
         return tables_info
 
     def extract_data_rows(self):
-        columns = None
-        data = []
-        for _, row in self.df.iterrows():
-            if not row.isnull().values.all() and len(row.values) > 0:
-                if columns is None:
-                    columns = row.values
-                else:
-                    data.append(row.values)
-        return columns, data
+        # The first non-empty row holds the column names, the remaining
+        # non-empty rows are shared by every table, which then takes its
+        # columns out of `data`. Selecting rows by index copies them, so
+        # `data` is a second copy of the sheet's rows rather than a view.
+        non_empty_rows = np.flatnonzero(~self.null.all(axis=1))
+        if not len(non_empty_rows):
+            return None, self.values[:0], self.null[:0]
+        rows = non_empty_rows[1:]
+        return self.values[non_empty_rows[0]], self.values[rows], self.null[rows]
 
     def create_table_dataframe(self, table_info):
-        columns, data = self.extract_data_rows()
-        table_data = [
-            index[table_info["starting_index"] : table_info["ending_index"]]
-            for index in data
-        ]
-        table_df = pd.DataFrame(
-            table_data,
-            columns=columns[table_info["starting_index"] : table_info["ending_index"]],
-        )
+        if self.columns is None:
+            return None
+        start, end = table_info["starting_index"], table_info["ending_index"]
+        keep = [i for i in range(start, end) if self.columns[i] != "tableSeperator"]
+        # A copy too, and the table's own: its empty cells are filled in
+        # place below without touching `data`.
+        data = self.data[:, keep]
+        # Columns of strings, most of the sheet, only need their empty cells
+        # filled; the rest are cleaned as clean_table_dataframe would after
+        # infer_objects(), one column at a time.
+        infer = []
+        for i in range(len(keep)):
+            if pd.api.types.infer_dtype(data[:, i], skipna=True) in ["string", "empty"]:
+                data[self.data_null[:, keep[i]], i] = ""
+            else:
+                infer.append(i)
+        table_df = pd.DataFrame(data, columns=self.columns[keep])
+        for i in infer:
+            column = pd.Series(data[:, i], dtype=object).infer_objects().fillna("")
+            table_df.isetitem(i, column.replace({np.nan: None, pd.NaT: None}))
+        if table_df.empty:
+            return None
+        return table_df
+
+    @staticmethod
+    def clean_table_dataframe(table_df):
         table_df = table_df.drop(columns="tableSeperator", errors="ignore")
         table_df = table_df.fillna("")
         table_df = table_df.replace({np.nan: None, pd.NaT: None})
@@ -159,6 +669,80 @@ class TableProcessor:
         }
 
 
+class StreamingTableReader:
+    """Reads the sheet row by row and yields its tables in chunks of rows."""
+
+    def __init__(self, file, chunk_size=IMPORT_CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def normalize_cell(value):
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        if isinstance(value, str) and value in EXCEL_NA_VALUES:
+            return None
+        return value
+
+    @staticmethod
+    def extract_table_info(title_row):
+        tables_info = []
+        for i, title in enumerate(title_row):
+            if title is None:
+                continue
+            if tables_info:
+                tables_info[-1]["ending_index"] = i
+            tables_info.append({"table_name": title, "starting_index": i})
+        return tables_info
+
+    def iter_rows(self):
+        workbook = openpyxl.load_workbook(self.file, read_only=True, data_only=True)
+        try:
+            for row in workbook.worksheets[0].iter_rows(values_only=True):
+                yield [self.normalize_cell(value) for value in row]
+        finally:
+            workbook.close()
+
+    def iter_table_dataframes(self):
+        rows = self.iter_rows()
+        try:
+            title_row = next(rows, None)
+            if title_row is None:
+                return
+            table_info_list = self.extract_table_info(title_row)
+            columns = None
+            chunk = []
+            for row in rows:
+                if all(value is None for value in row):
+                    continue
+                if columns is None:
+                    width = max(len(title_row), len(row))
+                    columns = np.array(row + [None] * (width - len(row)), dtype=object)
+                    if table_info_list:
+                        table_info_list[-1]["ending_index"] = width
+                    continue
+                chunk.append(row[:width] + [None] * (width - len(row)))
+                if self.chunk_size and len(chunk) >= self.chunk_size:
+                    yield self.create_table_dataframes(table_info_list, columns, chunk)
+                    chunk = []
+            if chunk:
+                yield self.create_table_dataframes(table_info_list, columns, chunk)
+        finally:
+            rows.close()
+
+    @staticmethod
+    def create_table_dataframes(table_info_list, columns, chunk):
+        data = np.array(chunk, dtype=object)
+        table_dfs = {}
+        for table_info in table_info_list:
+            start, end = table_info["starting_index"], table_info["ending_index"]
+            table_df = pd.DataFrame(data[:, start:end], columns=columns[start:end])
+            table_dfs[table_info["table_name"]] = TableProcessor.clean_table_dataframe(
+                table_df
+            )
+        return table_dfs
+
+
 class TableName(Enum):
     POET_INFORMATION = "POET INFORMATION"
     POEM_INFORMATION = "POEM INFORMATION"
@@ -166,6 +750,155 @@ class TableName(Enum):
     POEM_COLLECTION_INFORMATION = "PoemCollection Information"
 
 
+def get_table_name(key):
+    # A table by its sheet title ("POET INFORMATION") or by its name in
+    # counts and metrics ("poets").
+    for table_name, short_name in TableWriter.STAGES.items():
+        if key.lower() in (table_name.lower(), short_name):
+            return table_name
+    raise ValueError(f"Unknown table: {key}")
+
+
+def split_column_names(names):
+    # Groups "<table>.<field>" names by table, in sheet order.
+    columns = {}
+    for name in names:
+        table, _, field = name.partition(".")
+        columns.setdefault(get_table_name(table), []).append((name, field))
+    columns = {
+        table.value: columns[table.value]
+        for table in TableName
+        if table.value in columns
+    }
+    fields_by_table = {
+        table_name: [field for _, field in table_columns]
+        for table_name, table_columns in columns.items()
+    }
+    return fields_by_table, [name for table in columns.values() for name, _ in table]
+
+
+def get_header_rows(fields_by_table):
+    # The title and field-name rows of the side-by-side sheet layout.
+    title_row = []
+    field_row = []
+    for table_name, fields in fields_by_table.items():
+        title_row += [table_name] + [None] * (len(fields) - 1)
+        field_row += fields
+    return [title_row, field_row]
+
+
+@contextmanager
+def open_text(file):
+    if isinstance(file, str):
+        with open(file, encoding="utf-8-sig", newline="") as text:
+            yield text
+        return
+    file.seek(0)
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        yield text
+    finally:
+        # Leave the caller's file open.
+        text.detach()
+
+
+class CsvTableReader(StreamingTableReader):
+    """Reads the sheet's side-by-side layout from a CSV file."""
+
+    def iter_rows(self):
+        with open_text(self.file) as text:
+            for row in csv.reader(text):
+                yield [self.normalize_cell(value) for value in row]
+
+
+class CsvArchiveTableReader(StreamingTableReader):
+    """Reads a zip of one CSV per table, row n of each file being sheet row n."""
+
+    def iter_rows(self):
+        with zipfile.ZipFile(self.file) as archive:
+            readers = {}
+            for name in archive.namelist():
+                stem, extension = os.path.splitext(os.path.basename(name))
+                if extension.lower() != ".csv":
+                    continue
+                text = io.TextIOWrapper(
+                    archive.open(name), encoding="utf-8-sig", newline=""
+                )
+                readers[get_table_name(stem)] = csv.reader(text)
+            fields_by_table = {
+                table.value: next(readers[table.value], [])
+                for table in TableName
+                if table.value in readers
+            }
+            yield from get_header_rows(fields_by_table)
+            widths = [len(fields) for fields in fields_by_table.values()]
+            for table_rows in itertools.zip_longest(
+                *(readers[table_name] for table_name in fields_by_table),
+                fillvalue=[],
+            ):
+                row = []
+                for values, width in zip(table_rows, widths):
+                    row += values[:width] + [""] * (width - len(values))
+                yield [self.normalize_cell(value) for value in row]
+
+
+class ParquetTableReader(StreamingTableReader):
+    """Reads a Parquet file whose columns are named "<table>.<field>"."""
+
+    def iter_rows(self):
+        parquet_file = pyarrow_parquet.ParquetFile(self.file)
+        fields_by_table, names = split_column_names(parquet_file.schema_arrow.names)
+        yield from get_header_rows(fields_by_table)
+        for batch in parquet_file.iter_batches(
+            batch_size=self.chunk_size or IMPORT_CHUNK_SIZE, columns=names
+        ):
+            columns = batch.to_pydict()
+            for values in zip(*(columns[name] for name in names)):
+                yield [self.normalize_cell(value) for value in values]
+
+
+class JsonLinesTableReader(StreamingTableReader):
+    """Reads one JSON object per sheet row, nested by table or flat."""
+
+    @staticmethod
+    def flatten(record):
+        flat = {}
+        for key, value in record.items():
+            if isinstance(value, dict):
+                for field, field_value in value.items():
+                    flat[f"{key}.{field}"] = field_value
+            else:
+                flat[key] = value
+        return flat
+
+    def iter_rows(self):
+        with open_text(self.file) as text:
+            records = (self.flatten(json.loads(line)) for line in text if line.strip())
+            first = next(records, None)
+            if first is None:
+                return
+            fields_by_table, names = split_column_names(first)
+            yield from get_header_rows(fields_by_table)
+            for record in itertools.chain([first], records):
+                yield [self.normalize_cell(record.get(name)) for name in names]
+
+
+TABLE_READERS = {
+    "xlsx": StreamingTableReader,
+    "csv": CsvTableReader,
+    "parquet": ParquetTableReader,
+    "jsonl": JsonLinesTableReader,
+}
+
+
+def get_input_format(file_name=None, content_type=None):
+    extension = os.path.splitext(file_name or "")[1].lower()
+    input_format = INPUT_FORMATS.get(extension) or INPUT_CONTENT_TYPES.get(content_type)
+    if input_format is None:
+        raise ValueError(f"Unsupported input file: {file_name or content_type}")
+    return input_format
+
+
 class PoetTableProcessor(TableProcessor):
     def populate_poet_table_according_to_db(table_df):
         table_df["legalLastName"], table_df["legalFirstName"] = zip(
@@ -301,93 +1034,355 @@ class BoothTableProcessor(TableProcessor):
         return table_df
 
 
+def get_dimension_name(name):
+    # Names are stored as text, like get_or_create(name=...) did for a number.
+    return name if name is None else str(name)
+
+
+class DimensionCache:
+    """Maps names to primary keys for lookup tables (Era, PoemType, ...)."""
+
+    def __init__(self, batch_size=BULK_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.ids = {}
+        # Handlers on parallel threads share the cache.
+        self.lock = threading.RLock()
+
+    def load(self, model, names):
+        with self.lock:
+            self.load_names(model, names)
+
+    def load_names(self, model, names):
+        cache = self.ids.setdefault(model, {})
+        names = [get_dimension_name(name) for name in names]
+        missing = [name for name in dict.fromkeys(names) if name not in cache]
+        if not missing:
+            return
+        pk_name = model._meta.pk.attname
+        for name, pk in (
+            model.objects.filter(name__in=missing)
+            .order_by("pk")
+            .values_list("name", pk_name)
+        ):
+            cache.setdefault(name, pk)
+        created = [model(name=name) for name in missing if name not in cache]
+        model.objects.bulk_create(created, batch_size=self.batch_size)
+        for obj in created:
+            cache[obj.name] = obj.pk
+        count_event(f"{model.__name__}.created", len(created))
+        if created:
+            logger.debug("%s created: %d", model.__name__, len(created))
+
+    def get_id(self, model, name):
+        name = get_dimension_name(name)
+        if name not in self.ids.get(model, {}):
+            self.load(model, [name])
+        return self.ids[model][name]
+
+    def get_ids(self, model, names):
+        return [self.get_id(model, name) for name in names]
+
+
+class EntityCache:
+    """The poets, booths and collections an import has seen, by source key."""
+
+    def __init__(self, batch_size=BULK_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.objects = {}
+        self.created = {}
+        self.lock = threading.RLock()
+
+    def get_objects(self, model):
+        with self.lock:
+            return self.objects.setdefault(model, {})
+
+    def get_missing(self, model, keys):
+        objects = self.get_objects(model)
+        return [key for key in dict.fromkeys(keys) if key not in objects]
+
+    def add_created(self, model, keys):
+        with self.lock:
+            self.created.setdefault(model, set()).update(keys)
+
+    def flush(self, model, fields):
+        with self.lock:
+            objects = self.objects.pop(model, {})
+            created = self.created.pop(model, set())
+        now = timezone.now()
+        objs_to_update = []
+        # Entities created by this run were counted when they were.
+        stats = {"created": 0, "updated": 0, "skipped": 0}
+        for key, obj in objects.items():
+            source_hash = get_source_hash(obj, fields)
+            if source_hash != obj.sourceHash:
+                obj.sourceHash = source_hash
+                obj.updatedAt = now
+                objs_to_update.append(obj)
+                if key not in created:
+                    stats["updated"] += 1
+            elif key not in created:
+                stats["skipped"] += 1
+        model.objects.bulk_update(
+            objs_to_update,
+            fields + ["sourceHash", "updatedAt"],
+            batch_size=self.batch_size,
+        )
+        for event in ["updated", "skipped"]:
+            count_event(f"{model.__name__}.{event}", stats[event])
+        logger.debug(
+            "%s updated: %d, skipped: %d",
+            model.__name__,
+            stats["updated"],
+            stats["skipped"],
+        )
+        if logger.isEnabledFor(logging.DEBUG):
+            for obj in objs_to_update:
+                logger.debug("%s %s updated: %s", model.__name__, obj.pk, obj)
+        return stats
+
+
+def split_names(values, separator):
+    return [name for value in values if value for name in value.split(separator)]
+
+
+def fingerprint(values):
+    # Content hash of the normalized source values an object was written from.
+    return hashlib.sha256(
+        json.dumps(values, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def get_source_hash(obj, fields):
+    # Hash of the values an entity is written with, as its model fields hold
+    # them: a zip code read as 12345.0 by one reader and 12345 by another,
+    # or loaded back from the database, hashes the same.
+    values = {}
+    for field in fields:
+        value = getattr(obj, field)
+        try:
+            value = obj._meta.get_field(field).to_python(value)
+        except ValidationError:
+            pass
+        values[field] = value
+    return fingerprint(values)
+
+
+def group_rows(rows, key):
+    groups = {}
+    for row in rows:
+        groups.setdefault(key(row), []).append(row)
+    return groups
+
+
 class Handler:
-    def __init__(self, table_dfs):
+    # Fields copied onto an existing poet when the sheet has a value for them.
+    POET_UPDATE_FIELDS = [
+        "address",
+        "poetBiography",
+        "creditedFirstName",
+        "creditedLastName",
+        "email",
+        "state",
+        "status",
+        "city",
+        "isLaureate",
+        "phoneNum",
+        "photoCredit",
+        "website",
+        "zipCode",
+    ]
+
+    POEM_UPDATE_FIELDS = [
+        "title",
+        "poetId",
+        "producerName",
+        "narratorName",
+        "recordingDate",
+        "recordingSource",
+        "poemEra",
+        "poemTypes",
+        "poemTopics",
+        "language",
+        "active",
+        "isChildrensPoem",
+        "isAdultPoem",
+        "recordingDuration",
+        "telepoemNumber",
+        "copyRights",
+        "poemText",
+        "audioLink",
+    ]
+    BOOTH_UPDATE_FIELDS = [
+        "number",
+        "phoneTypeId",
+        "directoryTypeId",
+        "maintainerName",
+        "physicalAddress",
+        "city",
+        "state",
+        "zipCode",
+        "installationDate",
+        "installationType",
+        "active",
+        "isADAAccessible",
+    ]
+
+    POEM_COLLECTION_UPDATE_FIELDS = ["poemCollectionDescription"]
+
+    def __init__(
+        self,
+        table_dfs,
+        batch_size=BULK_BATCH_SIZE,
+        dimensions=None,
+        audio_index=None,
+        entities=None,
+    ):
         self.table_dfs = table_dfs
+        self.batch_size = batch_size
+        self.dimensions = dimensions or DimensionCache(batch_size)
+        self.audio_index = audio_index
+        # Without the run's EntityCache, the handler is the whole run and
+        # writes its updates itself.
+        self.flush_updates = entities is None
+        self.entities = entities or EntityCache(batch_size)
+        self.stats = {"created": 0, "updated": 0, "skipped": 0}
+
+    def save_objects(self, model, objs_to_create, objs_to_update, fields, skipped):
+        now = timezone.now()
+        for obj in objs_to_update:
+            obj.updatedAt = now
+        with transaction.atomic():
+            model.objects.bulk_create(objs_to_create, batch_size=self.batch_size)
+            model.objects.bulk_update(
+                objs_to_update,
+                fields + ["sourceHash", "updatedAt"],
+                batch_size=self.batch_size,
+            )
+        self.stats = {
+            "created": len(objs_to_create),
+            "updated": len(objs_to_update),
+            "skipped": skipped,
+        }
+        for event, count in self.stats.items():
+            count_event(f"{model.__name__}.{event}", count)
+        logger.debug(
+            "%s created: %d, updated: %d, skipped: %d",
+            model.__name__,
+            self.stats["created"],
+            self.stats["updated"],
+            self.stats["skipped"],
+        )
+        if logger.isEnabledFor(logging.DEBUG):
+            for obj in objs_to_create:
+                logger.debug("%s %s created: %s", model.__name__, obj.pk, obj)
+            for obj in objs_to_update:
+                logger.debug("%s %s updated: %s", model.__name__, obj.pk, obj)
+
+    def create_objects(self, model, objs_to_create, fields):
+        # Takes {source key: new object}; updates to the entities of the
+        # chunk are left to EntityCache.flush().
+        for obj in objs_to_create.values():
+            obj.sourceHash = get_source_hash(obj, fields)
+        model.objects.bulk_create(
+            list(objs_to_create.values()), batch_size=self.batch_size
+        )
+        self.entities.add_created(model, objs_to_create)
+        self.stats = {"created": len(objs_to_create), "updated": 0, "skipped": 0}
+        count_event(f"{model.__name__}.created", len(objs_to_create))
+        logger.debug("%s created: %d", model.__name__, len(objs_to_create))
+        if logger.isEnabledFor(logging.DEBUG):
+            for obj in objs_to_create.values():
+                logger.debug("%s %s created: %s", model.__name__, obj.pk, obj)
+        if self.flush_updates:
+            stats = self.entities.flush(model, fields)
+            self.stats.update(updated=stats["updated"], skipped=stats["skipped"])
 
     def poets_handler(self):
         if self.table_dfs is None:
             return []
         try:
+            poets = self.table_dfs.to_dict("records")
+            existing_poets = self.entities.get_objects(Poet)
+            names = self.entities.get_missing(
+                Poet,
+                [
+                    (poet["creditedFirstName"], poet["creditedLastName"])
+                    for poet in poets
+                ],
+            )
+            if names:
+                missing = set(names)
+                for existing_poet in Poet.objects.filter(
+                    creditedFirstName__in={first_name for first_name, _ in names},
+                    creditedLastName__in={last_name for _, last_name in names},
+                ).order_by("pk"):
+                    key = (
+                        existing_poet.creditedFirstName,
+                        existing_poet.creditedLastName,
+                    )
+                    if key in missing:
+                        existing_poets.setdefault(key, existing_poet)
+
             poet_ids = []
-            for index, poet in self.table_dfs.iterrows():
-                existing_poet = Poet.objects.filter(
-                    creditedFirstName=poet.creditedFirstName,
-                    creditedLastName=poet.creditedLastName,
-                )
-                if existing_poet.exists():
-                    existing_poet = existing_poet.first()
-                    if poet.address:
-                        existing_poet.address = poet.address
-                    if poet.poetBiography:
-                        existing_poet.poetBiography = poet.poetBiography
-                    if poet.creditedFirstName:
-                        existing_poet.creditedFirstName = poet.creditedFirstName
-                    if poet.creditedLastName:
-                        existing_poet.creditedLastName = poet.creditedLastName
-                    if poet.email:
-                        existing_poet.email = poet.email
-                    if poet.state:
-                        existing_poet.state = poet.state
-                    if poet.status:
-                        existing_poet.status = poet.status
-                    if poet.city:
-                        existing_poet.city = poet.city
-                    if poet.isLaureate:
-                        existing_poet.isLaureate = poet.isLaureate
-                    if poet.phoneNum:
-                        existing_poet.phoneNum = poet.phoneNum
-                    if poet.photoCredit:
-                        existing_poet.photoCredit = poet.photoCredit
-                    if poet.website:
-                        existing_poet.website = poet.website
-                    if poet.zipCode:
-                        existing_poet.zipCode = poet.zipCode
-                    existing_poet.save()
-                    print("Poet Updated")
+            poets_to_create = {}
+            for poet in poets:
+                key = (poet["creditedFirstName"], poet["creditedLastName"])
+                existing_poet = existing_poets.get(key)
+                if existing_poet is None:
+                    existing_poet = Poet(**poet)
+                    existing_poets[key] = poets_to_create[key] = existing_poet
                 else:
-                    existing_poet = Poet.objects.create(**poet)
-                    print("Poet Created")
+                    # Every row of a poet contributes its non-empty fields.
+                    for field in self.POET_UPDATE_FIELDS:
+                        if poet[field]:
+                            setattr(existing_poet, field, poet[field])
                 poet_ids.append(existing_poet.id)
+
+            self.create_objects(Poet, poets_to_create, self.POET_UPDATE_FIELDS)
             return poet_ids
         except Exception as e:
-            print(f"Error: {e}")
+            logger.error("Error: %s", e)
             raise e
 
     def poems_handler(self):
         if self.table_dfs is None:
             return
         try:
-            poem_ids = []
-            print("Getting mp3 files from s3")
-            bucket_name = "telepoem"
-            s3_audio_links = S3(bucket_name).get_audio_links()
-            for index, poem in self.table_dfs.iterrows():
-                era = Era.objects.filter(name=poem["poemEra"]).first()
-                if not era:
-                    era = Era.objects.create(name=poem["poemEra"])
-                poem["poemEra"] = era.id
+            audio_index = self.audio_index
+            if audio_index is None:
+                audio_index = get_audio_index()
+            self.dimensions.load(Era, self.table_dfs["poemEra"])
+            self.dimensions.load(
+                PoemType, split_names(self.table_dfs["poemTypes"], ", ")
+            )
+            self.dimensions.load(
+                PoemTopic, split_names(self.table_dfs["poemTopics"], ", ")
+            )
+            self.dimensions.load(
+                Language, split_names(self.table_dfs["language"], "; ")
+            )
+            poems = self.table_dfs.to_dict("records")
+            for poem in poems:
+                poem["poemEra"] = self.dimensions.get_id(Era, poem["poemEra"])
                 if poem["poemTypes"]:
-                    poem_type_ids = []
-                    types_split = poem["poemTypes"].split(", ")
-                    for name in types_split:
-                        poem_type_obj = PoemType.objects.filter(name=name).first()
-                        if not poem_type_obj:
-                            poem_type_obj = PoemType.objects.create(name=name)
-                        poem_type_ids.append(poem_type_obj.poemTypeId)
+                    poem_type_ids = self.dimensions.get_ids(
+                        PoemType, poem["poemTypes"].split(", ")
+                    )
                     poem["poemTypes"] = ",".join(
                         [str(poem_type_id) for poem_type_id in poem_type_ids]
                     )
 
                 if poem["poemTopics"]:
-                    poem_topic_ids = []
-                    topics_split = poem["poemTopics"].split(", ")
-                    for name in topics_split:
-                        poem_topic_obj = PoemTopic.objects.filter(name=name).first()
-                        if not poem_topic_obj:
-                            poem_topic_obj = PoemTopic.objects.create(name=name)
-                        poem_topic_ids.append(poem_topic_obj.poemTopicId)
-                    poem["poemTopics"] = "[" + ",".join([str(poem_topic_id) for poem_topic_id in poem_topic_ids]) + "]"
+                    poem_topic_ids = self.dimensions.get_ids(
+                        PoemTopic, poem["poemTopics"].split(", ")
+                    )
+                    poem["poemTopics"] = (
+                        "["
+                        + ",".join(
+                            [str(poem_topic_id) for poem_topic_id in poem_topic_ids]
+                        )
+                        + "]"
+                    )
 
                 # if poem["poemSpecialTags"]:
                 #     special_tag_ids = []
@@ -402,28 +1397,13 @@ class Handler:
                 #     )
 
                 if poem["language"]:
-                    language_ids = []
-                    languages_split = poem["language"].split("; ")
-                    for name in languages_split:
-                        language_obj = Language.objects.filter(name=name).first()
-                        if not language_obj:
-                            language_obj = Language.objects.create(name=name)
-                        language_ids.append(language_obj.languageId)
+                    language_ids = self.dimensions.get_ids(
+                        Language, poem["language"].split("; ")
+                    )
                     poem["language"] = ",".join(
                         [str(language_id) for language_id in language_ids]
                     )
-                file_key = f'poem/audio/{poem["telepoemNumber"]}.mp3'
-                for link in s3_audio_links:
-                    if link == file_key:
-                        poem["audioLink"] = (
-                            f"https://{bucket_name}.s3.amazonaws.com/{link}"
-                        )
-                        break
-                    else:
-                        poem["audioLink"] = None
-                poem_obj = Poem.objects.filter(
-                    telepoemNumber=poem["telepoemNumber"]
-                ).first()
+                poem["audioLink"] = audio_index.get_link(poem["telepoemNumber"])
                 if poem["recordingDate"] == "":
                     poem["recordingDate"] = None
                 if poem["recordingDuration"] == "":
@@ -434,233 +1414,496 @@ class Handler:
                         poem["recordingDuration"] = duration[:-3]
                     else:
                         poem["recordingDuration"] = duration
-                if poem_obj:
-                    poem_obj.title = poem["title"]
-                    poem_obj.poetId = poem["poetId"]
-                    poem_obj.producerName = poem["producerName"]
-                    poem_obj.narratorName = poem["narratorName"]
-                    poem_obj.recordingDate = poem["recordingDate"]
-                    poem_obj.recordingSource = poem["recordingSource"]
-                    poem_obj.poemEra = poem["poemEra"]
-                    poem_obj.poemTypes = poem["poemTypes"]
-                    poem_obj.poemTopics = poem["poemTopics"]
-                    # poem_obj.poemSpecialTags = poem["poemSpecialTags"]
-                    poem_obj.language = poem["language"]
-                    poem_obj.active = poem["active"]
-                    # poem_obj.optionalLegal = poem["optionalLegal"]
-                    poem_obj.isChildrensPoem = poem["isChildrensPoem"]
-                    poem_obj.isAdultPoem = poem["isAdultPoem"]
-                    poem_obj.recordingDuration = poem["recordingDuration"]
-                    poem_obj.telepoemNumber = poem["telepoemNumber"]
-                    poem_obj.copyRights = poem["copyRights"]
-                    poem_obj.poemText = poem["poemText"]
-                    poem_obj.audioLink = poem["audioLink"]
-                    poem_obj.save()
-                    print("Poem Updated")
+
+            poem_groups = group_rows(poems, lambda poem: poem["telepoemNumber"])
+            existing_poems = {}
+            for poem_obj in (
+                Poem.objects.filter(telepoemNumber__in=list(poem_groups))
+                .only("id", "telepoemNumber", "sourceHash")
+                .order_by("pk")
+            ):
+                existing_poems.setdefault(poem_obj.telepoemNumber, poem_obj)
+
+            poems_to_create = []
+            poems_to_update = []
+            poems_skipped = 0
+            for telepoem_number, rows in poem_groups.items():
+                poem_obj = existing_poems.get(telepoem_number)
+                is_new = poem_obj is None
+                if is_new:
+                    poem_obj = Poem(**rows[0])
+                # Later rows for the same telepoem number overwrite earlier
+                # ones, so the last row decides what is stored.
+                for field in self.POEM_UPDATE_FIELDS:
+                    setattr(poem_obj, field, rows[-1][field])
+                source_hash = get_source_hash(poem_obj, self.POEM_UPDATE_FIELDS)
+                if is_new:
+                    poems_to_create.append(poem_obj)
+                elif poem_obj.sourceHash == source_hash:
+                    poems_skipped += 1
+                    continue
                 else:
-                    poem_obj = Poem.objects.create(
-                        **poem,
-                    )
-                    print("Poem Created")
-                poet_and_poem_obj = PoetAndPoem.objects.filter(
-                    poemId=poem_obj.id, poetId=poem["poetId"]
-                ).first()
-                if not poet_and_poem_obj:
-                    PoetAndPoem.objects.create(
-                        poemId=poem_obj.id, poetId=poem["poetId"]
-                    )
-                    print("PoetAndPoem Created")
-                poem_ids.append(poem_obj.id)
+                    poems_to_update.append(poem_obj)
+                poem_obj.sourceHash = source_hash
+                existing_poems[telepoem_number] = poem_obj
+
+            self.save_objects(
+                Poem,
+                poems_to_create,
+                poems_to_update,
+                self.POEM_UPDATE_FIELDS,
+                poems_skipped,
+            )
+            poem_ids = [existing_poems[poem["telepoemNumber"]].id for poem in poems]
+
+            poet_and_poem_pairs = {
+                (poem_id, poem["poetId"]): None
+                for poem_id, poem in zip(poem_ids, poems)
+            }
+            existing_poet_and_poem_pairs = set(
+                PoetAndPoem.objects.filter(poemId__in=set(poem_ids)).values_list(
+                    "poemId", "poetId"
+                )
+            )
+            poet_and_poems = [
+                PoetAndPoem(poemId=poem_id, poetId=poet_id)
+                for poem_id, poet_id in poet_and_poem_pairs
+                if (poem_id, poet_id) not in existing_poet_and_poem_pairs
+            ]
+            PoetAndPoem.objects.bulk_create(
+                poet_and_poems, batch_size=self.batch_size, ignore_conflicts=True
+            )
+            count_event("PoetAndPoem.created", len(poet_and_poems))
+            if poet_and_poems:
+                logger.debug("PoetAndPoem created: %d", len(poet_and_poems))
             return poem_ids
         except Exception as e:
-            print(f"Error: {e}")
+            logger.error("Error: %s", e)
             raise e
 
+    @staticmethod
+    def expand_booths(booth_df):
+        # A row lists several booths as "; "-separated names, numbers and
+        # phone types; shorter lists repeat their last value.
+        booth_df = booth_df.reset_index(drop=True)
+        split_columns = {
+            "boothName": booth_df["boothName"].str.split("; "),
+            "number": booth_df["number"].astype(str).str.split("; "),
+            "phoneType": booth_df["phoneType"].str.split("; "),
+        }
+        num_booths = pd.concat(
+            [values.str.len() for values in split_columns.values()], axis=1
+        ).max(axis=1)
+        for column, values in split_columns.items():
+            booth_df[column] = [
+                value + value[-1:] * (count - len(value))
+                for value, count in zip(values, num_booths)
+            ]
+        booth_df["row"] = booth_df.index
+        return booth_df.explode(list(split_columns))
+
     def booths_handler(self):
         if self.table_dfs is None:
             return
         try:
-            booth_ids_list = []
-            for index, booth in self.table_dfs.iterrows():
-                booth_ids = []
-                booth_names = booth["boothName"].split("; ")
-                booth_numbers = str(booth["number"]).split("; ")
-                phone_types = booth["phoneType"].split("; ")
-                # booth_types = booth["boothType"].split("; ")
-
-                # Check if the number of values in each column matches
-                num_booths = max(
-                    len(booth_names),
-                    len(booth_numbers),
-                    len(phone_types),
-                    # len(booth_types),
+            booths = self.expand_booths(self.table_dfs)
+            self.dimensions.load(PhoneType, booths["phoneType"])
+            self.dimensions.load(DirectoryType, booths["directoryType"])
+            self.dimensions.load(
+                BoothMaintainer, filter(None, booths["maintainerName"])
+            )
+            booth_ids_list = [[] for _ in range(len(self.table_dfs))]
+            booths = booths.to_dict("records")
+            for booth in booths:
+                booth["maintainerName"] = booth["maintainerName"] or None
+                if booth["zipCode"] == "":
+                    booth["zipCode"] = None
+            booth_groups = group_rows(
+                booths, lambda booth: (booth["boothName"], booth["maintainerName"])
+            )
+            existing_booths = self.entities.get_objects(Booth)
+            missing = set(self.entities.get_missing(Booth, booth_groups))
+            if missing:
+                for booth_obj in Booth.objects.filter(
+                    boothName__in={booth_name for booth_name, _ in missing}
+                ).order_by("pk"):
+                    key = (booth_obj.boothName, booth_obj.maintainerName)
+                    if key in missing:
+                        existing_booths.setdefault(key, booth_obj)
+
+            booths_to_create = {}
+            for key, rows in booth_groups.items():
+                booth_obj = existing_booths.get(key)
+                if booth_obj is None:
+                    booth_obj = Booth(boothName=key[0])
+                    existing_booths[key] = booths_to_create[key] = booth_obj
+                # Later rows for the same booth overwrite earlier ones.
+                booth = rows[-1]
+                booth_obj.number = booth["number"]
+                booth_obj.phoneTypeId = self.dimensions.get_id(
+                    PhoneType, booth["phoneType"]
                 )
+                booth_obj.directoryTypeId = self.dimensions.get_id(
+                    DirectoryType, booth["directoryType"]
+                )
+                booth_obj.maintainerName = booth["maintainerName"]
+                booth_obj.physicalAddress = booth["physicalAddress"]
+                booth_obj.city = booth["city"]
+                booth_obj.state = booth["state"]
+                booth_obj.zipCode = booth["zipCode"]
+                booth_obj.installationDate = booth["installationDate"]
+                booth_obj.installationType = booth["installationType"]
+                booth_obj.active = booth["active"]
+                booth_obj.isADAAccessible = booth["isADAAccessible"]
 
-                for i in range(num_booths):
-                    booth_name = (
-                        booth_names[i] if i < len(booth_names) else booth_names[-1]
-                    )
-                    booth_number = (
-                        booth_numbers[i]
-                        if i < len(booth_numbers)
-                        else booth_numbers[-1]
-                    )
-                    phone_type = (
-                        phone_types[i] if i < len(phone_types) else phone_types[-1]
-                    )
-                    # booth_type = (
-                    #     booth_types[i] if i < len(booth_types) else booth_types[-1]
-                    # )
-
-                    phone_type_obj = PhoneType.objects.filter(name=phone_type).first()
-                    if not phone_type_obj:
-                        phone_type_obj = PhoneType.objects.create(name=phone_type)
-                        print("PhoneType Created")
-
-                    # telepoem_booth_type_obj = TelepoemBoothType.objects.filter(
-                    #     name=booth_type
-                    # ).first()
-                    # if not telepoem_booth_type_obj:
-                    #     telepoem_booth_type_obj = TelepoemBoothType.objects.create(
-                    #         name=booth_type
-                    #     )
-                    #     print("TelepoemBoothType Created")
-
-                    directoryType_obj = DirectoryType.objects.filter(
-                        name=booth["directoryType"]
-                    ).first()
-                    if not directoryType_obj:
-                        directoryType_obj = DirectoryType.objects.create(
-                            name=booth["directoryType"]
-                        )
-                        print("DirectoryType Created")
-
-                    if booth["maintainerName"]:
-                        booth_maintainer = BoothMaintainer.objects.filter(
-                            name=booth["maintainerName"]
-                        ).first()
-                        if not booth_maintainer:
-                            booth_maintainer = BoothMaintainer.objects.create(
-                                name=booth["maintainerName"]
-                            )
-                            print("BoothMaintainer Created")
-                        maintainerName = booth_maintainer.name
-                    else:
-                        maintainerName = None
-                    # Create Booth object with the extracted values
-                    booth_obj = Booth.objects.filter(
-                        boothName=booth_name, maintainerName=maintainerName
-                    ).first()
-                    if booth["zipCode"] == "":
-                        booth["zipCode"] = None
-                    if booth_obj:
-                        booth_obj.number = booth_number
-                        booth_obj.phoneTypeId = phone_type_obj.id
-                        # booth_obj.boothTypeId = telepoem_booth_type_obj.id
-                        booth_obj.directoryTypeId = directoryType_obj.id
-                        booth_obj.maintainerName = maintainerName
-                        # booth_obj.directoryTabletSerialNumber = booth[
-                        #     "directoryTabletSerialNumber"
-                        # ]
-                        booth_obj.physicalAddress = booth["physicalAddress"]
-                        booth_obj.city = booth["city"]
-                        booth_obj.state = booth["state"]
-                        booth_obj.zipCode = booth["zipCode"]
-                        booth_obj.installationDate = booth["installationDate"]
-                        booth_obj.installationType = booth["installationType"]
-                        booth_obj.active = booth["active"]
-                        booth_obj.isADAAccessible = booth["isADAAccessible"]
-                        # booth_obj.phoneSerialNumber = booth["phoneSerialNumber"]
-                        # booth_obj.installationNotes = booth["installationNotes"]
-                        # booth_obj.deviceInfo = booth["deviceInfo"]
-                        booth_obj.save()
-                        print("Booth Updated")
-                    else:
-                        booth_obj = Booth.objects.create(
-                            boothName=booth_name,
-                            number=booth_number,
-                            phoneTypeId=phone_type_obj.id,
-                            # boothTypeId=telepoem_booth_type_obj.id,
-                            directoryTypeId=directoryType_obj.id,
-                            maintainerName=maintainerName,
-                            # directoryTabletSerialNumber=booth[
-                            #     "directoryTabletSerialNumber"
-                            # ],
-                            physicalAddress=booth["physicalAddress"],
-                            city=booth["city"],
-                            state=booth["state"],
-                            zipCode=booth["zipCode"],
-                            installationDate=booth["installationDate"],
-                            installationType=booth["installationType"],
-                            active=booth["active"],
-                            isADAAccessible=booth["isADAAccessible"],
-                            # phoneSerialNumber=booth["phoneSerialNumber"],
-                            # installationNotes=booth["installationNotes"],
-                            # deviceInfo=booth["deviceInfo"],
-                        )
-                        print("Booth Created")
-                    booth_ids.append(booth_obj.id)
-                booth_ids_list.append(booth_ids)
+            self.create_objects(Booth, booths_to_create, self.BOOTH_UPDATE_FIELDS)
+            for booth in booths:
+                booth_ids_list[booth["row"]].append(
+                    existing_booths[(booth["boothName"], booth["maintainerName"])].id
+                )
             return booth_ids_list
         except Exception as e:
-            print(f"Error: {e}")
+            logger.error("Error: %s", e)
             raise e
 
     def poem_collections_handler(self):
         if self.table_dfs is None:
             return
         try:
-            for index, poemcollection in self.table_dfs.iterrows():
-                poemCollectionNames = poemcollection["poemCollectionName"].split("; ")
-
-                num_poemCollectionNames = len(poemCollectionNames)
+            poem_collections = self.table_dfs.to_dict("records")
+            for poemcollection in poem_collections:
+                poemcollection["poemCollectionName"] = poemcollection[
+                    "poemCollectionName"
+                ].split("; ")
+            existing_poem_collections = self.entities.get_objects(PoemCollection)
+            names = self.entities.get_missing(
+                PoemCollection,
+                [
+                    name
+                    for poemcollection in poem_collections
+                    for name in poemcollection["poemCollectionName"]
+                ],
+            )
+            if names:
+                for poem_collection_obj in PoemCollection.objects.filter(
+                    poemCollectionName__in=names
+                ).order_by("pk"):
+                    existing_poem_collections.setdefault(
+                        poem_collection_obj.poemCollectionName, poem_collection_obj
+                    )
 
-                for i in range(num_poemCollectionNames):
-                    poemCollectionName = (
-                        poemCollectionNames[i]
-                        if i < num_poemCollectionNames
-                        else poemCollectionNames[-1]
+            poem_collections_to_create = {}
+            poem_collection_ids = set()
+            # Desired junction rows, in first-seen order.
+            collection_poem_pairs = {}
+            booth_collection_pairs = {}
+            for poemcollection in poem_collections:
+                for poemCollectionName in poemcollection["poemCollectionName"]:
+                    poem_collection_obj = existing_poem_collections.get(
+                        poemCollectionName
                     )
-                    poem_collection_obj = PoemCollection.objects.filter(
-                        poemCollectionName=poemCollectionName,
-                    ).first()
-                    if poem_collection_obj:
-                        poem_collection_obj.poemCollectionDescription = poemcollection[
-                            "poemCollectionDescription"
-                        ]
-                        poem_collection_obj.save()
-                        print("Poem Collection updated")
-                    else:
-                        poem_collection_obj = PoemCollection.objects.create(
-                            poemCollectionName=poemCollectionName,
-                            poemCollectionDescription=poemcollection[
-                                "poemCollectionDescription"
-                            ],
-                        )
-                        print("Poem Collection created")
-                    poem_collection_and_poem_obj = PoemCollectionAndPoem.objects.filter(
-                        poemCollectionId=poem_collection_obj.id,
-                        poemId=poemcollection["poemId"],
-                    ).first()
-                    if not poem_collection_and_poem_obj:
-                        PoemCollectionAndPoem.objects.create(
-                            poemCollectionId=poem_collection_obj.id,
-                            poemId=poemcollection["poemId"],
+                    if poem_collection_obj is None:
+                        poem_collection_obj = PoemCollection(
+                            poemCollectionName=poemCollectionName
                         )
-                        print("Poem Collection and Poem created")
-                    for booth in poemcollection["boothId"]:
-                        booth_and_poem_collection_obj = (
-                            BoothAndPoemCollection.objects.filter(
-                                boothId=booth,
-                                poemCollectionId=poem_collection_obj.id,
-                            ).first()
-                        )
-                        if not booth_and_poem_collection_obj:
-                            BoothAndPoemCollection.objects.create(
-                                boothId=booth,
-                                poemCollectionId=poem_collection_obj.id,
-                            )
-                            print(f"Booth and Peom Collection created")
+                        existing_poem_collections[poemCollectionName] = (
+                            poem_collections_to_create[poemCollectionName]
+                        ) = poem_collection_obj
+                    # The last row naming a collection decides its description.
+                    poem_collection_obj.poemCollectionDescription = poemcollection[
+                        "poemCollectionDescription"
+                    ]
+                    poem_collection_ids.add(poem_collection_obj.id)
+                    collection_poem_pairs[
+                        (poem_collection_obj.id, poemcollection["poemId"])
+                    ] = None
+                    for booth in poemcollection["boothId"] or []:
+                        booth_collection_pairs[(booth, poem_collection_obj.id)] = None
+
+            existing_collection_poem_pairs = set(
+                PoemCollectionAndPoem.objects.filter(
+                    poemCollectionId__in=poem_collection_ids
+                ).values_list("poemCollectionId", "poemId")
+            )
+            existing_booth_collection_pairs = set(
+                BoothAndPoemCollection.objects.filter(
+                    poemCollectionId__in=poem_collection_ids
+                ).values_list("boothId", "poemCollectionId")
+            )
+            poem_collection_and_poems = [
+                PoemCollectionAndPoem(poemCollectionId=collection_id, poemId=poem_id)
+                for collection_id, poem_id in collection_poem_pairs
+                if (collection_id, poem_id) not in existing_collection_poem_pairs
+            ]
+            booth_and_poem_collections = [
+                BoothAndPoemCollection(boothId=booth_id, poemCollectionId=collection_id)
+                for booth_id, collection_id in booth_collection_pairs
+                if (booth_id, collection_id) not in existing_booth_collection_pairs
+            ]
+            with transaction.atomic():
+                self.create_objects(
+                    PoemCollection,
+                    poem_collections_to_create,
+                    self.POEM_COLLECTION_UPDATE_FIELDS,
+                )
+                PoemCollectionAndPoem.objects.bulk_create(
+                    poem_collection_and_poems,
+                    batch_size=self.batch_size,
+                    ignore_conflicts=True,
+                )
+                BoothAndPoemCollection.objects.bulk_create(
+                    booth_and_poem_collections,
+                    batch_size=self.batch_size,
+                    ignore_conflicts=True,
+                )
+            count_event("PoemCollectionAndPoem.created", len(poem_collection_and_poems))
+            count_event(
+                "BoothAndPoemCollection.created", len(booth_and_poem_collections)
+            )
+            logger.debug(
+                "Poem collection poem links created: %d, booth links created: %d",
+                len(poem_collection_and_poems),
+                len(booth_and_poem_collections),
+            )
         except Exception as e:
-            print(f"Error: {e}")
+            logger.error("Error: %s", e)
             raise e
+
+
+def add_counts(counts, table, stats):
+    table_counts = counts.setdefault(table, dict.fromkeys(stats, 0))
+    for key, value in stats.items():
+        table_counts[key] += value
+
+
+def transform_tables(table_dfs):
+    # Maps each sheet table onto the model's columns; pure pandas, no queries.
+    transforms = {
+        TableName.POET_INFORMATION.value: PoetTableProcessor.populate_poet_table_according_to_db,
+        TableName.POEM_INFORMATION.value: PoemTableProcessor.populate_poem_table_according_to_db,
+        TableName.BOOTH_INFORMATION.value: BoothTableProcessor.populate_booth_table_according_to_db,
+        TableName.POEM_COLLECTION_INFORMATION.value: PoemCollectionTableProcessor.populate_poemcollection_table_according_to_db,
+    }
+    return {
+        table_name: transforms[table_name](table_df)
+        for table_name, table_df in table_dfs.items()
+        if table_name in transforms
+    }
+
+
+class TableWriter:
+    """Writes one chunk's tables in dependency order."""
+
+    DEPENDENCIES = {
+        TableName.POET_INFORMATION.value: [],
+        TableName.POEM_INFORMATION.value: [TableName.POET_INFORMATION.value],
+        TableName.BOOTH_INFORMATION.value: [],
+        TableName.POEM_COLLECTION_INFORMATION.value: [
+            TableName.POEM_INFORMATION.value,
+            TableName.BOOTH_INFORMATION.value,
+        ],
+    }
+    # Name of each table in counts and metrics.
+    STAGES = {
+        TableName.POET_INFORMATION.value: "poets",
+        TableName.POEM_INFORMATION.value: "poems",
+        TableName.BOOTH_INFORMATION.value: "booths",
+        TableName.POEM_COLLECTION_INFORMATION.value: "poem_collections",
+    }
+    # Tables whose updates EntityCache holds until the end of the run, with
+    # the model and the fields written.
+    ENTITIES = {
+        TableName.POET_INFORMATION.value: (Poet, Handler.POET_UPDATE_FIELDS),
+        TableName.BOOTH_INFORMATION.value: (Booth, Handler.BOOTH_UPDATE_FIELDS),
+        TableName.POEM_COLLECTION_INFORMATION.value: (
+            PoemCollection,
+            Handler.POEM_COLLECTION_UPDATE_FIELDS,
+        ),
+    }
+
+    def __init__(
+        self,
+        dimensions=None,
+        audio_index=None,
+        counts=None,
+        metrics=None,
+        on_table=None,
+        entities=None,
+    ):
+        self.dimensions = dimensions or DimensionCache()
+        self.audio_index = audio_index
+        self.counts = {} if counts is None else counts
+        self.metrics = metrics
+        self.on_table = on_table
+        self.entities = entities or EntityCache()
+
+    def write_table(self, table_name, table_df, ids):
+        if self.on_table is not None:
+            self.on_table(table_name)
+        with measure(self.metrics, self.STAGES[table_name], rows=len(table_df)):
+            return self.handle_table(table_name, table_df, ids)
+
+    def handle_table(self, table_name, table_df, ids):
+        if table_name == TableName.POET_INFORMATION.value:
+            handler = Handler(
+                table_df, dimensions=self.dimensions, entities=self.entities
+            )
+            result = handler.poets_handler()
+        elif table_name == TableName.POEM_INFORMATION.value:
+            table_df["poetId"] = ids.get(TableName.POET_INFORMATION.value, [])
+            handler = Handler(
+                table_df, dimensions=self.dimensions, audio_index=self.audio_index
+            )
+            result = handler.poems_handler()
+        elif table_name == TableName.BOOTH_INFORMATION.value:
+            handler = Handler(
+                table_df, dimensions=self.dimensions, entities=self.entities
+            )
+            result = handler.booths_handler()
+        elif table_name == TableName.POEM_COLLECTION_INFORMATION.value:
+            table_df["poemId"] = ids.get(TableName.POEM_INFORMATION.value, [])
+            table_df["boothId"] = ids.get(TableName.BOOTH_INFORMATION.value, [])
+            handler = Handler(
+                table_df, dimensions=self.dimensions, entities=self.entities
+            )
+            result = handler.poem_collections_handler()
+        add_counts(self.counts, self.STAGES[table_name], handler.stats)
+        return result
+
+    def flush(self):
+        # Writes the updates the run's chunks left in the EntityCache.
+        for table_name, (model, fields) in self.ENTITIES.items():
+            if model not in self.entities.objects:
+                continue
+            with measure(self.metrics, self.STAGES[table_name]):
+                with transaction.atomic():
+                    stats = self.entities.flush(model, fields)
+            add_counts(self.counts, self.STAGES[table_name], stats)
+        return self.counts
+
+    def write_table_in_thread(self, table_name, table_df, ids):
+        try:
+            return self.write_table(table_name, table_df, ids)
+        finally:
+            # Pool threads each open their own connection; close it so it
+            # is not left behind when the thread goes away.
+            connection.close()
+
+    def get_ready(self, table_dfs, done):
+        return [
+            table_name
+            for table_name in table_dfs
+            if table_name not in done
+            and all(
+                dependency in done or dependency not in table_dfs
+                for dependency in self.DEPENDENCIES[table_name]
+            )
+        ]
+
+    def write(self, table_dfs, parallel=IMPORT_PARALLEL_TABLES):
+        ids = {}
+        if not parallel:
+            while len(ids) < len(table_dfs):
+                table_name = self.get_ready(table_dfs, ids)[0]
+                ids[table_name] = self.write_table(
+                    table_name, table_dfs[table_name], ids
+                )
+            return self.counts
+
+        running = {}
+        with ThreadPoolExecutor(
+            max_workers=len(table_dfs) or 1, thread_name_prefix="import-table"
+        ) as executor:
+            while len(ids) < len(table_dfs):
+                for table_name in self.get_ready(table_dfs, ids):
+                    if table_name not in running.values():
+                        future = executor.submit(
+                            run_in_context(self.write_table_in_thread),
+                            table_name,
+                            table_dfs[table_name],
+                            dict(ids),
+                        )
+                        running[future] = table_name
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    ids[running.pop(future)] = future.result()
+        return self.counts
+
+
+def write_tables(
+    table_dfs,
+    dimensions=None,
+    audio_index=None,
+    counts=None,
+    on_table=None,
+    metrics=None,
+    parallel=IMPORT_PARALLEL_TABLES,
+    entities=None,
+):
+    # Takes transform_tables() output. Returns created/updated/skipped counts
+    # per table, accumulated into ``counts`` when one is passed in across
+    # chunks. ``on_table`` is called with each table name before it is
+    # handled. A run of several chunks passes one EntityCache to every
+    # chunk and calls flush_tables() after the last; without one the tables
+    # are the whole run and their updates are written here.
+    writer = TableWriter(
+        dimensions=dimensions,
+        audio_index=audio_index,
+        counts=counts,
+        metrics=metrics,
+        on_table=on_table,
+        entities=entities,
+    )
+    writer.write(table_dfs, parallel=parallel)
+    if entities is None:
+        writer.flush()
+    return writer.counts
+
+
+def flush_tables(entities, counts=None, metrics=None):
+    return TableWriter(counts=counts, metrics=metrics, entities=entities).flush()
+
+
+def process_tables(
+    table_dfs,
+    dimensions=None,
+    audio_index=None,
+    counts=None,
+    on_table=None,
+    metrics=None,
+    parallel=IMPORT_PARALLEL_TABLES,
+    entities=None,
+):
+    with measure(metrics, "transform", rows=count_rows(table_dfs)):
+        table_dfs = transform_tables(table_dfs)
+    return write_tables(
+        table_dfs,
+        dimensions=dimensions,
+        audio_index=audio_index,
+        counts=counts,
+        on_table=on_table,
+        metrics=metrics,
+        parallel=parallel,
+        entities=entities,
+    )
+
+
+def iter_table_chunks(
+    file, stream=False, chunk_size=IMPORT_CHUNK_SIZE, input_format="xlsx"
+):
+    reader_class = TABLE_READERS[input_format]
+    if input_format == "csv" and zipfile.is_zipfile(file):
+        reader_class = CsvArchiveTableReader
+    if stream:
+        yield from reader_class(file, chunk_size).iter_table_dataframes()
+    elif reader_class is StreamingTableReader:
+        df = pd.read_excel(file)
+        yield TableProcessor(df).get_table_dataframes()
+    elif reader_class is CsvTableReader:
+        if not isinstance(file, str):
+            file.seek(0)
+        df = pd.read_csv(file, encoding="utf-8-sig")
+        yield TableProcessor(df).get_table_dataframes()
+    else:
+        # Parquet, JSON lines and CSV archives are read whole as one chunk.
+        yield from reader_class(file, None).iter_table_dataframes()
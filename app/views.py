@@ -1,51 +1,129 @@
+from django.urls import reverse
+from rest_framework import status
 from rest_framework.generics import GenericAPIView
 from rest_framework.response import Response
-import pandas as pd
+from .jobs import create_import_job, submit_import_job
+from .metrics import ImportMetrics, count_rows
+from .models import ImportJob
+from django.conf import settings
 from .utils import (
-    TableProcessor,
-    TableName,
-    PoetTableProcessor,
-    PoemTableProcessor,
-    PoemCollectionTableProcessor,
-    BoothTableProcessor,
-    Handler,
+    IMPORT_CHUNK_SIZE,
+    DimensionCache,
+    EntityCache,
+    flush_tables,
+    get_audio_index,
+    get_input_format,
+    iter_table_chunks,
+    process_tables,
 )
 
 
 class IndexView(GenericAPIView):
 
     def post(self, request):
-        file = request.FILES["file"]
+        files = request.FILES
+        if getattr(request, "upload_too_large", False):
+            return Response(
+                {
+                    "error": "File is larger than the "
+                    f"{settings.IMPORT_MAX_UPLOAD_SIZE} byte upload limit"
+                },
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+        file = files["file"]
+        stream = request.query_params.get("stream", "").lower() in ["true", "1", "yes"]
         try:
-            df = pd.read_excel(file)
-            table_dfs = TableProcessor(df).get_table_dataframes()
-            poet_ids = []
-            poem_ids = []
-            booth_ids = []
-            for table_name, table_df in table_dfs.items():
-                if table_name == TableName.POET_INFORMATION.value:
-                    poet_df = PoetTableProcessor.populate_poet_table_according_to_db(
-                        table_df
-                    )
-                    poet_ids = Handler(poet_df).poets_handler()
-                elif table_name == TableName.POEM_INFORMATION.value:
-                    poem_df = PoemTableProcessor.populate_poem_table_according_to_db(
-                        table_df
-                    )
-                    poem_df["poetId"] = poet_ids
-                    poem_ids = Handler(poem_df).poems_handler()
-                elif table_name == TableName.BOOTH_INFORMATION.value:
-                    booth_df = BoothTableProcessor.populate_booth_table_according_to_db(
-                        table_df
-                    )
-                    booth_ids = Handler(booth_df).booths_handler()
-                elif table_name == TableName.POEM_COLLECTION_INFORMATION.value:
-                    poemcollection_df = PoemCollectionTableProcessor.populate_poemcollection_table_according_to_db(
-                        table_df
-                    )
-                    poemcollection_df["poemId"] = poem_ids
-                    poemcollection_df["boothId"] = booth_ids
-                    Handler(poemcollection_df).poem_collections_handler()
-            return Response({"success": "Data saved successfully"})
+            chunk_size = int(request.query_params.get("chunk_size", IMPORT_CHUNK_SIZE))
+            if chunk_size < 1:
+                raise ValueError
+        except ValueError:
+            return Response(
+                {"error": "chunk_size must be a positive integer"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            input_format = get_input_format(file.name, file.content_type)
+        except ValueError as e:
+            return Response(
+                {"error": str(e)}, status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+        if request.query_params.get("mode") == "async":
+            job = create_import_job(
+                file, stream=stream, chunk_size=chunk_size, input_format=input_format
+            )
+            submit_import_job(job)
+            return Response(
+                {
+                    "jobId": job.id,
+                    "sha256": getattr(file, "sha256", None),
+                    "status": request.build_absolute_uri(reverse("job", args=[job.id])),
+                },
+                status=status.HTTP_202_ACCEPTED,
+            )
+        try:
+            metrics = ImportMetrics("upload")
+            dimensions = DimensionCache()
+            entities = EntityCache()
+            with metrics.stage("audio"):
+                audio_index = get_audio_index()
+            counts = {}
+            # Parse from the spooled file on disk rather than the upload object.
+            source = (
+                file.temporary_file_path()
+                if hasattr(file, "temporary_file_path")
+                else file
+            )
+            for table_dfs in metrics.iterate(
+                "parse",
+                iter_table_chunks(
+                    source,
+                    stream=stream,
+                    chunk_size=chunk_size,
+                    input_format=input_format,
+                ),
+                count=count_rows,
+            ):
+                process_tables(
+                    table_dfs,
+                    dimensions=dimensions,
+                    audio_index=audio_index,
+                    counts=counts,
+                    metrics=metrics,
+                    entities=entities,
+                )
+                metrics.progress(count_rows(table_dfs))
+            flush_tables(entities, counts=counts, metrics=metrics)
+            return Response(
+                {
+                    "success": "Data saved successfully",
+                    "sha256": getattr(file, "sha256", None),
+                    "counts": counts,
+                    "metrics": metrics.finish(),
+                }
+            )
         except Exception as e:
             return Response({"error": e})
+
+
+class JobView(GenericAPIView):
+
+    def get(self, request, job_id):
+        job = ImportJob.objects.filter(id=job_id).first()
+        if job is None:
+            return Response(
+                {"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(
+            {
+                "jobId": job.id,
+                "fileName": job.fileName,
+                "status": job.status,
+                "stage": job.stage,
+                "rowsProcessed": job.rowsProcessed,
+                "counts": job.counts,
+                "error": job.error,
+                "createdAt": job.createdAt,
+                "startedAt": job.startedAt,
+                "finishedAt": job.finishedAt,
+            }
+        )
@@ -0,0 +1,68 @@
+"""Audio link lookup: linear scan over every bucket key vs AudioKeyIndex.
+
+    python benchmarks/audio_index.py --poems 2000 --keys 20000
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def linear_scan(keys, telepoem_numbers):
+    links = {}
+    for telepoem_number in telepoem_numbers:
+        file_key = f"poem/audio/{telepoem_number}.mp3"
+        for key in keys:
+            if key == file_key:
+                links[telepoem_number] = key
+                break
+    return links
+
+
+def indexed(bucket_name, keys, telepoem_numbers):
+    from app.utils import AudioKeyIndex
+
+    audio_index = AudioKeyIndex(bucket_name, keys)
+    return {
+        telepoem_number: audio_index.get_key(telepoem_number)
+        for telepoem_number in telepoem_numbers
+        if audio_index.get_key(telepoem_number)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--poems", type=int, default=2000)
+    parser.add_argument("--keys", type=int, default=20000)
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "conf.settings")
+    import django
+
+    django.setup()
+    import app.utils  # noqa: F401  keep module import time out of the timings
+
+    audio_keys = [f"poem/audio/{5550000000 + i}.mp3" for i in range(args.keys // 2)]
+    other_keys = [f"poem/image/{5550000000 + i}.jpg" for i in range(args.keys // 2)]
+    keys = other_keys + audio_keys
+    telepoem_numbers = [str(5550000000 + i * 3) for i in range(args.poems)]
+
+    started = time.perf_counter()
+    expected = linear_scan(keys, telepoem_numbers)
+    scan_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    result = indexed("telepoem", keys, telepoem_numbers)
+    index_time = time.perf_counter() - started
+
+    assert result == expected
+    print(f"{args.poems} poems x {len(keys)} keys, {len(result)} matches")
+    print(f"linear scan: {scan_time:.3f}s")
+    print(f"index:       {index_time:.4f}s ({scan_time / index_time:.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""Benchmark run_process end to end and write a JSON report.
+
+Generates a workbook (or takes one), serves it and the audio bucket from
+moto's in-process S3, and runs run_process against SQLite or the
+database in DATABASE_URL. Each run starts from an empty database. The
+report has wall time, query and S3 request counts and, on an extra
+traced run, peak Python memory for every stage: download, audio, parse,
+transform and the write of each table. Pass --compare with an earlier report to print the
+change per stage.
+
+    python benchmarks/import_run.py --rows 10000 --output report.json
+    DATABASE_URL=postgres://... python benchmarks/import_run.py --rows 100000 --stream
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_BUCKET = "bulk-import"
+
+
+class Recorder:
+    """Accumulates time and traced memory per stage."""
+
+    def __init__(self):
+        self.stages = {}
+        self.lock = threading.Lock()
+        self.trace_memory = False
+
+    def get_stage(self, name):
+        with self.lock:
+            return self.stages.setdefault(
+                name,
+                {
+                    "seconds": 0.0,
+                    "queries": 0,
+                    "s3_requests": 0,
+                    "calls": 0,
+                    "peak_mb": 0.0,
+                },
+            )
+
+    @contextmanager
+    def stage(self, name):
+        stats = self.get_stage(name)
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            stats["seconds"] += time.perf_counter() - started
+            stats["calls"] += 1
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1] / 2**20
+                stats["peak_mb"] = max(stats["peak_mb"], round(peak, 2))
+
+    def wrap(self, name, function):
+        def wrapper(*args, **kwargs):
+            with self.stage(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    def wrap_iterator(self, name, function):
+        def wrapper(*args, **kwargs):
+            iterator = iter(function(*args, **kwargs))
+            while True:
+                with self.stage(name):
+                    item = next(iterator, None)
+                if item is None:
+                    return
+                yield item
+
+        return wrapper
+
+
+def instrument(recorder):
+    from app import utils
+    from app.management.commands import run_process
+
+    run_process.get_excel_file = recorder.wrap("download", utils.get_excel_file)
+    run_process.get_audio_index = recorder.wrap("audio", utils.get_audio_index)
+    run_process.iter_table_chunks = recorder.wrap_iterator(
+        "parse", utils.iter_table_chunks
+    )
+    utils.transform_tables = recorder.wrap("transform", utils.transform_tables)
+    write_table = utils.TableWriter.write_table
+
+    def write_table_stage(self, table_name, table_df, ids):
+        with recorder.stage(f"write {table_name}"):
+            return write_table(self, table_name, table_df, ids)
+
+    utils.TableWriter.write_table = write_table_stage
+
+
+def setup_s3(workbook, audio_keys):
+    import boto3
+
+    from benchmarks.workbook import get_audio_key
+
+    s3 = boto3.client("s3")
+    s3.create_bucket(Bucket=IMPORT_BUCKET)
+    s3.upload_file(workbook, IMPORT_BUCKET, "bulkupload/file.xlsx")
+    s3.create_bucket(Bucket="telepoem")
+    # Every other poem has a recording.
+    for row in range(0, audio_keys * 2, 2):
+        s3.put_object(Bucket="telepoem", Key=get_audio_key(row), Body=b"")
+
+
+def run_once(options, recorder):
+    from django.core.management import call_command
+
+    from app.management.commands.run_process import run_process
+    from app.utils import TableWriter
+
+    call_command("flush", interactive=False, verbosity=0)
+    recorder.stages = {}
+    started = time.perf_counter()
+    # The import's progress lines go to stderr, keeping stdout for the report.
+    with redirect_stdout(sys.stderr):
+        result = run_process(force=True, **options)
+    wall = time.perf_counter() - started
+    # Queries and S3 requests as the import counted them on every thread
+    # it ran on; stages the recorder does not wrap, such as the ETag check,
+    # keep the import's timing.
+    metrics = result["metrics"]
+    stage_names = {
+        stage: f"write {table_name}" for table_name, stage in TableWriter.STAGES.items()
+    }
+    for name, stats in metrics["stages"].items():
+        stage = recorder.get_stage(stage_names.get(name, name))
+        stage["queries"] += stats["queries"]
+        stage["s3_requests"] += stats["s3_requests"]
+        if not stage["calls"]:
+            stage["seconds"] += stats["seconds"]
+            stage["calls"] += stats["calls"]
+    stages = {
+        name: {**stats, "seconds": round(stats["seconds"], 3)}
+        for name, stats in recorder.stages.items()
+    }
+    return {
+        "wall": round(wall, 3),
+        "queries": metrics["queries"],
+        "s3_requests": metrics["s3_requests"],
+        "stages": stages,
+    }, result
+
+
+def summarize(runs, traced):
+    stage_names = list(dict.fromkeys(name for run in runs for name in run["stages"]))
+    stages = {}
+    for name in stage_names:
+        seconds = [run["stages"].get(name, {}).get("seconds", 0) for run in runs]
+        stages[name] = {
+            "seconds_median": round(statistics.median(seconds), 3),
+            "seconds_min": round(min(seconds), 3),
+            "queries": runs[-1]["stages"].get(name, {}).get("queries", 0),
+            "s3_requests": runs[-1]["stages"].get(name, {}).get("s3_requests", 0),
+            "peak_mb": (
+                traced["stages"].get(name, {}).get("peak_mb") if traced else None
+            ),
+        }
+    walls = [run["wall"] for run in runs]
+    return {
+        "wall_median": round(statistics.median(walls), 3),
+        "wall_min": round(min(walls), 3),
+        "queries": runs[-1]["queries"],
+        "s3_requests": runs[-1]["s3_requests"],
+        "stages": stages,
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+    }
+
+
+def compare(report, baseline):
+    print(f"{'stage':32} {'before':>9} {'after':>9} {'ratio':>7} {'queries':>15}")
+    rows = [("total", baseline["summary"], report["summary"], "wall_median")]
+    for name, stats in report["summary"]["stages"].items():
+        rows.append(
+            (name, baseline["summary"]["stages"].get(name, {}), stats, "seconds_median")
+        )
+    for name, before, after, key in rows:
+        old, new = before.get(key), after.get(key)
+        ratio = f"{new / old:.2f}x" if old else "-"
+        queries = f"{before.get('queries', '-')} -> {after.get('queries', '-')}"
+        print(
+            f"{name:32} {old if old is not None else '-':>9} {new:>9} {ratio:>7} {queries:>15}"
+        )
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument(
+        "--workbook", help="use this workbook instead of generating one"
+    )
+    parser.add_argument("--audio-keys", type=int, help="default: half the rows")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--pipeline", action="store_true")
+    parser.add_argument("--parallel-tables", action="store_true")
+    parser.add_argument("--chunk-size", type=int)
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="reuse parsed tables across runs instead of parsing every run",
+    )
+    parser.add_argument("--no-trace-memory", action="store_true")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="earlier report to compare against")
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    workdir = tempfile.mkdtemp(prefix="import-bench-")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{workdir}/db.sqlite3")
+    os.environ.update(
+        DJANGO_SETTINGS_MODULE="conf.settings",
+        DEBUG="false",
+        BUCKET_NAME=IMPORT_BUCKET,
+        AWS_ACCESS_KEY_ID="benchmark",
+        AWS_SECRET_ACCESS_KEY="benchmark",
+        AWS_DEFAULT_REGION="us-east-1",
+    )
+    os.environ.pop("AWS_S3_ENDPOINT_URL", None)
+    os.environ.pop("AWS_PROFILE", None)
+
+    from moto import mock_aws
+
+    from benchmarks.workbook import build_workbook
+
+    workbook = args.workbook
+    if workbook is None:
+        workbook = build_workbook(os.path.join(workdir, "file.xlsx"), args.rows)
+    mock_aws().start()
+    setup_s3(
+        workbook, args.audio_keys if args.audio_keys is not None else args.rows // 2
+    )
+
+    import django
+
+    django.setup()
+    from django.core.management import call_command
+    from django.db import connection
+
+    call_command("migrate", verbosity=0)
+    recorder = Recorder()
+    instrument(recorder)
+
+    options = {
+        "stream": args.stream,
+        "pipeline": args.pipeline,
+        "parallel_tables": args.parallel_tables,
+        "use_cache": args.cache,
+    }
+    if args.chunk_size:
+        options["chunk_size"] = args.chunk_size
+
+    runs = []
+    for number in range(args.runs):
+        run, result = run_once(options, recorder)
+        runs.append(run)
+        print(
+            f"run {number + 1}: {run['wall']:.2f}s, {run['queries']} queries, "
+            f"{run['s3_requests']} S3 requests",
+            file=sys.stderr,
+        )
+
+    traced = None
+    if not args.no_trace_memory:
+        recorder.trace_memory = True
+        tracemalloc.start()
+        traced, _ = run_once(options, recorder)
+        tracemalloc.stop()
+        recorder.trace_memory = False
+
+    report = {
+        "meta": {
+            "commit": get_commit(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "database": connection.vendor,
+            "rows": args.rows if args.workbook is None else None,
+            "workbook": os.path.basename(workbook),
+            "workbook_bytes": os.path.getsize(workbook),
+            "options": options,
+        },
+        "runs": runs,
+        "summary": summarize(runs, traced),
+        "result": result,
+    }
+    text = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Compare parse time across the bulk-upload input formats.
+
+Writes the same generated rows as xlsx, CSV, a zip of per-table CSVs,
+Parquet and JSON lines, then times iter_table_chunks over each, whole and
+in chunks, plus the *TableProcessor transforms of what it returns. Every
+format has to produce the same number of rows per table.
+
+    python benchmarks/input_formats.py --rows 10000 --runs 3
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse(path, input_format, stream, chunk_size):
+    from app.utils import iter_table_chunks, transform_tables
+
+    rows = {}
+    parse_seconds = 0.0
+    transform_seconds = 0.0
+    chunks = iter_table_chunks(
+        path, stream=stream, chunk_size=chunk_size, input_format=input_format
+    )
+    while True:
+        started = time.perf_counter()
+        table_dfs = next(chunks, None)
+        parse_seconds += time.perf_counter() - started
+        if table_dfs is None:
+            break
+        for table_name, table_df in table_dfs.items():
+            rows[table_name] = rows.get(table_name, 0) + (
+                0 if table_df is None else len(table_df)
+            )
+        started = time.perf_counter()
+        transform_tables(table_dfs)
+        transform_seconds += time.perf_counter() - started
+    return parse_seconds, transform_seconds, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "conf.settings")
+    os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+    import django
+
+    django.setup()
+    from app.utils import get_input_format
+    from benchmarks.workbook import EXTENSIONS, build_input_file
+
+    workdir = tempfile.mkdtemp(prefix="input-formats-")
+    report = {"rows": args.rows, "chunk_size": args.chunk_size, "formats": {}}
+    expected_rows = None
+    failures = []
+    print(
+        f"{'format':8} {'mode':7} {'MB':>6} {'parse s':>8} {'rows/s':>9} {'transform s':>12}"
+    )
+    for name, extension in EXTENSIONS.items():
+        path = os.path.join(workdir, f"workbook{extension}")
+        build_input_file(path, args.rows, input_format=name)
+        input_format = get_input_format(path)
+        results = report["formats"][name] = {"bytes": os.path.getsize(path)}
+        for stream in (False, True):
+            mode = "chunked" if stream else "whole"
+            parse_times = []
+            transform_times = []
+            for _ in range(args.runs):
+                parse_seconds, transform_seconds, rows = parse(
+                    path, input_format, stream, args.chunk_size
+                )
+                parse_times.append(parse_seconds)
+                transform_times.append(transform_seconds)
+            if expected_rows is None:
+                expected_rows = rows
+            elif rows != expected_rows:
+                failures.append(f"{name} {mode}: {rows} rows, expected {expected_rows}")
+            parse_median = statistics.median(parse_times)
+            results[mode] = {
+                "parse_median": round(parse_median, 3),
+                "parse_min": round(min(parse_times), 3),
+                "transform_median": round(statistics.median(transform_times), 3),
+                "rows_per_second": round(args.rows / parse_median),
+            }
+            print(
+                f"{name:8} {mode:7} {results['bytes'] / 2**20:6.1f} "
+                f"{parse_median:8.3f} {args.rows / parse_median:9.0f} "
+                f"{results[mode]['transform_median']:12.3f}"
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Cold vs warm latency of lambda_function.lambda_handler.
+
+Cold invocations run in a fresh interpreter (module import, django.setup()
+and the first call), which is what every invocation used to pay when the
+handler forked ``python manage.py``. Warm invocations reuse the already
+loaded module in this process.
+
+    DATABASE_URL=postgres://... python benchmarks/lambda_latency.py --runs 20
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COLD_SNIPPET = """
+import lambda_function
+from django.db import connection
+
+def ping():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    return "pong"
+
+lambda_function.COMMANDS["ping"] = ping
+assert lambda_function.lambda_handler({"command": "ping"}, None)["statusCode"] == 200
+"""
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        "runs": len(samples),
+        "min_ms": round(samples[0] * 1000, 2),
+        "median_ms": round(statistics.median(samples) * 1000, 2),
+        "max_ms": round(samples[-1] * 1000, 2),
+    }
+
+
+def measure_cold(runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", COLD_SNIPPET], cwd=ROOT, check=True)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def measure_warm(runs):
+    sys.path.insert(0, ROOT)
+    import lambda_function
+    from django.db import connection
+
+    def ping():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        return "pong"
+
+    lambda_function.COMMANDS["ping"] = ping
+    lambda_function.lambda_handler({"command": "ping"}, None)
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        response = lambda_function.lambda_handler({"command": "ping"}, None)
+        samples.append(time.perf_counter() - started)
+        assert response["statusCode"] == 200
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+    os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+    cold = summarize(measure_cold(args.runs))
+    warm = summarize(measure_warm(args.runs))
+    print(f"cold: {cold}")
+    print(f"warm: {warm}")
+    print(f"speedup (median): {cold['median_ms'] / max(warm['median_ms'], 0.001):.0f}x")
+
+
+if __name__ == "__main__":
+    main()
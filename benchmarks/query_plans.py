@@ -0,0 +1,99 @@
+"""Check that every lookup the import performs is served by an index.
+
+Runs EXPLAIN for each hot lookup and fails if any plan falls back to a
+sequential scan. On PostgreSQL sequential scans are disabled for the
+session, so the check reflects index availability rather than the
+planner's choice on a small table.
+
+    DATABASE_URL=postgres://... python benchmarks/query_plans.py
+"""
+
+import os
+import sys
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INDEX_MARKERS = ("USING INDEX", "USING COVERING INDEX", "Index Scan", "Index Only Scan")
+
+
+def get_lookups():
+    from app.models import (
+        Booth,
+        BoothAndPoemCollection,
+        BoothMaintainer,
+        DirectoryType,
+        Era,
+        Language,
+        PhoneType,
+        Poem,
+        PoemCollection,
+        PoemCollectionAndPoem,
+        PoemTopic,
+        PoemType,
+        Poet,
+        PoetAndPoem,
+    )
+
+    some_id = uuid.uuid4()
+    lookups = {
+        "Poem.telepoemNumber": Poem.objects.filter(telepoemNumber__in=["5551234567"]),
+        "Poet(creditedFirstName, creditedLastName)": Poet.objects.filter(
+            creditedFirstName__in=["Ada"], creditedLastName__in=["Lovelace"]
+        ),
+        "Booth(boothName, maintainerName)": Booth.objects.filter(
+            boothName="Main St", maintainerName="City"
+        ),
+        "PoemCollection.poemCollectionName": PoemCollection.objects.filter(
+            poemCollectionName__in=["Spring"]
+        ),
+        "PoetAndPoem(poemId, poetId)": PoetAndPoem.objects.filter(
+            poemId=some_id, poetId=some_id
+        ),
+        "PoemCollectionAndPoem.poemCollectionId": PoemCollectionAndPoem.objects.filter(
+            poemCollectionId__in=[some_id]
+        ),
+        "BoothAndPoemCollection.poemCollectionId": BoothAndPoemCollection.objects.filter(
+            poemCollectionId__in=[some_id]
+        ),
+    }
+    for model in (
+        Era,
+        PoemType,
+        PoemTopic,
+        Language,
+        PhoneType,
+        DirectoryType,
+        BoothMaintainer,
+    ):
+        lookups[f"{model.__name__}.name"] = model.objects.filter(name__in=["x"])
+    return lookups
+
+
+def main():
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "conf.settings")
+    os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+    import django
+
+    django.setup()
+    from django.core.management import call_command
+    from django.db import connection
+
+    if connection.vendor == "sqlite" and connection.settings_dict["NAME"] == ":memory:":
+        call_command("migrate", verbosity=0)
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SET enable_seqscan = off")
+
+    failures = 0
+    for name, queryset in get_lookups().items():
+        plan = queryset.explain()
+        uses_index = any(marker in plan for marker in INDEX_MARKERS)
+        failures += not uses_index
+        print(f"{'ok  ' if uses_index else 'SCAN'} {name}")
+        print("     " + plan.replace("\n", "\n     "))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Cold-start import time of the Django app, add_links and the Lambda handler.
+
+Each target runs in a fresh interpreter under ``python -X importtime``, and
+its import time is the sum of the top-level imports it reports. Exits
+non-zero when a target's median goes over its budget, or when it imports
+one of the heavy modules (pandas, numpy, openpyxl, boto3) that only an
+import or an S3 call should need.
+
+    python benchmarks/startup.py --runs 5
+    python benchmarks/startup.py --budget-ms app=1000 lambda=900 --top 15
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SETUP = "import django; django.setup(); "
+TARGETS = {
+    # What check, migrate and every request load before any view runs.
+    "app": SETUP + "import conf.urls",
+    "add_links": SETUP + "from app.management.commands.add_links import add_links",
+    "lambda": "import lambda_function",
+}
+# Roughly a third over what they take with the heavy imports deferred, and
+# well under what pandas alone adds back. Tune with --budget-ms on slower
+# machines.
+BUDGETS_MS = {"app": 800, "add_links": 600, "lambda": 700}
+HEAVY_MODULES = ["pandas", "numpy", "openpyxl", "boto3"]
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def run_target(code):
+    env = dict(os.environ)
+    env.setdefault("DJANGO_SETTINGS_MODULE", "conf.settings")
+    env.setdefault("DATABASE_URL", "sqlite:///:memory:")
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = {}
+    total = 0
+    for line in process.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match is None:
+            continue
+        _, cumulative, indent, module = match.groups()
+        modules[module] = int(cumulative)
+        # Nested imports are already counted in their top-level import.
+        if len(indent) == 1:
+            total += int(cumulative)
+    return total / 1000, modules
+
+
+def measure(code, runs):
+    totals = []
+    for _ in range(runs):
+        total, modules = run_target(code)
+        totals.append(total)
+    return totals, modules
+
+
+def get_top_level(modules, count):
+    packages = {}
+    for module, cumulative in modules.items():
+        package = module.split(".")[0]
+        packages[package] = max(packages.get(package, 0), cumulative)
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)[:count]
+
+
+def parse_budgets(values):
+    budgets = dict(BUDGETS_MS)
+    for value in values or []:
+        name, _, budget = value.partition("=")
+        if name not in TARGETS:
+            raise SystemExit(
+                f"unknown target {name!r}, expected one of {list(TARGETS)}"
+            )
+        budgets[name] = float(budget)
+    return budgets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument(
+        "--budget-ms", nargs="+", metavar="TARGET=MS", help="override a budget"
+    )
+    parser.add_argument("--target", nargs="+", choices=list(TARGETS))
+    args = parser.parse_args()
+
+    budgets = parse_budgets(args.budget_ms)
+    failures = []
+    for name in args.target or TARGETS:
+        totals, modules = measure(TARGETS[name], args.runs)
+        median = statistics.median(totals)
+        print(
+            f"{name}: median {median:.1f} ms, min {min(totals):.1f} ms "
+            f"(budget {budgets[name]:.0f} ms, {args.runs} runs)"
+        )
+        for package, cumulative in get_top_level(modules, args.top):
+            print(f"  {cumulative / 1000:8.1f} ms  {package}")
+        heavy = [module for module in HEAVY_MODULES if module in modules]
+        if heavy:
+            failures.append(f"{name} imports {', '.join(heavy)}")
+        if median > budgets[name]:
+            failures.append(f"{name} over its {budgets[name]:.0f} ms budget")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Time TableProcessor splitting a large side-by-side sheet.
+
+The sheet is the 50-column layout benchmarks/workbook.py generates, built
+as the DataFrame pd.read_excel returns for it (every column object, empty
+cells NaN) without writing and reading an xlsx of that size.
+
+    python benchmarks/table_split.py --rows 50000
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def build_sheet(rows):
+    import numpy as np
+    import pandas as pd
+
+    from benchmarks.workbook import get_header_rows, iter_rows
+
+    titles, empty_row, field_names = get_header_rows()
+    header = [
+        f"Unnamed: {i}" if title is None else title for i, title in enumerate(titles)
+    ]
+    values = np.array([empty_row, field_names] + list(iter_rows(rows)), dtype=object)
+    # pd.read_excel reads empty cells and empty strings as NaN.
+    values[pd.isnull(values) | (values == "")] = np.nan
+    return pd.DataFrame(values, columns=header)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--budget", type=float, default=1.0, help="seconds")
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "conf.settings")
+    import django
+
+    django.setup()
+    from app.utils import TableProcessor
+
+    df = build_sheet(args.rows)
+    timings = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        table_dfs = TableProcessor(df).get_table_dataframes()
+        timings.append(time.perf_counter() - started)
+    elapsed = min(timings)
+
+    for table_name, table_df in table_dfs.items():
+        print(f"{table_name}: {len(table_df)} rows x {len(table_df.columns)} columns")
+    print(f"split {args.rows} rows in {elapsed:.3f}s (budget {args.budget}s)")
+    if elapsed > args.budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
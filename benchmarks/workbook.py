@@ -0,0 +1,329 @@
+"""Generate synthetic bulk-upload workbooks for benchmarks.
+
+Writes the same single-sheet layout the import reads: a title row naming
+the four side-by-side tables (POET, POEM, BOOTH, PoemCollection), an empty
+row, the field-name row, then one data row per poem. Poets, booths and
+collections repeat across rows, and the multi-value cells (types, topics,
+languages, booths, collections) hold several values the way the real
+sheet does.
+
+The same rows can be written as the other input formats: the layout as
+CSV, a zip of one CSV per table, Parquet with "<table>.<field>" columns,
+or JSON lines nested by table.
+
+    python benchmarks/workbook.py --rows 1000 10000 100000 --out-dir /tmp/workbooks
+    python benchmarks/workbook.py --rows 10000 --format csv parquet jsonl
+"""
+
+import argparse
+import csv
+import datetime
+import io
+import json
+import os
+import random
+import zipfile
+
+TABLES = {
+    "POET INFORMATION": [
+        "legalName",
+        "creditedName",
+        "additionalPoetsName",
+        "website",
+        "address",
+        "email",
+        "phoneNumber",
+        "city",
+        "status",
+        "zip",
+        "isLaureate",
+        "picCredits",
+        "state",
+        "poetImage",
+        "poetBiography",
+        "tableSeperator",
+    ],
+    "POEM INFORMATION": [
+        "title",
+        "status",
+        "era",
+        "types",
+        "topics",
+        "isChildrenPoem",
+        "isAdultPoem",
+        "telepoemNumber",
+        "Telepoem File Name",
+        "recordingDuration",
+        "recordingDate",
+        "producerName",
+        "narratorName",
+        "recordingSource",
+        "language",
+        "copyRights",
+        "poemText",
+        "tableSeperator",
+    ],
+    "BOOTH INFORMATION": [
+        "boothName",
+        "boothNumber",
+        "phoneType",
+        "directoryType",
+        "boothMaintainerName",
+        "address",
+        "city",
+        "state",
+        "zipCode",
+        "installationDate",
+        "installationType",
+        "active",
+        "isAdaAccessible",
+        "tableSeperator",
+    ],
+    "PoemCollection Information": ["poemCollectionName", "description"],
+}
+
+FIRST_NAMES = ["Ada", "Langston", "Emily", "Pablo", "Maya", "Walt", "Sylvia", "Rumi"]
+LAST_NAMES = ["Hughes", "Dickinson", "Neruda", "Angelou", "Whitman", "Plath", "Oliver"]
+CITIES = [("Phoenix", "AZ"), ("Tucson", "AZ"), ("Denver", "CO"), ("Austin", "TX")]
+ERAS = ["Modern", "Contemporary", "Romantic", "Victorian", ""]
+POEM_TYPES = ["Sonnet", "Haiku", "Free Verse", "Ode", "Elegy", "Ballad", "Limerick"]
+POEM_TOPICS = ["Love", "Nature", "War", "Childhood", "Loss", "City", "Hope", "Time"]
+LANGUAGES = ["English", "Spanish", "French", "Navajo"]
+PHONE_TYPES = ["Rotary", "Push Button", "Payphone", "Candlestick"]
+DIRECTORY_TYPES = ["Tablet", "Printed", "Binder"]
+MAINTAINERS = ["Library", "Parks Dept", "Arts Council", ""]
+
+# Table names in file names, Parquet columns and JSON keys.
+SHORT_NAMES = {
+    "POET INFORMATION": "poets",
+    "POEM INFORMATION": "poems",
+    "BOOTH INFORMATION": "booths",
+    "PoemCollection Information": "poem_collections",
+}
+EXTENSIONS = {
+    "xlsx": ".xlsx",
+    "csv": ".csv",
+    "zip": ".zip",
+    "parquet": ".parquet",
+    "jsonl": ".jsonl",
+}
+
+
+def get_header_rows():
+    titles = []
+    fields = []
+    for table_name, table_fields in TABLES.items():
+        titles += [table_name] + [None] * (len(table_fields) - 1)
+        fields += table_fields
+    return [titles, [None] * len(titles), fields]
+
+
+def get_telepoem_number(row):
+    digits = f"{row:07d}"
+    return f"(555) {digits[:3]}-{digits[3:]}"
+
+
+def get_audio_key(row, prefix="poem/audio/"):
+    digits = f"{row:07d}"
+    return f"{prefix}555{digits}.mp3"
+
+
+def build_row(rng, row, rows):
+    poet = rng.randrange(max(1, rows // 4))
+    first_name = FIRST_NAMES[poet % len(FIRST_NAMES)]
+    last_name = f"{LAST_NAMES[poet % len(LAST_NAMES)]} {poet}"
+    city, state = CITIES[poet % len(CITIES)]
+    poet_cells = [
+        f"{last_name}, {first_name}",
+        f"{last_name}, {first_name}" if poet % 5 else f"(Unknown), {first_name}",
+        "",
+        f"https://poets.example.org/{poet}",
+        f"{poet} Main St",
+        f"poet{poet}@example.org",
+        f"555-01{poet % 100:02d}",
+        city,
+        "Active" if poet % 7 else "Inactive",
+        str(85000 + poet % 1000),
+        "YES" if poet % 11 == 0 else "NO",
+        "",
+        state,
+        "",
+        f"Biography of {first_name} {last_name}. " * (1 + poet % 3),
+        None,
+    ]
+
+    poem_cells = [
+        f"Poem {row}",
+        rng.choice(["Active", "Active", "Inactive"]),
+        rng.choice(ERAS),
+        ", ".join(rng.sample(POEM_TYPES, rng.randint(1, 3))),
+        ", ".join(rng.sample(POEM_TOPICS, rng.randint(1, 3))),
+        rng.choice(["YES", "NO"]),
+        rng.choice(["YES", "NO"]),
+        get_telepoem_number(row),
+        f"poem_{row}.mp3",
+        f"0:0{rng.randint(0, 9)}:{rng.randint(0, 59):02d}" if row % 4 else "",
+        (
+            datetime.datetime(2015 + row % 10, 1 + row % 12, 1 + row % 28)
+            if row % 3
+            else ""
+        ),
+        rng.choice(["Studio A", "Studio B", "Field"]),
+        f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        rng.choice(["Studio", "Phone", "Live"]),
+        "; ".join(rng.sample(LANGUAGES, 1 + (row % 5 == 0))),
+        f"(c) {2000 + row % 24}",
+        "\n".join(f"Line {line} of poem {row}" for line in range(4)),
+        None,
+    ]
+
+    booth = rng.randrange(max(1, rows // 10))
+    booth_count = 1 + (booth % 4 == 0)
+    booth_city, booth_state = CITIES[booth % len(CITIES)]
+    booth_cells = [
+        "; ".join(f"Booth {booth + i}" for i in range(booth_count)),
+        "; ".join(str(1000 + booth + i) for i in range(booth_count)),
+        "; ".join(
+            PHONE_TYPES[(booth + i) % len(PHONE_TYPES)] for i in range(booth_count)
+        ),
+        DIRECTORY_TYPES[booth % len(DIRECTORY_TYPES)],
+        MAINTAINERS[booth % len(MAINTAINERS)],
+        f"{booth} Booth Ave",
+        booth_city,
+        booth_state,
+        85000 + booth % 1000 if booth % 6 else "",
+        str(2010 + booth % 14),
+        rng.choice(["Indoor", "Outdoor"]),
+        "YES" if booth % 9 else "NO",
+        "YES" if booth % 2 else "NO",
+        None,
+    ]
+
+    collection = row % 25
+    collection_cells = [
+        "; ".join(f"Collection {(collection + i) % 25}" for i in range(1 + row % 3)),
+        f"Poems gathered for collection {collection}",
+    ]
+    return poet_cells + poem_cells + booth_cells + collection_cells
+
+
+def iter_rows(rows, seed=0):
+    rng = random.Random(seed)
+    for row in range(rows):
+        yield build_row(rng, row, rows)
+
+
+def split_row(cells):
+    # {short table name: {field: value}}, without the separator columns.
+    tables = {}
+    start = 0
+    for table_name, fields in TABLES.items():
+        tables[SHORT_NAMES[table_name]] = {
+            field: value
+            for field, value in zip(fields, cells[start : start + len(fields)])
+            if field != "tableSeperator"
+        }
+        start += len(fields)
+    return tables
+
+
+def to_text(value):
+    return "" if value is None else str(value)
+
+
+def build_workbook(path, rows, seed=0):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    for header_row in get_header_rows():
+        sheet.append(header_row)
+    for cells in iter_rows(rows, seed):
+        sheet.append(cells)
+    workbook.save(path)
+    return path
+
+
+def build_csv(path, rows, seed=0):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        for header_row in get_header_rows():
+            writer.writerow([to_text(value) for value in header_row])
+        for cells in iter_rows(rows, seed):
+            writer.writerow([to_text(value) for value in cells])
+    return path
+
+
+def build_csv_archive(path, rows, seed=0):
+    buffers = {name: io.StringIO() for name in SHORT_NAMES.values()}
+    writers = {name: csv.writer(buffer) for name, buffer in buffers.items()}
+    for table_name, fields in TABLES.items():
+        writers[SHORT_NAMES[table_name]].writerow(
+            [field for field in fields if field != "tableSeperator"]
+        )
+    for cells in iter_rows(rows, seed):
+        for name, values in split_row(cells).items():
+            writers[name].writerow([to_text(value) for value in values.values()])
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, buffer in buffers.items():
+            archive.writestr(f"{name}.csv", buffer.getvalue())
+    return path
+
+
+def build_parquet(path, rows, seed=0):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = {}
+    for cells in iter_rows(rows, seed):
+        for name, values in split_row(cells).items():
+            for field, value in values.items():
+                # Empty cells are nulls, so numeric and date columns keep
+                # their type.
+                columns.setdefault(f"{name}.{field}", []).append(
+                    None if value == "" else value
+                )
+    pq.write_table(pa.table(columns), path)
+    return path
+
+
+def build_jsonl(path, rows, seed=0):
+    with open(path, "w") as f:
+        for cells in iter_rows(rows, seed):
+            f.write(json.dumps(split_row(cells), default=str) + "\n")
+    return path
+
+
+BUILDERS = {
+    "xlsx": build_workbook,
+    "csv": build_csv,
+    "zip": build_csv_archive,
+    "parquet": build_parquet,
+    "jsonl": build_jsonl,
+}
+
+
+def build_input_file(path, rows, seed=0, input_format="xlsx"):
+    return BUILDERS[input_format](path, rows, seed=seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--out-dir", default=".")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", nargs="+", choices=list(BUILDERS), default=["xlsx"])
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    for rows in args.rows:
+        for input_format in args.format:
+            path = os.path.join(
+                args.out_dir, f"workbook_{rows}{EXTENSIONS[input_format]}"
+            )
+            build_input_file(path, rows, seed=args.seed, input_format=input_format)
+            print(f"{path}: {rows} rows, {os.path.getsize(path) / 2**20:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'conf.settings')
 
 application = get_asgi_application()
+
+# Import jobs run in the server process; fail the ones the last one left.
+from app.jobs import fail_stale_jobs  # noqa: E402
+
+fail_stale_jobs()
@@ -85,7 +85,7 @@ WSGI_APPLICATION = "conf.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {"default": dj_database_url.config(conn_max_age=600)}
+DATABASES = {"default": dj_database_url.config(conn_max_age=600, conn_health_checks=True)}
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -127,3 +127,33 @@ STATIC_URL = "static/"
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# File uploads
+# https://docs.djangoproject.com/en/5.0/ref/settings/#file-upload-handlers
+
+# Uploads are written to a temporary file as they arrive and hashed on the
+# way, never held whole in memory.
+FILE_UPLOAD_HANDLERS = ["app.uploads.HashingTemporaryFileUploadHandler"]
+IMPORT_MAX_UPLOAD_SIZE = int(os.environ.get("IMPORT_MAX_UPLOAD_SIZE", 50 * 1024 * 1024))
+
+# Logging
+# https://docs.djangoproject.com/en/5.0/topics/logging/
+
+# Imports log throttled progress lines and a summary at INFO; LOG_LEVEL=DEBUG
+# adds a line per table chunk and per row written.
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "simple": {"format": "%(asctime)s %(levelname)s %(name)s %(message)s"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": "simple"},
+    },
+    "loggers": {
+        # Not propagated, so the Lambda runtime's root handler does not log
+        # every line a second time.
+        "app": {"handlers": ["console"], "level": LOG_LEVEL, "propagate": False},
+    },
+}
@@ -1,23 +1,97 @@
-import subprocess
 import json
+import logging
+import os
+import time
+import traceback
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "conf.settings")
+django.setup()
+
+from django.db import close_old_connections  # noqa: E402
+from app.management.commands.add_links import add_links  # noqa: E402
+from app.management.commands.run_process import run_process  # noqa: E402
+
+LAMBDA_MAX_BODY_BYTES = int(os.getenv("LAMBDA_MAX_BODY_BYTES", 64 * 1024))
+# Characters of a cut-down field kept in the response.
+LAMBDA_PREVIEW_CHARS = 2048
+
+logger = logging.getLogger("app.lambda")
+
+COMMANDS = {
+    "run_process": run_process,
+    "add_links": add_links,
+}
+
+
+def dump_body(body):
+    # Keeps the response small whatever the command returned: the bulky
+    # fields are replaced by a preview, one after another, until the body
+    # fits. The traceback keeps its end, where the error is.
+    text = json.dumps(body, default=str)
+    for key in ("traceback", "error", "result", "metrics"):
+        if len(text) <= LAMBDA_MAX_BODY_BYTES:
+            break
+        if key not in body:
+            continue
+        value = body[key]
+        if not isinstance(value, str):
+            value = json.dumps(value, default=str)
+        if len(value) <= LAMBDA_PREVIEW_CHARS:
+            continue
+        body[key] = {
+            "truncated": True,
+            "length": len(value),
+            "preview": (
+                value[-LAMBDA_PREVIEW_CHARS:]
+                if key == "traceback"
+                else value[:LAMBDA_PREVIEW_CHARS]
+            ),
+        }
+        text = json.dumps(body, default=str)
+    return text
+
 
 def lambda_handler(event, context):
-    command = event.get('command')
-    if command == 'run_process':
-        process = subprocess.Popen(['python', 'manage.py', 'run_process'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    elif command == 'add_links':
-        process = subprocess.Popen(['python', 'manage.py', 'add_links'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    else:
+    command = event.get("command")
+    handler = COMMANDS.get(command)
+    if handler is None:
         return {
-            'statusCode': 400,
-            'body': 'Invalid command'
+            "statusCode": 400,
+            "body": "Invalid command",
         }
 
-    stdout, stderr = process.communicate()
+    # Django only recycles connections around HTTP requests, so do the same
+    # around each invocation: reuse the warm connection unless it is stale.
+    close_old_connections()
+    started = time.perf_counter()
+    try:
+        result = handler(**event.get("options", {}))
+    except Exception as e:
+        logger.exception("%s failed", command)
+        return {
+            "statusCode": 500,
+            "body": dump_body(
+                {
+                    "command": command,
+                    "error": str(e),
+                    "traceback": traceback.format_exc(),
+                    "duration": round(time.perf_counter() - started, 3),
+                }
+            ),
+        }
+    finally:
+        close_old_connections()
+
+    body = {
+        "command": command,
+        "result": result,
+        "duration": round(time.perf_counter() - started, 3),
+    }
+    if isinstance(result, dict) and "metrics" in result:
+        body["metrics"] = result.pop("metrics")
     return {
-        'statusCode': 200,
-        'body': json.dumps({
-            'stdout': stdout.decode(),
-            'stderr': stderr.decode()
-        })
+        "statusCode": 200,
+        "body": dump_body(body),
     }